@@ -1,4 +1,4 @@
-from flask import Flask, render_template, request, jsonify
+from flask import Flask, render_template, request, jsonify, Response, stream_with_context, send_from_directory, url_for, make_response, g
 import os
 import sys
 import json
@@ -7,10 +7,36 @@ import requests
 import random
 import socket  # For domain validation and IP lookup
 import time
+import math
 import hashlib
 from functools import lru_cache
-from collections import defaultdict
+from collections import defaultdict, OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor, as_completed, TimeoutError as FuturesTimeoutError
 import threading
+import queue
+import asyncio
+import contextvars
+import sqlite3
+import tempfile
+import zlib
+import csv
+import io
+import re
+import struct
+from urllib.parse import urlparse
+import gzip
+import mmap
+import bisect
+from array import array
+import ipaddress
+from datetime import datetime, timezone
+import signal
+import argparse
+import cProfile
+import pstats
+import hmac
+import secrets
+from werkzeug.serving import BaseWSGIServer
 
 # For DNS record lookups - using a different approach that doesn't require dnspython
 # Instead of relying on dnspython which seems problematic, we'll use socket for basic DNS lookups
@@ -26,6 +52,23 @@ except ImportError:
     subprocess.check_call([sys.executable, "-m", "pip", "install", "python-dotenv"])
     from dotenv import load_dotenv
 
+# Optional response compression codecs. gzip is always available.
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Optional reader for local MaxMind (.mmdb) GeoIP databases
+try:
+    import maxminddb
+except ImportError:
+    maxminddb = None
+
 # Load environment variables from .env file
 load_dotenv()
 
@@ -37,6 +80,851 @@ app = Flask(__name__,
             template_folder="../templates", 
             static_folder="../static")
 
+# Upstream APIs
+REVERSE_WHOIS_API_URL = "https://reverse-whois.whoisxmlapi.com/api/v2"
+WHOIS_API_URL = "https://www.whoisxmlapi.com/whoisserver/WhoisService"
+# Bulk WHOIS endpoints live under this base URL, which can point at a local stand-in
+BULK_WHOIS_API_URL = os.environ.get('BULK_WHOIS_API_URL', 'https://www.whoisxmlapi.com/BulkWhoisLookup/bulkServices').rstrip('/')
+DNS_API_URL = "https://dns.google/resolve"
+GEOLOCATION_API_URL = "https://ipapi.co/{ip}/json/"
+
+# Search types supported by the Reverse WHOIS API
+SEARCH_TYPES = ('current', 'historical')
+
+# Local persistent store for snapshots and other state that must survive restarts.
+# Defaults to the temp directory because it is the only writable location on Vercel.
+DATA_DIR = os.environ.get('REVWHOIX_DATA_DIR', os.path.join(tempfile.gettempdir(), 'revwhoix'))
+DB_PATH = os.path.join(DATA_DIR, 'revwhoix.db')
+
+# Number of snapshots kept per query plan
+SNAPSHOT_HISTORY = int(os.environ.get('SNAPSHOT_HISTORY', '10'))
+
+# Watchlist scheduling. Runs are jittered and spaced out so recurring searches
+# don't hit the WhoisXML rate limits in bursts.
+WATCHLIST_SCHEDULER = os.environ.get('WATCHLIST_SCHEDULER', '').lower() in ('1', 'true', 'yes')
+WATCHLIST_DEFAULT_INTERVAL = int(os.environ.get('WATCHLIST_DEFAULT_INTERVAL', str(24 * 3600)))
+WATCHLIST_MIN_INTERVAL = 600
+WATCHLIST_MIN_SPACING = float(os.environ.get('WATCHLIST_MIN_SPACING', '5'))
+WATCHLIST_POLL_SECONDS = float(os.environ.get('WATCHLIST_POLL_SECONDS', '30'))
+WATCHLIST_BATCH_SIZE = int(os.environ.get('WATCHLIST_BATCH_SIZE', '5'))
+
+DB_SCHEMA = """
+CREATE TABLE IF NOT EXISTS snapshots (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    plan_key TEXT NOT NULL,
+    keyword TEXT NOT NULL,
+    search_type TEXT NOT NULL,
+    domain_count INTEGER NOT NULL,
+    domains BLOB NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_snapshots_plan ON snapshots (plan_key, created_at);
+
+CREATE TABLE IF NOT EXISTS watchlist (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    keyword TEXT NOT NULL,
+    search_type TEXT NOT NULL,
+    interval_seconds INTEGER NOT NULL,
+    next_run_at REAL NOT NULL,
+    last_run_at REAL,
+    last_preview_count INTEGER,
+    last_status TEXT,
+    created_at REAL NOT NULL,
+    UNIQUE (keyword, search_type)
+);
+CREATE INDEX IF NOT EXISTS idx_watchlist_next_run ON watchlist (next_run_at);
+
+CREATE TABLE IF NOT EXISTS watchlist_runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    watch_id INTEGER NOT NULL,
+    ran_at REAL NOT NULL,
+    status TEXT NOT NULL,
+    preview_count INTEGER,
+    purchased INTEGER NOT NULL,
+    added TEXT,
+    removed TEXT,
+    message TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_watchlist_runs_watch ON watchlist_runs (watch_id, ran_at);
+
+CREATE TABLE IF NOT EXISTS cache_entries (
+    namespace TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value BLOB NOT NULL,
+    soft_expires_at REAL NOT NULL,
+    expires_at REAL NOT NULL,
+    PRIMARY KEY (namespace, key)
+);
+CREATE INDEX IF NOT EXISTS idx_cache_entries_expiry ON cache_entries (namespace, expires_at);
+
+CREATE TABLE IF NOT EXISTS whois_pivots (
+    field TEXT NOT NULL,
+    value TEXT NOT NULL,
+    domain TEXT NOT NULL,
+    indexed_at REAL NOT NULL,
+    PRIMARY KEY (field, value, domain)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_whois_pivots_domain ON whois_pivots (domain);
+
+CREATE TABLE IF NOT EXISTS whois_dates (
+    domain TEXT PRIMARY KEY,
+    created_at REAL,
+    updated_at REAL,
+    expires_at REAL,
+    indexed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_whois_dates_created ON whois_dates (created_at);
+CREATE INDEX IF NOT EXISTS idx_whois_dates_updated ON whois_dates (updated_at);
+CREATE INDEX IF NOT EXISTS idx_whois_dates_expires ON whois_dates (expires_at);
+
+CREATE TABLE IF NOT EXISTS bulk_jobs (
+    id TEXT PRIMARY KEY,
+    state TEXT NOT NULL,
+    domain_count INTEGER NOT NULL,
+    result TEXT,
+    created_at REAL NOT NULL,
+    finished_at REAL
+);
+
+CREATE TABLE IF NOT EXISTS rate_limits (
+    name TEXT PRIMARY KEY,
+    tokens REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+"""
+
+# Timeouts. Every upstream call gets at most UPSTREAM_TIMEOUT seconds, further
+# limited by the request deadline a client can set with the X-Request-Deadline-Ms
+# header or a deadline_ms parameter.
+UPSTREAM_TIMEOUT = float(os.environ.get('UPSTREAM_TIMEOUT', '15'))
+REQUEST_DEADLINE_MS = int(os.environ.get('REQUEST_DEADLINE_MS', '0'))  # 0 means no default deadline
+MAX_REQUEST_DEADLINE_MS = int(os.environ.get('MAX_REQUEST_DEADLINE_MS', '120000'))
+
+# Circuit breakers. Each upstream host gets a breaker that opens when, over the
+# last CIRCUIT_WINDOW seconds and at least CIRCUIT_MIN_CALLS calls, the share of
+# failed calls or of calls slower than CIRCUIT_SLOW_CALL reaches its threshold.
+# An open breaker fails fast for CIRCUIT_COOLDOWN seconds, then lets
+# CIRCUIT_TRIAL_CALLS trial calls through before closing again.
+CIRCUIT_WINDOW = float(os.environ.get('CIRCUIT_WINDOW', '60'))
+CIRCUIT_MIN_CALLS = int(os.environ.get('CIRCUIT_MIN_CALLS', '10'))
+CIRCUIT_FAILURE_RATE = float(os.environ.get('CIRCUIT_FAILURE_RATE', '0.5'))
+CIRCUIT_SLOW_CALL = float(os.environ.get('CIRCUIT_SLOW_CALL', '5'))
+CIRCUIT_SLOW_RATE = float(os.environ.get('CIRCUIT_SLOW_RATE', '0.8'))
+CIRCUIT_COOLDOWN = float(os.environ.get('CIRCUIT_COOLDOWN', '30'))
+CIRCUIT_TRIAL_CALLS = int(os.environ.get('CIRCUIT_TRIAL_CALLS', '3'))
+
+# Search result caching shared by single and batch searches. Entries older than
+# the soft TTL are still served, but trigger a background refresh. Entries older
+# than the hard TTL are fetched again before responding.
+SEARCH_CACHE_SOFT_TTL = int(os.environ.get('SEARCH_CACHE_SOFT_TTL', '3600'))
+SEARCH_CACHE_TTL = int(os.environ.get('SEARCH_CACHE_TTL', str(6 * 3600)))
+SEARCH_CACHE_SIZE = int(os.environ.get('SEARCH_CACHE_SIZE', '1024'))
+
+# Keywords and fallback candidates whose preview found no domains are remembered
+# for NEGATIVE_CACHE_TTL, so searching them again costs no upstream call. A Bloom
+# filter sized for NEGATIVE_CACHE_SIZE terms screens lookups before the exact store.
+NEGATIVE_CACHE_TTL = int(os.environ.get('NEGATIVE_CACHE_TTL', str(24 * 3600)))
+NEGATIVE_CACHE_SIZE = int(os.environ.get('NEGATIVE_CACHE_SIZE', '100000'))
+NEGATIVE_CACHE_ERROR_RATE = float(os.environ.get('NEGATIVE_CACHE_ERROR_RATE', '0.01'))
+
+# Fallback candidates tried when a keyword has no domains. With 'adaptive'
+# ordering, candidates are tried in order of observed hits per upstream call.
+# With FALLBACK_PRUNE, strategies that almost never hit are also skipped after
+# FALLBACK_MIN_ATTEMPTS tries except for an occasional exploratory try, which
+# saves previews but loses their occasional hits. 'static' uses FALLBACK_ORDER as is.
+FALLBACK_STRATEGIES = {
+    'plural': '{keyword}s',
+    'app': '{keyword}app',
+    'inc': '{keyword}inc',
+    'my': 'my{keyword}',
+    'get': 'get{keyword}'
+}
+FALLBACK_ORDER = [name.strip() for name in os.environ.get('FALLBACK_ORDER', ','.join(FALLBACK_STRATEGIES)).split(',')
+                  if name.strip() in FALLBACK_STRATEGIES]
+FALLBACK_ORDERING = os.environ.get('FALLBACK_ORDERING', 'adaptive')
+FALLBACK_PRUNE = os.environ.get('FALLBACK_PRUNE', '').lower() in ('1', 'true', 'yes')
+FALLBACK_MIN_ATTEMPTS = int(os.environ.get('FALLBACK_MIN_ATTEMPTS', '20'))
+FALLBACK_PRUNE_RATE = float(os.environ.get('FALLBACK_PRUNE_RATE', '0.01'))
+FALLBACK_EXPLORE_RATE = float(os.environ.get('FALLBACK_EXPLORE_RATE', '0.05'))
+
+# WHOIS and enrichment data for individual domains, with the same soft/hard TTLs
+WHOIS_CACHE_SOFT_TTL = int(os.environ.get('WHOIS_CACHE_SOFT_TTL', str(24 * 3600)))
+WHOIS_CACHE_TTL = int(os.environ.get('WHOIS_CACHE_TTL', str(7 * 24 * 3600)))
+WHOIS_CACHE_SIZE = int(os.environ.get('WHOIS_CACHE_SIZE', '10000'))
+
+# Threads used for background cache refreshes
+BACKGROUND_WORKERS = int(os.environ.get('BACKGROUND_WORKERS', '2'))
+
+# Prefetching warms domain details for the results a user is looking at. It runs
+# on one low-priority thread limited to PREFETCH_RATE lookups per second.
+PREFETCH_RATE = float(os.environ.get('PREFETCH_RATE', '2'))
+PREFETCH_BURST = int(os.environ.get('PREFETCH_BURST', '5'))
+PREFETCH_MAX_DOMAINS = int(os.environ.get('PREFETCH_MAX_DOMAINS', '50'))
+PREFETCH_QUEUE_SIZE = int(os.environ.get('PREFETCH_QUEUE_SIZE', '500'))
+
+# Infrastructure clusters of a result set. Only groups shared by at least
+# CLUSTER_MIN_SIZE domains are reported, at most CLUSTER_MAX_GROUPS per dimension.
+CLUSTER_DIMENSIONS = ('nameserver', 'ip', 'prefix24', 'asn')
+CLUSTER_MIN_SIZE = int(os.environ.get('CLUSTER_MIN_SIZE', '2'))
+CLUSTER_MAX_GROUPS = int(os.environ.get('CLUSTER_MAX_GROUPS', '50'))
+
+# Bulk WHOIS. Domains are submitted BULK_WHOIS_CHUNK_SIZE at a time and the
+# requests are polled every BULK_WHOIS_POLL_INTERVAL seconds until they finish
+# or BULK_WHOIS_TIMEOUT passes. Polling runs as a background job on one of
+# BULK_WHOIS_JOB_WORKERS threads, and finished jobs are kept for BULK_WHOIS_JOB_TTL.
+BULK_WHOIS_CHUNK_SIZE = int(os.environ.get('BULK_WHOIS_CHUNK_SIZE', '500'))
+BULK_WHOIS_MAX_DOMAINS = int(os.environ.get('BULK_WHOIS_MAX_DOMAINS', '5000'))
+BULK_WHOIS_POLL_INTERVAL = float(os.environ.get('BULK_WHOIS_POLL_INTERVAL', '2'))
+BULK_WHOIS_TIMEOUT = float(os.environ.get('BULK_WHOIS_TIMEOUT', '300'))
+BULK_WHOIS_ENRICH_WORKERS = int(os.environ.get('BULK_WHOIS_ENRICH_WORKERS', '8'))
+BULK_WHOIS_JOB_WORKERS = int(os.environ.get('BULK_WHOIS_JOB_WORKERS', '2'))
+BULK_WHOIS_JOB_TTL = float(os.environ.get('BULK_WHOIS_JOB_TTL', '3600'))
+
+# Pivot index. Contact emails, organizations, nameservers and registrars from
+# cached WHOIS details are indexed to the domains that use them. Entries older
+# than PIVOT_INDEX_TTL are ignored and eventually pruned.
+PIVOT_FIELDS = ('email', 'organization', 'nameserver', 'registrar')
+PIVOT_INDEX_TTL = int(os.environ.get('PIVOT_INDEX_TTL', str(WHOIS_CACHE_TTL)))
+PIVOT_MAX_RESULTS = int(os.environ.get('PIVOT_MAX_RESULTS', '1000'))
+# Placeholders used by privacy services and redacted records, which would link unrelated domains
+PIVOT_PLACEHOLDER_PATTERN = re.compile(r'redacted|not disclosed|withheld|data protected|privacy|gdpr', re.IGNORECASE)
+
+# Date index. Creation, update and expiry dates of cached WHOIS details are
+# normalized to UTC timestamps so they can be range scanned.
+DATE_INDEX_FIELDS = {'created': 'created_at', 'updated': 'updated_at', 'expires': 'expires_at'}
+DATE_INDEX_MAX_RESULTS = int(os.environ.get('DATE_INDEX_MAX_RESULTS', '1000'))
+WHOIS_DATE_FORMATS = (
+    '%Y-%m-%dT%H:%M:%S%z', '%Y-%m-%d %H:%M:%S%z', '%Y-%m-%dT%H:%M:%S', '%Y-%m-%d %H:%M:%S',
+    '%Y-%m-%d', '%d-%b-%Y', '%d-%b-%Y %H:%M:%S', '%Y.%m.%d', '%d.%m.%Y', '%Y/%m/%d', '%Y%m%d'
+)
+
+# Request profiling. A request is profiled when it sends the PROFILE_TOKEN in an
+# X-Profile header, or at random for PROFILE_SAMPLE_RATE of API requests.
+# 'sample' mode records collapsed stacks every PROFILE_INTERVAL seconds with
+# little overhead; 'cprofile' records every call and saves pstats output.
+PROFILE_TOKEN = os.environ.get('PROFILE_TOKEN', '')
+PROFILE_SAMPLE_RATE = float(os.environ.get('PROFILE_SAMPLE_RATE', '0'))
+PROFILE_MODES = ('sample', 'cprofile')
+PROFILE_MODE = os.environ.get('PROFILE_MODE', 'sample')
+PROFILE_INTERVAL = float(os.environ.get('PROFILE_INTERVAL', '0.005'))
+PROFILE_DIR = os.environ.get('PROFILE_DIR', os.path.join(DATA_DIR, 'profiles'))
+PROFILE_MAX_FILES = int(os.environ.get('PROFILE_MAX_FILES', '200'))
+PROFILE_TOP_FUNCTIONS = 15
+
+# Production server. SERVER_WORKERS processes each handle requests on
+# SERVER_THREADS threads. With more than one worker (or SHARED_CACHE set) the
+# caches and the prefetch rate limit live in the SQLite store so workers share them.
+SERVER_WORKERS = int(os.environ.get('SERVER_WORKERS', str(os.cpu_count() or 1)))
+SERVER_THREADS = int(os.environ.get('SERVER_THREADS', '8'))
+SHARED_CACHE = os.environ.get('SHARED_CACHE', '').lower() in ('1', 'true', 'yes')
+SHARED_CACHES = ('preview_cache', 'search_cache', 'domain_info_cache', 'geo_ip_cache', 'geo_prefix_cache', 'dns_cache')
+
+# Geolocation. Lookups are cached by IP and by network prefix (/24 for IPv4,
+# /48 for IPv6), since many domains share CDN and hosting ranges.
+GEO_CACHE_TTL = int(os.environ.get('GEO_CACHE_TTL', str(7 * 24 * 3600)))
+GEO_CACHE_SIZE = int(os.environ.get('GEO_CACHE_SIZE', '50000'))
+GEOIP_DB_PATH = os.environ.get('GEOIP_DB_PATH', '')
+# 'api' uses ipapi.co, 'local' only the local database, 'hybrid' the local database then ipapi.co
+GEOLOCATION_MODE = os.environ.get('GEOLOCATION_MODE', 'local' if GEOIP_DB_PATH else 'api')
+
+# DNS answers are cached for the TTL advertised in the answer, clamped to
+# [DNS_MIN_TTL, DNS_MAX_TTL]. NXDOMAIN and empty answers use the SOA minimum
+# from the authority section, capped at DNS_NEGATIVE_TTL.
+DNS_CACHE_SIZE = int(os.environ.get('DNS_CACHE_SIZE', '50000'))
+DNS_MIN_TTL = int(os.environ.get('DNS_MIN_TTL', '30'))
+DNS_MAX_TTL = int(os.environ.get('DNS_MAX_TTL', '86400'))
+DNS_NEGATIVE_TTL = int(os.environ.get('DNS_NEGATIVE_TTL', '300'))
+DNS_RECORD_TYPES = {'A': 1, 'NS': 2, 'CNAME': 5, 'SOA': 6, 'MX': 15, 'TXT': 16, 'AAAA': 28}
+
+# Liveness sweeps resolve every domain of a result set with the system resolver.
+# Domains are checked concurrently with a per-domain timeout and an overall deadline.
+# Unless LIVENESS_NS_LOOKUPS is off, the nameservers of domains that resolve are
+# looked up over DNS-over-HTTPS as well, to spot parking services.
+LIVENESS_MODES = ('annotate', 'filter')
+LIVENESS_CONCURRENCY = int(os.environ.get('LIVENESS_CONCURRENCY', '200'))
+LIVENESS_TIMEOUT = float(os.environ.get('LIVENESS_TIMEOUT', '2'))
+LIVENESS_DEADLINE = float(os.environ.get('LIVENESS_DEADLINE', '10'))
+LIVENESS_MAX_DEADLINE = 30.0
+LIVENESS_NS_LOOKUPS = os.environ.get('LIVENESS_NS_LOOKUPS', '1').lower() in ('1', 'true', 'yes')
+# Addresses and nameservers used by domain parking services
+LIVENESS_PARKING_IPS = {ip.strip() for ip in os.environ.get('LIVENESS_PARKING_IPS', '').split(',') if ip.strip()}
+PARKING_NAMESERVERS = (
+    'sedoparking.com', 'parkingcrew.net', 'bodis.com', 'above.com', 'parklogic.com',
+    'dan.com', 'afternic.com', 'cashparking.com', 'uniregistrymarket.link', 'namebrightdns.com'
+)
+
+# Pages of cached result sets served by /api/results
+RESULTS_PAGE_SIZE = int(os.environ.get('RESULTS_PAGE_SIZE', '100'))
+RESULTS_MAX_PAGE_SIZE = int(os.environ.get('RESULTS_MAX_PAGE_SIZE', '5000'))
+
+# Batch search limits
+BATCH_MAX_KEYWORDS = int(os.environ.get('BATCH_MAX_KEYWORDS', '100'))
+BATCH_MAX_WORKERS = int(os.environ.get('BATCH_MAX_WORKERS', '4'))
+
+# Response compression and compact encoding
+COMPRESS_MIN_SIZE = int(os.environ.get('COMPRESS_MIN_SIZE', '1024'))
+COMPRESS_MIMETYPES = ('application/json', 'text/html')
+COMPACT_MIMETYPE = 'application/vnd.revwhoix.compact+json'
+
+# Static asset pipeline. Assets are minified, fingerprinted and precompressed at
+# startup. Set ASSET_MINIFY=0 to skip minification.
+ASSET_FILES = ('css/style.css', 'js/script.js')
+ASSET_MINIFY = os.environ.get('ASSET_MINIFY', '1').lower() in ('1', 'true', 'yes')
+ASSET_MAX_AGE = 365 * 24 * 3600
+ASSET_MIMETYPES = {'.css': 'text/css', '.js': 'text/javascript'}
+
+# Export settings
+EXPORT_FORMATS = ('csv', 'jsonl', 'columnar')
+EXPORT_CHUNK_ROWS = 500
+EXPORT_ROW_GROUP_SIZE = 4096
+COLUMNAR_MAGIC = b'RWXCOL1\n'
+
+_db_local = threading.local()
+
+def get_db():
+    """Get a SQLite connection for the current thread, creating the schema on first use"""
+    conn = getattr(_db_local, 'conn', None)
+    if conn is None:
+        # Only this user may read or replace the database
+        os.makedirs(DATA_DIR, mode=0o700, exist_ok=True)
+        conn = sqlite3.connect(DB_PATH, timeout=30)
+        conn.row_factory = sqlite3.Row
+        # WAL lets worker processes read while another one writes
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript(DB_SCHEMA)
+        _db_local.conn = conn
+    return conn
+
+class DeadlineExceeded(requests.exceptions.Timeout):
+    """Raised instead of making an upstream call once the request deadline has passed"""
+
+# Absolute time.monotonic() deadline of the current request, or None
+request_deadline = contextvars.ContextVar('request_deadline', default=None)
+
+def deadline_remaining():
+    """Seconds left before the request deadline, or None if the request has no deadline"""
+    deadline = request_deadline.get()
+    if deadline is None:
+        return None
+    return deadline - time.monotonic()
+
+def deadline_exceeded():
+    """Check whether the current request has run out of time"""
+    remaining = deadline_remaining()
+    return remaining is not None and remaining <= 0
+
+def upstream_timeout(timeout=UPSTREAM_TIMEOUT):
+    """Get the timeout for an upstream call, shrunk to fit the request deadline"""
+    remaining = deadline_remaining()
+    if remaining is None:
+        return timeout
+    if remaining <= 0:
+        raise DeadlineExceeded("Request deadline exceeded")
+    return min(timeout, remaining)
+
+class CircuitOpenError(requests.exceptions.ConnectionError):
+    """Raised instead of calling an upstream host whose circuit breaker is open"""
+
+class CircuitBreaker:
+    """Tracks the error and latency rates of one upstream host and fails fast while it is unhealthy"""
+    
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+    
+    def __init__(self, host):
+        self.host = host
+        self.state = self.CLOSED
+        self.opened_at = None
+        self._calls = deque()  # (finished at, failed, slow)
+        self._trials_started = 0
+        self._trials_succeeded = 0
+        self._lock = threading.Lock()
+    
+    def allow_request(self):
+        """Check whether a call may go through, moving an open breaker to half-open after the cooldown"""
+        with self._lock:
+            if self.state == self.OPEN:
+                if time.monotonic() - self.opened_at < CIRCUIT_COOLDOWN:
+                    return False
+                logging.info(f"🔌 Circuit for {self.host} is half-open, sending trial requests")
+                self.state = self.HALF_OPEN
+                self._trials_started = 0
+                self._trials_succeeded = 0
+            
+            if self.state == self.HALF_OPEN:
+                if self._trials_started >= CIRCUIT_TRIAL_CALLS:
+                    return False
+                self._trials_started += 1
+            
+            return True
+    
+    def is_open(self):
+        """Check whether calls are currently being rejected, without starting a trial"""
+        with self._lock:
+            if self.state == self.OPEN:
+                return time.monotonic() - self.opened_at < CIRCUIT_COOLDOWN
+            return self.state == self.HALF_OPEN and self._trials_started >= CIRCUIT_TRIAL_CALLS
+    
+    def release(self):
+        """Give back the trial slot of a call whose outcome says nothing about the upstream's health"""
+        with self._lock:
+            if self.state == self.HALF_OPEN and self._trials_started > 0:
+                self._trials_started -= 1
+    
+    def record(self, failed, duration):
+        """Record the outcome of a call"""
+        now = time.monotonic()
+        slow = duration >= CIRCUIT_SLOW_CALL
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                if failed or slow:
+                    self._open(now)
+                else:
+                    self._trials_succeeded += 1
+                    if self._trials_succeeded >= CIRCUIT_TRIAL_CALLS:
+                        logging.info(f"✅ Circuit for {self.host} closed")
+                        self.state = self.CLOSED
+                        self._calls.clear()
+                return
+            
+            self._calls.append((now, failed, slow))
+            while self._calls and self._calls[0][0] < now - CIRCUIT_WINDOW:
+                self._calls.popleft()
+            
+            if self.state == self.CLOSED and len(self._calls) >= CIRCUIT_MIN_CALLS:
+                failure_rate = sum(1 for _, call_failed, _ in self._calls if call_failed) / len(self._calls)
+                slow_rate = sum(1 for _, _, call_slow in self._calls if call_slow) / len(self._calls)
+                if failure_rate >= CIRCUIT_FAILURE_RATE or slow_rate >= CIRCUIT_SLOW_RATE:
+                    self._open(now)
+    
+    def _open(self, now):
+        logging.warning(f"🔌 Circuit for {self.host} opened for {CIRCUIT_COOLDOWN:.0f}s")
+        self.state = self.OPEN
+        self.opened_at = now
+        self._calls.clear()
+    
+    def to_dict(self):
+        with self._lock:
+            calls = len(self._calls)
+            return {
+                'host': self.host,
+                'state': self.state,
+                'recent_calls': calls,
+                'failure_rate': sum(1 for _, failed, _ in self._calls if failed) / calls if calls else 0.0,
+                'slow_rate': sum(1 for _, _, slow in self._calls if slow) / calls if calls else 0.0
+            }
+
+circuit_breakers = {}
+_circuit_breakers_lock = threading.Lock()
+
+def get_circuit_breaker(url):
+    """Get the circuit breaker for the host of a URL"""
+    host = urlparse(url).hostname
+    with _circuit_breakers_lock:
+        breaker = circuit_breakers.get(host)
+        if breaker is None:
+            breaker = circuit_breakers[host] = CircuitBreaker(host)
+        return breaker
+
+def circuit_open(url):
+    """Check whether calls to the host of a URL are currently failing fast"""
+    return get_circuit_breaker(url).is_open()
+
+def upstream_request(method, url, timeout=UPSTREAM_TIMEOUT, **kwargs):
+    """
+    Make an HTTP request to an upstream API.
+    
+    The timeout is bounded by the request deadline, and the call goes through
+    the host's circuit breaker: it fails fast with CircuitOpenError while the
+    breaker is open. Server errors and rate limiting count as failures. Calls
+    cut short by the request deadline, or that fail before reaching the
+    upstream, are not recorded.
+    """
+    request_timeout = upstream_timeout(timeout)
+    
+    breaker = get_circuit_breaker(url)
+    if not breaker.allow_request():
+        raise CircuitOpenError(f"Circuit breaker open for {breaker.host}")
+    
+    started = time.monotonic()
+    failed = None  # Stays None when the call says nothing about the upstream's health
+    try:
+        response = requests.request(method, url, timeout=request_timeout, **kwargs)
+        failed = response.status_code >= 500 or response.status_code == 429
+        return response
+    except requests.exceptions.Timeout:
+        # Timing out because of a short request deadline is not the upstream's fault
+        if request_timeout >= timeout:
+            failed = True
+        raise
+    except requests.exceptions.RequestException as e:
+        # Invalid URLs and headers are our own mistakes, and CircuitOpenError never reached the host
+        if not isinstance(e, (ValueError, CircuitOpenError)):
+            failed = True
+        raise
+    finally:
+        if failed is None:
+            breaker.release()
+        else:
+            breaker.record(failed, time.monotonic() - started)
+
+def submit_with_context(executor, fn, *args):
+    """Submit work to an executor so it runs with the caller's context, including its deadline"""
+    return executor.submit(contextvars.copy_context().run, fn, *args)
+
+class TTLCache:
+    """
+    Thread-safe in-memory LRU cache whose entries expire after a TTL.
+    
+    Entries can also have a shorter soft TTL, after which lookup reports them
+    as due for a refresh while still returning them. Expired entries are kept
+    until the LRU evicts them, so get_stale can still serve them while an
+    upstream is down.
+    """
+    
+    def __init__(self, ttl, max_entries=1024, soft_ttl=None):
+        self.ttl = ttl
+        self.soft_ttl = soft_ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def lookup(self, key):
+        """
+        Get an entry that hasn't passed its hard TTL.
+        
+        Returns:
+            tuple: (value, needs refresh), or None if there is no live entry
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            
+            value, soft_expires_at, expires_at = entry
+            now = time.time()
+            if expires_at <= now:
+                # Expired entries stay until they are evicted so they can be served stale
+                return None
+            
+            self._entries.move_to_end(key)
+            return value, soft_expires_at <= now
+    
+    def get(self, key, default=None):
+        entry = self.lookup(key)
+        return default if entry is None else entry[0]
+    
+    def get_stale(self, key, default=None):
+        """Get an entry even if it has expired, for use when the upstream is unavailable"""
+        with self._lock:
+            entry = self._entries.get(key)
+            return default if entry is None else entry[0]
+    
+    def set(self, key, value, ttl=None):
+        now = time.time()
+        ttl = self.ttl if ttl is None else ttl
+        soft_ttl = ttl if self.soft_ttl is None else min(self.soft_ttl, ttl)
+        with self._lock:
+            self._entries[key] = (value, now + soft_ttl, now + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+    
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+    
+    def __len__(self):
+        return len(self._entries)
+
+class SharedTTLCache:
+    """
+    TTLCache backed by the SQLite store, so every worker process shares its entries.
+    
+    Values are stored as JSON, through pack_cache_value, so a tampered database
+    can't run code when it is read. Eviction drops the entries closest to expiry rather than
+    the least recently used ones, so reads never have to write.
+    """
+    
+    TRIM_EVERY = 64
+    
+    def __init__(self, namespace, ttl, max_entries=1024, soft_ttl=None):
+        self.namespace = namespace
+        self.ttl = ttl
+        self.soft_ttl = soft_ttl
+        self.max_entries = max_entries
+        self._writes = 0
+        self._lock = threading.Lock()
+    
+    def _row(self, key):
+        try:
+            row = get_db().execute(
+                "SELECT value, soft_expires_at, expires_at FROM cache_entries WHERE namespace = ? AND key = ?",
+                (self.namespace, repr(key))
+            ).fetchone()
+        except sqlite3.Error as e:
+            logging.warning(f"⚠️ Shared cache read failed for {key}: {str(e)}")
+            return None
+        
+        if row is not None and not isinstance(row['value'], str):
+            # Entries written in another format are treated as misses and overwritten
+            return None
+        return row
+    
+    def lookup(self, key):
+        row = self._row(key)
+        now = time.time()
+        if row is None or row['expires_at'] <= now:
+            return None
+        return unpack_cache_value(json.loads(row['value'])), row['soft_expires_at'] <= now
+    
+    def get(self, key, default=None):
+        entry = self.lookup(key)
+        return default if entry is None else entry[0]
+    
+    def get_stale(self, key, default=None):
+        row = self._row(key)
+        return default if row is None else unpack_cache_value(json.loads(row['value']))
+    
+    def set(self, key, value, ttl=None):
+        now = time.time()
+        ttl = self.ttl if ttl is None else ttl
+        soft_ttl = ttl if self.soft_ttl is None else min(self.soft_ttl, ttl)
+        with self._lock:
+            self._writes += 1
+            trim = self._writes % self.TRIM_EVERY == 0
+        
+        db = get_db()
+        try:
+            with db:
+                db.execute(
+                    "INSERT OR REPLACE INTO cache_entries (namespace, key, value, soft_expires_at, expires_at) VALUES (?, ?, ?, ?, ?)",
+                    (self.namespace, repr(key), json.dumps(pack_cache_value(value)), now + soft_ttl, now + ttl)
+                )
+                if trim:
+                    db.execute(
+                        "DELETE FROM cache_entries WHERE namespace = ? AND key IN "
+                        "(SELECT key FROM cache_entries WHERE namespace = ? ORDER BY expires_at DESC LIMIT -1 OFFSET ?)",
+                        (self.namespace, self.namespace, self.max_entries)
+                    )
+        except sqlite3.Error as e:
+            logging.warning(f"⚠️ Shared cache write failed for {key}: {str(e)}")
+    
+    def delete(self, key):
+        db = get_db()
+        with db:
+            db.execute("DELETE FROM cache_entries WHERE namespace = ? AND key = ?", (self.namespace, repr(key)))
+    
+    def clear(self):
+        db = get_db()
+        with db:
+            db.execute("DELETE FROM cache_entries WHERE namespace = ?", (self.namespace,))
+    
+    def __len__(self):
+        row = get_db().execute("SELECT COUNT(*) FROM cache_entries WHERE namespace = ?", (self.namespace,)).fetchone()
+        return row[0]
+
+CACHE_VALUE_TAGS = ('__domain_set__', '__tuple__', '__dict__')
+
+def pack_cache_value(value):
+    """Convert a cached value to JSON-compatible data, tagging tuples and CompactDomainSets"""
+    if isinstance(value, CompactDomainSet):
+        return {'__domain_set__': value.to_dict()}
+    if isinstance(value, tuple):
+        return {'__tuple__': [pack_cache_value(item) for item in value]}
+    if isinstance(value, list):
+        return [pack_cache_value(item) for item in value]
+    if isinstance(value, dict):
+        packed = {key: pack_cache_value(item) for key, item in value.items()}
+        if len(value) == 1 and next(iter(value)) in CACHE_VALUE_TAGS:
+            # Wrap plain dicts that would otherwise be read back as a tag
+            return {'__dict__': packed}
+        return packed
+    return value
+
+def unpack_cache_value(value):
+    """Reverse pack_cache_value"""
+    if isinstance(value, list):
+        return [unpack_cache_value(item) for item in value]
+    if isinstance(value, dict):
+        if len(value) == 1 and '__domain_set__' in value:
+            return CompactDomainSet.from_dict(value['__domain_set__'])
+        if len(value) == 1 and '__tuple__' in value:
+            return tuple(unpack_cache_value(item) for item in value['__tuple__'])
+        if len(value) == 1 and '__dict__' in value:
+            return {key: unpack_cache_value(item) for key, item in value['__dict__'].items()}
+        return {key: unpack_cache_value(item) for key, item in value.items()}
+    return value
+
+class BloomFilter:
+    """Bloom filter over strings with a fixed capacity and false positive rate"""
+    
+    def __init__(self, capacity, error_rate=0.01):
+        capacity = max(1, capacity)
+        self.size = max(64, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self._bits = bytearray((self.size + 7) // 8)
+    
+    def _positions(self, item):
+        # Double hashing: k positions from two 64-bit halves of one digest
+        h1, h2 = struct.unpack('<QQ', hashlib.blake2b(item.encode('utf-8'), digest_size=16).digest())
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+    
+    def add(self, item):
+        for position in self._positions(item):
+            self._bits[position >> 3] |= 1 << (position & 7)
+    
+    def __contains__(self, item):
+        bits = self._bits
+        return all(bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+class NegativeCache:
+    """
+    Set of keys known to have no results, each expiring after a TTL.
+    
+    Lookups check a Bloom filter first, so keys that were never added are
+    rejected without taking the lock. Filter hits are confirmed against an
+    exact store of expiry times. Keys can't be removed from a Bloom filter,
+    so it is rebuilt from the exact store whenever entries are evicted.
+    """
+    
+    def __init__(self, ttl, max_entries, error_rate=0.01):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.error_rate = error_rate
+        self._expires = OrderedDict()
+        self._bloom = BloomFilter(max_entries, error_rate)
+        self._lock = threading.Lock()
+    
+    def add(self, key):
+        with self._lock:
+            self._expires[key] = time.time() + self.ttl
+            self._expires.move_to_end(key)
+            if len(self._expires) > self.max_entries:
+                self._evict()
+            else:
+                self._bloom.add(repr(key))
+    
+    def _evict(self):
+        # Drop expired keys, then the oldest tenth, so rebuilds stay infrequent
+        now = time.time()
+        for key in [key for key, expires_at in self._expires.items() if expires_at <= now]:
+            del self._expires[key]
+        while len(self._expires) > self.max_entries * 0.9:
+            self._expires.popitem(last=False)
+        
+        bloom = BloomFilter(self.max_entries, self.error_rate)
+        for key in self._expires:
+            bloom.add(repr(key))
+        self._bloom = bloom
+    
+    def discard(self, key):
+        with self._lock:
+            self._expires.pop(key, None)
+    
+    def __contains__(self, key):
+        if repr(key) not in self._bloom:
+            return False
+        with self._lock:
+            expires_at = self._expires.get(key)
+            if expires_at is None:
+                return False
+            if expires_at <= time.time():
+                del self._expires[key]
+                return False
+            return True
+    
+    def __len__(self):
+        return len(self._expires)
+
+class SharedNegativeCache:
+    """
+    NegativeCache backed by the SQLite store, so a keyword found dead by one
+    worker process is skipped by all of them.
+    
+    Other processes add keys the local Bloom filter would never see, so there
+    is no filter and every lookup is an indexed read of the store.
+    """
+    
+    def __init__(self, namespace, ttl, max_entries):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = SharedTTLCache(namespace, ttl, max_entries)
+    
+    def add(self, key):
+        self._entries.set(key, True)
+    
+    def discard(self, key):
+        self._entries.delete(key)
+    
+    def __contains__(self, key):
+        return self._entries.get(key) is not None
+    
+    def __len__(self):
+        return len(self._entries)
+
+preview_cache = TTLCache(SEARCH_CACHE_TTL, SEARCH_CACHE_SIZE * 4, SEARCH_CACHE_SOFT_TTL)
+negative_preview_cache = NegativeCache(NEGATIVE_CACHE_TTL, NEGATIVE_CACHE_SIZE, NEGATIVE_CACHE_ERROR_RATE)
+search_cache = TTLCache(SEARCH_CACHE_TTL, SEARCH_CACHE_SIZE, SEARCH_CACHE_SOFT_TTL)
+domain_info_cache = TTLCache(WHOIS_CACHE_TTL, WHOIS_CACHE_SIZE, WHOIS_CACHE_SOFT_TTL)
+geo_ip_cache = TTLCache(GEO_CACHE_TTL, GEO_CACHE_SIZE)
+geo_prefix_cache = TTLCache(GEO_CACHE_TTL, GEO_CACHE_SIZE)
+dns_cache = TTLCache(DNS_MAX_TTL, DNS_CACHE_SIZE)
+
+background_executor = ThreadPoolExecutor(max_workers=BACKGROUND_WORKERS, thread_name_prefix='refresh')
+_refreshing = set()
+_refreshing_lock = threading.Lock()
+
+def refresh_in_background(cache, key, loader, *args):
+    """
+    Refresh a cache entry on a background thread.
+    
+    `loader(*args)` must return a (success, value) pair; the entry is only
+    replaced on success. Only one refresh per entry runs at a time.
+    """
+    refresh_key = (id(cache), key)
+    with _refreshing_lock:
+        if refresh_key in _refreshing:
+            return
+        _refreshing.add(refresh_key)
+    
+    def refresh():
+        try:
+            success, value = loader(*args)
+            if success:
+                cache.set(key, value)
+        except Exception as e:
+            logging.error(f"❌ Error refreshing cache entry {key}: {str(e)}")
+        finally:
+            with _refreshing_lock:
+                _refreshing.discard(refresh_key)
+    
+    background_executor.submit(refresh)
+
+def get_or_revalidate(cache, key, loader, *args):
+    """
+    Stale-while-revalidate cache read.
+    
+    Entries within the soft TTL are returned as is. Entries between the soft
+    and hard TTL are returned immediately while refresh_in_background updates
+    them. Returns None when there is no live entry, so the caller fetches
+    synchronously.
+    """
+    entry = cache.lookup(key)
+    if entry is None:
+        return None
+    
+    value, needs_refresh = entry
+    if needs_refresh:
+        refresh_in_background(cache, key, loader, *args)
+    return value
+
 def get_api_key():
     """Get API key from environment variable"""
     try:
@@ -50,9 +938,14 @@ def get_api_key():
         logging.error(f"❌ Error occurred while reading API key: {str(e)}")
         return None
 
-def preview_domains(keyword, api_key):
-    """Check if domains exist without exiting the app on error"""
-    url = "https://reverse-whois.whoisxmlapi.com/api/v2"
+def preview_domain_count(keyword, api_key, search_type='current'):
+    """
+    Get the number of domains the API reports for a keyword without purchasing them.
+    
+    Returns:
+        tuple: (success, error message, domain count)
+    """
+    url = REVERSE_WHOIS_API_URL
     
     # Use a modern user agent
     user_agent = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
@@ -80,7 +973,7 @@ def preview_domains(keyword, api_key):
     
     preview_mode = {
         "apiKey": api_key,
-        "searchType": "current",
+        "searchType": search_type,
         "mode": "preview",
         "punycode": True,
         "basicSearchTerms": search_terms
@@ -88,12 +981,12 @@ def preview_domains(keyword, api_key):
     
     try:
         logging.info(f"🔍 Checking if domains exist for '{keyword}'")
-        r = requests.post(url, json=preview_mode, headers=headers)
+        r = upstream_request('POST', url, json=preview_mode, headers=headers)
         
         # Check if the request was successful
         if r.status_code != 200:
             logging.error(f"❌ API returned status code {r.status_code}")
-            return False, f"API returned status code {r.status_code}: {r.text}"
+            return False, f"API returned status code {r.status_code}: {r.text}", 0
         
         # Parse the JSON response
         response_data = r.json()
@@ -101,23 +994,38 @@ def preview_domains(keyword, api_key):
         
         logging.info(f"🔢 Preview found {domain_count} domains")
         
-        if domain_count > 0:
-            logging.info("✅ Domains exist")
-            logging.info("⛏️ Fetching domains\n")
-            return True, None
+        # Remember zero-hit terms so they aren't previewed again until the negative TTL runs out
+        if domain_count == 0:
+            negative_preview_cache.add((search_type, keyword))
         else:
-            logging.info("❌ No domains found")
-            return False, "No domains found for this keyword"
+            negative_preview_cache.discard((search_type, keyword))
+        
+        return True, None, domain_count
             
     except requests.exceptions.RequestException as e:
         logging.error(f"❌ Request error: {str(e)}")
-        return False, f"Request error: {str(e)}"
+        return False, f"Request error: {str(e)}", 0
     except json.JSONDecodeError as e:
         logging.error(f"❌ Invalid JSON response: {str(e)}")
-        return False, f"Invalid JSON response: {str(e)}"
+        return False, f"Invalid JSON response: {str(e)}", 0
     except Exception as e:
         logging.error(f"❌ Error occurred while fetching domains: {str(e)}")
-        return False, f"Error occurred while fetching domains: {str(e)}"
+        return False, f"Error occurred while fetching domains: {str(e)}", 0
+
+def preview_domains(keyword, api_key, search_type='current'):
+    """Check if domains exist without exiting the app on error"""
+    success, error, domain_count = cached_preview_domain_count(keyword, api_key, search_type)
+    
+    if not success:
+        return False, error
+    
+    if domain_count > 0:
+        logging.info("✅ Domains exist")
+        logging.info("⛏️ Fetching domains\n")
+        return True, None
+    
+    logging.info("❌ No domains found")
+    return False, "No domains found for this keyword"
 
 def validate_and_filter_domains(domains, keyword):
     """
@@ -165,39 +1073,43 @@ def validate_and_filter_domains(domains, keyword):
     
     return filtered_domains
 
-def fetch_domains(keyword, api_key):
+def build_search_terms(keyword):
+    """Build the basicSearchTerms used when purchasing domains for a keyword"""
+    # Use advanced search terms to increase matching chances
+    # Check if keyword might be an email
+    if '@' in keyword:
+        return {
+            "include": [keyword]
+        }
+    
+    # For organizations and other keywords, make the search more flexible
+    # Split keyword into words to increase match possibilities
+    words = keyword.split()
+    if len(words) > 1:
+        # For multi-word terms, try both exact match and individual words
+        # Only include words with length > 2 to avoid noise from short words
+        filtered_words = [word for word in words if len(word) > 2]
+        return {
+            "include": [keyword] + filtered_words
+        }
+    
+    return {
+        "include": [keyword]
+    }
+
+def fetch_domains(keyword, api_key, search_type='current'):
     """Fetch domains without exiting the app on error"""
-    url = "https://reverse-whois.whoisxmlapi.com/api/v2"
+    url = REVERSE_WHOIS_API_URL
     
     # Use a modern user agent
     user_agent = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
     headers = {'User-Agent': user_agent}
     
-    # Use advanced search terms to increase matching chances
-    # Check if keyword might be an email
-    if '@' in keyword:
-        search_terms = {
-            "include": [keyword]
-        }
-    else:
-        # For organizations and other keywords, make the search more flexible
-        # Split keyword into words to increase match possibilities
-        words = keyword.split()
-        if len(words) > 1:
-            # For multi-word terms, try both exact match and individual words
-            # Only include words with length > 2 to avoid noise from short words
-            filtered_words = [word for word in words if len(word) > 2]
-            search_terms = {
-                "include": [keyword] + filtered_words
-            }
-        else:
-            search_terms = {
-                "include": [keyword]
-            }
+    search_terms = build_search_terms(keyword)
     
     query_data = {
         "apiKey": api_key,
-        "searchType": "current",
+        "searchType": search_type,
         "mode": "purchase",
         "punycode": True,
         "basicSearchTerms": search_terms
@@ -205,7 +1117,7 @@ def fetch_domains(keyword, api_key):
     
     try:
         logging.info(f"🔍 Searching for domains related to '{keyword}'")
-        r = requests.post(url, json=query_data, headers=headers)
+        r = upstream_request('POST', url, json=query_data, headers=headers)
         
         # Check if the request was successful
         if r.status_code != 200:
@@ -243,507 +1155,3864 @@ def fetch_domains(keyword, api_key):
         logging.error(f"❌ Error occurred while fetching domains: {str(e)}")
         return False, f"Error occurred while fetching domains: {str(e)}", None, 0
 
-def get_domain_ip(domain):
-    """Get the IP address for a domain"""
-    try:
-        # Get IP address
-        ip_address = socket.gethostbyname(domain)
-        return ip_address
-    except Exception as e:
-        logging.error(f"Error getting IP for {domain}: {str(e)}")
-        return None
-
-def get_geolocation(ip_address):
-    """Get geolocation information for an IP address"""
-    if not ip_address:
-        return None
-        
-    try:
-        # Use a free IP geolocation API
-        response = requests.get(f"https://ipapi.co/{ip_address}/json/")
-        if response.status_code == 200:
-            data = response.json()
-            location = {
-                'country': data.get('country_name'),
-                'region': data.get('region'),
-                'city': data.get('city'),
-                'postal': data.get('postal'),
-                'latitude': data.get('latitude'),
-                'longitude': data.get('longitude'),
-                'org': data.get('org'),  # Usually contains ISP/hosting info
-                'asn': data.get('asn')
-            }
-            return location
-        else:
-            return None
-    except Exception as e:
-        logging.error(f"Error getting geolocation for {ip_address}: {str(e)}")
-        return None
-
-def get_dns_records(domain):
-    """Get DNS records for a domain using socket instead of dnspython"""
-    records = {
-        'a': [],
-        'aaaa': [],
-        'mx': [],
-        'txt': [],
-        'ns': [],
-        'cname': []
-    }
+def load_preview_domain_count(keyword, api_key, search_type='current'):
+    """
+    Cache loader for preview counts.
     
-    try:
-        # A records (IPv4)
-        try:
-            # Use socket for A record lookup
-            ip = socket.gethostbyname(domain)
-            if ip:
-                records['a'].append(ip)
-        except Exception as e:
-            logging.debug(f"Error getting A record for {domain}: {str(e)}")
-            
-        # NS records (Name servers) - use a public DNS API
-        try:
-            response = requests.get(f"https://dns.google/resolve?name={domain}&type=NS")
-            if response.status_code == 200:
-                data = response.json()
-                if 'Answer' in data:
-                    for answer in data['Answer']:
-                        if answer.get('type') == 2:  # NS record type
-                            records['ns'].append(answer.get('data'))
-        except Exception as e:
-            logging.debug(f"Error getting NS records for {domain}: {str(e)}")
-            
-        # MX records (Mail servers) - use a public DNS API
-        try:
-            response = requests.get(f"https://dns.google/resolve?name={domain}&type=MX")
-            if response.status_code == 200:
-                data = response.json()
-                if 'Answer' in data:
-                    for answer in data['Answer']:
-                        if answer.get('type') == 15:  # MX record type
-                            mx_data = answer.get('data', '')
-                            parts = mx_data.split(' ', 1)
-                            if len(parts) == 2:
-                                preference = parts[0]
-                                exchange = parts[1]
-                                records['mx'].append({'preference': preference, 'exchange': exchange})
-        except Exception as e:
-            logging.debug(f"Error getting MX records for {domain}: {str(e)}")
-            
-        # TXT records - use a public DNS API
-        try:
-            response = requests.get(f"https://dns.google/resolve?name={domain}&type=TXT")
-            if response.status_code == 200:
-                data = response.json()
-                if 'Answer' in data:
-                    for answer in data['Answer']:
-                        if answer.get('type') == 16:  # TXT record type
-                            records['txt'].append(answer.get('data'))
-        except Exception as e:
-            logging.debug(f"Error getting TXT records for {domain}: {str(e)}")
-            
-        # AAAA records (IPv6) - use a public DNS API
-        try:
-            response = requests.get(f"https://dns.google/resolve?name={domain}&type=AAAA")
-            if response.status_code == 200:
-                data = response.json()
-                if 'Answer' in data:
-                    for answer in data['Answer']:
-                        if answer.get('type') == 28:  # AAAA record type
-                            records['aaaa'].append(answer.get('data'))
-        except Exception as e:
-            logging.debug(f"Error getting AAAA records for {domain}: {str(e)}")
-            
-        # CNAME records - use a public DNS API
-        try:
-            response = requests.get(f"https://dns.google/resolve?name={domain}&type=CNAME")
-            if response.status_code == 200:
-                data = response.json()
-                if 'Answer' in data:
-                    for answer in data['Answer']:
-                        if answer.get('type') == 5:  # CNAME record type
-                            records['cname'].append(answer.get('data'))
-        except Exception as e:
-            logging.debug(f"Error getting CNAME records for {domain}: {str(e)}")
-            
-        return records
-    except Exception as e:
-        logging.error(f"Error getting DNS records for {domain}: {str(e)}")
-        return records
+    A count that dropped to zero is evicted instead of stored, since
+    preview_domain_count has put the keyword in the negative cache.
+    """
+    success, error, domain_count = preview_domain_count(keyword, api_key, search_type)
+    if success and domain_count == 0:
+        preview_cache.delete((search_type, keyword))
+        return False, None
+    return success, domain_count
 
-def get_domain_details(domain, api_key):
-    """Fetch WHOIS details for a domain"""
-    url = f"https://www.whoisxmlapi.com/whoisserver/WhoisService"
+def cached_preview_domain_count(keyword, api_key, search_type='current'):
+    """Preview a keyword, reusing a cached domain count when available"""
+    cache_key = (search_type, keyword)
+    if cache_key in negative_preview_cache:
+        logging.info(f"🚫 Skipping '{keyword}', known to have no domains")
+        return True, None, 0
     
-    params = {
-        "apiKey": api_key,
-        "domainName": domain,
-        "outputFormat": "JSON"
+    domain_count = get_or_revalidate(preview_cache, cache_key, load_preview_domain_count, keyword, api_key, search_type)
+    if domain_count is None and circuit_open(REVERSE_WHOIS_API_URL):
+        domain_count = preview_cache.get_stale(cache_key)
+    if domain_count is not None:
+        return True, None, domain_count
+    
+    success, error, domain_count = preview_domain_count(keyword, api_key, search_type)
+    # Zero counts are kept in the negative cache, where they don't push live entries out of the LRU
+    if success and domain_count > 0:
+        preview_cache.set(cache_key, domain_count)
+    return success, error, domain_count
+
+def load_domains(keyword, api_key, search_type='current'):
+    """Cache loader for purchased result sets, which are cached as CompactDomainSets"""
+    success, error, domains, count = fetch_domains(keyword, api_key, search_type)
+    if not success:
+        return False, None
+    domain_set = CompactDomainSet(domains)
+    return True, (domain_set, len(domain_set))
+
+def cached_fetch_domains(keyword, api_key, search_type='current'):
+    """
+    Fetch domains for a keyword, reusing a cached result set when available.
+    
+    Domains are returned deduplicated and ordered by TLD, then name, whether
+    or not they came from the cache.
+    """
+    cache_key = get_query_plan_key(keyword, search_type)
+    cached = get_or_revalidate(search_cache, cache_key, load_domains, keyword, api_key, search_type)
+    if cached is None and circuit_open(REVERSE_WHOIS_API_URL):
+        cached = search_cache.get_stale(cache_key)
+    if cached is not None:
+        logging.info(f"⚡ Using cached domains for '{keyword}'")
+        domain_set, count = cached
+        return True, None, domain_set.to_list(), count
+    
+    success, error, domains, count = fetch_domains(keyword, api_key, search_type)
+    if success:
+        domain_set = CompactDomainSet(domains)
+        domains, count = domain_set.to_list(), len(domain_set)
+        search_cache.set(cache_key, (domain_set, count))
+    return success, error, domains, count
+
+def search_keyword(keyword, api_key, search_type='current'):
+    """
+    Run a single keyword through the cached preview -> purchase pipeline.
+    
+    Returns:
+        tuple: (success, error message, domains, count)
+    """
+    success, error, domain_count = cached_preview_domain_count(keyword, api_key, search_type)
+    if not success:
+        return False, error, None, 0
+    if domain_count == 0:
+        return False, "No domains found for this keyword", None, 0
+    
+    return cached_fetch_domains(keyword, api_key, search_type)
+
+class FallbackPlanner:
+    """
+    Orders fallback candidate strategies by their observed hit rate.
+    
+    Every candidate costs one preview, so trying them in decreasing order of
+    hit probability minimizes the expected number of previews before a hit.
+    Hit rates use Laplace smoothing, so untried strategies start at 50%. The
+    statistics count every candidate tried, whether or not its preview came
+    from the cache. What the cache already knows about a candidate is applied
+    per search in candidates() instead. Reordering alone never changes which
+    searches find results. Pruning, when enabled, does.
+    """
+    
+    def __init__(self, order=FALLBACK_ORDER, mode=FALLBACK_ORDERING, prune=FALLBACK_PRUNE,
+                 min_attempts=FALLBACK_MIN_ATTEMPTS, prune_rate=FALLBACK_PRUNE_RATE, explore_rate=FALLBACK_EXPLORE_RATE):
+        self.order = list(order)
+        self.mode = mode
+        self.prune = prune
+        self.min_attempts = min_attempts
+        self.prune_rate = prune_rate
+        self.explore_rate = explore_rate
+        self._stats = {name: {'attempts': 0, 'hits': 0} for name in self.order}
+        self._lock = threading.Lock()
+    
+    def _hit_rate(self, stats):
+        return (stats['hits'] + 1) / (stats['attempts'] + 2)
+    
+    def _pruned(self, stats):
+        return self.prune and stats['attempts'] >= self.min_attempts and stats['hits'] / stats['attempts'] < self.prune_rate
+    
+    def plan(self):
+        """Get the strategy names to try, in order"""
+        if self.mode != 'adaptive':
+            return list(self.order)
+        
+        with self._lock:
+            stats = {name: dict(self._stats[name]) for name in self.order}
+        ranked = sorted(self.order, key=lambda name: -self._hit_rate(stats[name]))
+        return [name for name in ranked if not self._pruned(stats[name]) or random.random() < self.explore_rate]
+    
+    def candidates(self, keyword, search_type='current'):
+        """
+        Get (strategy name, candidate keyword) pairs to try for a keyword, in order.
+        
+        In adaptive mode, candidates the preview cache knows have domains go
+        first and candidates the negative cache knows have none go last, since
+        neither costs a preview.
+        """
+        candidates = [(name, FALLBACK_STRATEGIES[name].format(keyword=keyword)) for name in self.plan()]
+        if self.mode != 'adaptive':
+            return candidates
+        return sorted(candidates, key=lambda candidate: cached_preview_rank(candidate[1], search_type))
+    
+    def record(self, name, hit):
+        with self._lock:
+            stats = self._stats[name]
+            stats['attempts'] += 1
+            stats['hits'] += int(hit)
+    
+    def to_dict(self):
+        with self._lock:
+            stats = {name: dict(self._stats[name]) for name in self.order}
+        return {
+            'mode': self.mode,
+            'prune': self.prune,
+            'plan': self.plan(),
+            'strategies': [
+                dict(stats[name], name=name, pattern=FALLBACK_STRATEGIES[name],
+                     hit_rate=round(self._hit_rate(stats[name]), 4),
+                     pruned=self.mode == 'adaptive' and self._pruned(stats[name]))
+                for name in self.order
+            ]
+        }
+
+fallback_planner = FallbackPlanner()
+
+def cached_preview_rank(keyword, search_type='current'):
+    """
+    Rank a fallback candidate by what the preview caches know about it.
+    
+    Returns:
+        int: 0 if it is known to have domains, 2 if it is known to have none, otherwise 1
+    """
+    cache_key = (search_type, keyword)
+    if cache_key in negative_preview_cache:
+        return 2
+    entry = preview_cache.lookup(cache_key)
+    if entry is not None and entry[0] > 0:
+        return 0
+    return 1
+
+def merge_domain_results(merged, keyword, domains):
+    """
+    Add a keyword's domains into a merged domain -> matching keywords mapping.
+    """
+    for domain in domains:
+        matched = merged.setdefault(domain.lower(), [])
+        if keyword not in matched:
+            matched.append(keyword)
+
+class CompactDomainSet:
+    """
+    Immutable, deduplicated set of domain names packed into one byte buffer.
+    
+    Domains are grouped by TLD and stored without it. Within a group, names are
+    sorted by full domain name, concatenated into a single UTF-8 buffer and
+    located through an array of offsets. A domain costs the bytes of its name
+    plus four, instead of a whole Python string and list slot. The set is
+    ordered by TLD, then domain name.
+    
+    Slicing returns a view that shares the buffer and offsets with the set it
+    came from, so pages are taken without copying. `digest` is a content hash
+    that is computed once and kept with the set, including in to_dict.
+    """
+    
+    __slots__ = ('_names', '_offsets', '_tlds', '_starts', '_digest')
+    
+    def __init__(self, domains=()):
+        groups = defaultdict(set)
+        for domain in domains:
+            if not domain:
+                continue
+            name, dot, tld = domain.lower().rpartition('.')
+            if not dot:
+                name, tld = tld, ''
+            groups[tld].add(name)
+        
+        names = bytearray()
+        offsets = array('I', [0])
+        self._tlds = []
+        self._starts = array('I')
+        for tld in sorted(groups):
+            self._tlds.append(tld)
+            self._starts.append(len(offsets) - 1)
+            # Sorting by name + '.' sorts by the full domain, since the whole group shares the TLD
+            for name in sorted(groups[tld], key=lambda name: name + '.'):
+                names += name.encode('utf-8')
+                offsets.append(len(names))
+        
+        self._names = bytes(names)
+        self._offsets = offsets
+        self._digest = None
+    
+    @classmethod
+    def _from_parts(cls, names, offsets, tlds, starts, digest=None):
+        domain_set = cls.__new__(cls)
+        domain_set._names = names
+        domain_set._offsets = offsets
+        domain_set._tlds = tlds
+        domain_set._starts = starts
+        domain_set._digest = digest
+        return domain_set
+    
+    def _packed(self):
+        """Get the set's own part of the buffer, with offsets starting from zero"""
+        base = self._offsets[0]
+        names = self._names[base:self._offsets[-1]]
+        offsets = array('I', (offset - base for offset in self._offsets))
+        return names, offsets
+    
+    def to_dict(self):
+        """Get the packed set as JSON-compatible data. Views only include their own part of the buffer."""
+        names, offsets = self._packed()
+        return {
+            'names': names.decode('utf-8'),
+            'offsets': offsets.tolist(),
+            'tlds': list(self._tlds),
+            'starts': self._starts.tolist(),
+            'digest': self.digest
+        }
+    
+    @classmethod
+    def from_dict(cls, data):
+        return cls._from_parts(data['names'].encode('utf-8'), array('I', data['offsets']), list(data['tlds']),
+                               array('I', data['starts']), data.get('digest'))
+    
+    def __len__(self):
+        return len(self._offsets) - 1
+    
+    @property
+    def digest(self):
+        """Hex content hash of the domains in the set, in order"""
+        if self._digest is None:
+            names, offsets = self._packed()
+            digest = hashlib.blake2b(names, digest_size=16)
+            digest.update(struct.pack(f'<{len(offsets)}I', *offsets))
+            digest.update('\n'.join(self._tlds).encode('utf-8'))
+            digest.update(struct.pack(f'<{len(self._starts)}I', *self._starts))
+            self._digest = digest.hexdigest()
+        return self._digest
+    
+    @property
+    def nbytes(self):
+        """Approximate memory used by the buffer and indexes"""
+        return (self._offsets[-1] - self._offsets[0]) + 4 * len(self._offsets) + 4 * len(self._starts)
+    
+    def _group(self, index):
+        return bisect.bisect_right(self._starts, index) - 1
+    
+    def _group_range(self, group):
+        end = self._starts[group + 1] if group + 1 < len(self._starts) else len(self)
+        return self._starts[group], end
+    
+    def _domain(self, index, tld):
+        name = self._names[self._offsets[index]:self._offsets[index + 1]].decode('utf-8')
+        return f'{name}.{tld}' if tld else name
+    
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self))
+            if step != 1:
+                raise ValueError('CompactDomainSet slices must be contiguous')
+            return self.page(start, stop)
+        
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('CompactDomainSet index out of range')
+        return self._domain(index, self._tlds[self._group(index)])
+    
+    def __iter__(self):
+        for group, tld in enumerate(self._tlds):
+            start, end = self._group_range(group)
+            for index in range(start, end):
+                yield self._domain(index, tld)
+    
+    def to_list(self):
+        return list(self)
+    
+    def page(self, start, stop):
+        """Get a view of the domains in [start, stop) that shares this set's buffer"""
+        start, stop, _ = slice(start, stop).indices(len(self))
+        stop = max(start, stop)
+        tlds = []
+        starts = array('I')
+        for group, tld in enumerate(self._tlds):
+            group_start, group_end = self._group_range(group)
+            if group_start < stop and group_end > start:
+                tlds.append(tld)
+                starts.append(max(group_start - start, 0))
+        return CompactDomainSet._from_parts(self._names, memoryview(self._offsets)[start:stop + 1], tlds, starts)
+    
+    def _lower_bound(self, value, tld, start, end):
+        """First index in [start, end) of a group whose domain is >= value"""
+        while start < end:
+            middle = (start + end) // 2
+            if self._domain(middle, tld) < value:
+                start = middle + 1
+            else:
+                end = middle
+        return start
+    
+    def __contains__(self, domain):
+        if not isinstance(domain, str):
+            return False
+        domain = domain.lower()
+        name, dot, tld = domain.rpartition('.')
+        if not dot:
+            tld = ''
+        position = bisect.bisect_left(self._tlds, tld)
+        if position == len(self._tlds) or self._tlds[position] != tld:
+            return False
+        start, end = self._group_range(position)
+        index = self._lower_bound(domain, tld, start, end)
+        return index < end and self._domain(index, tld) == domain
+    
+    def with_prefix(self, prefix):
+        """Get the domains starting with a prefix, using a binary search in each TLD group"""
+        prefix = prefix.lower()
+        matches = []
+        for group, tld in enumerate(self._tlds):
+            start, end = self._group_range(group)
+            index = self._lower_bound(prefix, tld, start, end)
+            while index < end:
+                domain = self._domain(index, tld)
+                if not domain.startswith(prefix):
+                    break
+                matches.append(domain)
+                index += 1
+        return matches
+    
+    def containing(self, substring):
+        """Get the domains containing a substring, scanning the packed buffer"""
+        substring = substring.lower()
+        if '.' in substring:
+            # Matches can span the name and the stripped TLD, so check whole domains
+            return [domain for domain in self if substring in domain]
+        
+        matched = set()
+        for group, tld in enumerate(self._tlds):
+            if substring in tld:
+                matched.update(range(*self._group_range(group)))
+        
+        needle = substring.encode('utf-8')
+        end = self._offsets[-1]
+        position = self._names.find(needle, self._offsets[0], end)
+        while position != -1:
+            index = bisect.bisect_right(self._offsets, position) - 1
+            name_end = self._offsets[index + 1]
+            if position + len(needle) <= name_end:
+                matched.add(index)
+                position = self._names.find(needle, name_end, end)
+            else:
+                # The match runs into the next name
+                position = self._names.find(needle, position + 1, end)
+        
+        return [self[index] for index in sorted(matched)]
+
+def get_query_plan_key(keyword, search_type='current'):
+    """Get a stable key identifying the upstream query for a keyword"""
+    plan = {
+        "searchType": search_type,
+        "basicSearchTerms": build_search_terms(keyword)
+    }
+    return hashlib.sha1(json.dumps(plan, sort_keys=True).encode('utf-8')).hexdigest()
+
+def encode_domain_snapshot(domains):
+    """
+    Encode a domain list into the compact snapshot representation.
+    
+    Domains are lowercased, deduplicated and sorted, then stored as a
+    zlib-compressed newline separated blob.
+    
+    Args:
+        domains (list): Domain names to encode
+        
+    Returns:
+        tuple: (sorted domain list, compressed blob)
+    """
+    sorted_domains = sorted({domain.lower() for domain in domains if domain})
+    blob = zlib.compress('\n'.join(sorted_domains).encode('utf-8'))
+    return sorted_domains, blob
+
+def decode_domain_snapshot(blob):
+    """Decode a compressed snapshot blob back into a sorted domain list"""
+    text = zlib.decompress(blob).decode('utf-8')
+    return text.split('\n') if text else []
+
+def iter_snapshot_domains(blob, chunk_size=64 * 1024):
+    """Lazily yield the domains in a compressed snapshot blob without decoding it all at once"""
+    decompressor = zlib.decompressobj()
+    pending = b''
+    for start in range(0, len(blob), chunk_size):
+        pending += decompressor.decompress(blob[start:start + chunk_size])
+        *lines, pending = pending.split(b'\n')
+        for line in lines:
+            yield line.decode('utf-8')
+    pending += decompressor.flush()
+    if pending:
+        yield pending.decode('utf-8')
+
+def diff_sorted_domains(old_domains, new_domains):
+    """
+    Compute the set difference of two sorted, deduplicated domain lists.
+    
+    Walks both lists once, so the cost is linear in the size of the lists.
+    
+    Returns:
+        tuple: (added domains, removed domains)
+    """
+    added = []
+    removed = []
+    i = j = 0
+    
+    while i < len(old_domains) and j < len(new_domains):
+        if old_domains[i] == new_domains[j]:
+            i += 1
+            j += 1
+        elif old_domains[i] < new_domains[j]:
+            removed.append(old_domains[i])
+            i += 1
+        else:
+            added.append(new_domains[j])
+            j += 1
+    
+    removed.extend(old_domains[i:])
+    added.extend(new_domains[j:])
+    
+    return added, removed
+
+def get_latest_snapshot(keyword, search_type='current'):
+    """Get the most recent snapshot for a keyword, or None if it has never been recorded"""
+    row = get_db().execute(
+        "SELECT * FROM snapshots WHERE plan_key = ? ORDER BY created_at DESC, id DESC LIMIT 1",
+        (get_query_plan_key(keyword, search_type),)
+    ).fetchone()
+    
+    if row is None:
+        return None
+    
+    return {
+        'keyword': row['keyword'],
+        'search_type': row['search_type'],
+        'count': row['domain_count'],
+        'domains': decode_domain_snapshot(row['domains']),
+        'created_at': row['created_at']
+    }
+
+def record_snapshot(keyword, domains, search_type='current'):
+    """
+    Store a new snapshot for a keyword and diff it against the previous one.
+    
+    Args:
+        keyword (str): Keyword the domains were fetched for
+        domains (list): Domains returned by the API
+        search_type (str): Search type used for the query
+        
+    Returns:
+        dict: Added/removed domains and snapshot metadata
+    """
+    plan_key = get_query_plan_key(keyword, search_type)
+    previous = get_latest_snapshot(keyword, search_type)
+    sorted_domains, blob = encode_domain_snapshot(domains)
+    
+    if previous is None:
+        added, removed = sorted_domains, []
+    else:
+        added, removed = diff_sorted_domains(previous['domains'], sorted_domains)
+    
+    created_at = time.time()
+    db = get_db()
+    with db:
+        db.execute(
+            "INSERT INTO snapshots (plan_key, keyword, search_type, domain_count, domains, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+            (plan_key, keyword, search_type, len(sorted_domains), blob, created_at)
+        )
+        # Only keep the most recent snapshots for each query plan
+        db.execute(
+            "DELETE FROM snapshots WHERE plan_key = ? AND id NOT IN "
+            "(SELECT id FROM snapshots WHERE plan_key = ? ORDER BY created_at DESC, id DESC LIMIT ?)",
+            (plan_key, plan_key, SNAPSHOT_HISTORY)
+        )
+    
+    logging.info(f"📸 Snapshot for '{keyword}' ({search_type}): {len(added)} added, {len(removed)} removed")
+    
+    return {
+        'added': added,
+        'removed': removed,
+        'baseline': previous is None,
+        'previous_count': previous['count'] if previous else 0,
+        'previous_snapshot_at': previous['created_at'] if previous else None,
+        'snapshot_at': created_at
+    }
+
+def watch_to_dict(row):
+    """Convert a watchlist row into a JSON serializable dict"""
+    return {
+        'id': row['id'],
+        'keyword': row['keyword'],
+        'search_type': row['search_type'],
+        'interval_seconds': row['interval_seconds'],
+        'next_run_at': row['next_run_at'],
+        'last_run_at': row['last_run_at'],
+        'last_preview_count': row['last_preview_count'],
+        'last_status': row['last_status']
+    }
+
+def add_watch(keyword, search_type='current', interval_seconds=WATCHLIST_DEFAULT_INTERVAL):
+    """
+    Add a keyword to the watchlist, or update its interval if it is already watched.
+    
+    The first run is scheduled at a random point within the interval so that
+    keywords added together don't all run at the same time.
+    """
+    now = time.time()
+    db = get_db()
+    with db:
+        db.execute(
+            "INSERT INTO watchlist (keyword, search_type, interval_seconds, next_run_at, created_at) VALUES (?, ?, ?, ?, ?) "
+            "ON CONFLICT (keyword, search_type) DO UPDATE SET interval_seconds = excluded.interval_seconds",
+            (keyword, search_type, interval_seconds, now + random.uniform(0, interval_seconds), now)
+        )
+    row = db.execute(
+        "SELECT * FROM watchlist WHERE keyword = ? AND search_type = ?", (keyword, search_type)
+    ).fetchone()
+    return watch_to_dict(row)
+
+def claim_due_watches(limit):
+    """
+    Claim watchlist entries that are due to run.
+    
+    An entry is claimed by moving its next run time forward, so concurrent
+    runners never pick up the same entry twice.
+    """
+    now = time.time()
+    db = get_db()
+    due = db.execute(
+        "SELECT * FROM watchlist WHERE next_run_at <= ? ORDER BY next_run_at LIMIT ?", (now, limit)
+    ).fetchall()
+    
+    claimed = []
+    for row in due:
+        # Spread subsequent runs out by +/- 10% of the interval
+        next_run_at = now + row['interval_seconds'] * random.uniform(0.9, 1.1)
+        with db:
+            cursor = db.execute(
+                "UPDATE watchlist SET next_run_at = ? WHERE id = ? AND next_run_at = ?",
+                (next_run_at, row['id'], row['next_run_at'])
+            )
+        if cursor.rowcount == 1:
+            claimed.append(row)
+    
+    return claimed
+
+def run_watch(watch, api_key):
+    """
+    Run a single watchlist entry through the preview -> purchase pipeline.
+    
+    The purchase is skipped when the preview count hasn't changed since the
+    last successful run. Otherwise the result is recorded as a snapshot and the
+    diff is stored with the run. A count that drops to zero is recorded as an
+    empty snapshot, so every previously seen domain is reported as removed.
+    
+    Returns:
+        dict: Summary of the run
+    """
+    keyword = watch['keyword']
+    search_type = watch['search_type']
+    run = {
+        'watch_id': watch['id'],
+        'keyword': keyword,
+        'status': 'error',
+        'preview_count': None,
+        'purchased': False,
+        'added': [],
+        'removed': [],
+        'message': None
+    }
+    
+    logging.info(f"👀 Running watchlist search for '{keyword}' ({search_type})")
+    success, error, preview_count = preview_domain_count(keyword, api_key, search_type)
+    
+    if not success:
+        run['message'] = error
+    else:
+        run['preview_count'] = preview_count
+        
+        if preview_count == 0:
+            run['status'] = 'empty'
+            # Record the disappearance of every domain rather than keeping the old snapshot
+            previous = get_latest_snapshot(keyword, search_type)
+            if previous is not None and previous['count'] > 0:
+                snapshot = record_snapshot(keyword, [], search_type)
+                run['status'] = 'changed'
+                run['removed'] = snapshot['removed']
+        elif preview_count == watch['last_preview_count']:
+            logging.info(f"⏭️ Preview count for '{keyword}' unchanged, skipping purchase")
+            run['status'] = 'unchanged'
+        else:
+            success, error, domains, count = fetch_domains(keyword, api_key, search_type)
+            run['purchased'] = True
+            
+            if success:
+                snapshot = record_snapshot(keyword, domains, search_type)
+                run['status'] = 'changed' if snapshot['added'] or snapshot['removed'] else 'unchanged'
+                run['added'] = snapshot['added']
+                run['removed'] = snapshot['removed']
+            else:
+                run['message'] = error
+    
+    ran_at = time.time()
+    db = get_db()
+    with db:
+        db.execute(
+            "INSERT INTO watchlist_runs (watch_id, ran_at, status, preview_count, purchased, added, removed, message) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (watch['id'], ran_at, run['status'], run['preview_count'], int(run['purchased']),
+             json.dumps(run['added']), json.dumps(run['removed']), run['message'])
+        )
+        # Keep the last known preview count when the preview or the purchase failed,
+        # so the next run retries the purchase instead of seeing an unchanged count
+        saved_count = None if run['status'] == 'error' else run['preview_count']
+        db.execute(
+            "UPDATE watchlist SET last_run_at = ?, last_status = ?, "
+            "last_preview_count = COALESCE(?, last_preview_count) WHERE id = ?",
+            (ran_at, run['status'], saved_count, watch['id'])
+        )
+    
+    run['ran_at'] = ran_at
+    return run
+
+def run_due_watches(api_key, limit=WATCHLIST_BATCH_SIZE, spacing=0):
+    """
+    Run up to `limit` due watchlist entries.
+    
+    Args:
+        api_key (str): WhoisXML API key
+        limit (int): Maximum number of entries to run
+        spacing (float): Seconds to wait between entries to respect rate limits
+        
+    Returns:
+        list: Run summaries
+    """
+    runs = []
+    for position, watch in enumerate(claim_due_watches(limit)):
+        if position and spacing:
+            time.sleep(spacing)
+        try:
+            runs.append(run_watch(watch, api_key))
+        except Exception as e:
+            logging.error(f"❌ Error running watchlist search for '{watch['keyword']}': {str(e)}")
+    return runs
+
+def watchlist_scheduler_loop():
+    """Background loop that runs due watchlist entries one at a time"""
+    logging.info("⏰ Watchlist scheduler started")
+    while True:
+        try:
+            api_key = get_api_key()
+            runs = run_due_watches(api_key, spacing=WATCHLIST_MIN_SPACING) if api_key else []
+            if runs:
+                # Give the API some room before the next batch
+                time.sleep(WATCHLIST_MIN_SPACING)
+                continue
+        except Exception as e:
+            logging.error(f"❌ Watchlist scheduler error: {str(e)}")
+        time.sleep(WATCHLIST_POLL_SECONDS)
+
+def start_watchlist_scheduler():
+    """Start the background watchlist scheduler thread"""
+    thread = threading.Thread(target=watchlist_scheduler_loop, name='watchlist-scheduler', daemon=True)
+    thread.start()
+    return thread
+
+def resolve_dns(name, record_type):
+    """
+    Resolve a DNS record type for a name with dns.google, using the shared DNS cache.
+    
+    Positive answers are cached for their TTL. NXDOMAIN and empty answers are
+    cached for a shorter negative TTL. Failures (HTTP errors, SERVFAIL) are not
+    cached.
+    
+    Args:
+        name (str): Domain or host name
+        record_type (str): One of DNS_RECORD_TYPES
+        
+    Returns:
+        dict: {'status': 'NOERROR' or 'NXDOMAIN', 'answers': [...]}, or None if the lookup failed
+    """
+    cache_key = (name.lower().rstrip('.'), record_type)
+    result = dns_cache.get(cache_key)
+    if result is None and circuit_open(DNS_API_URL):
+        result = dns_cache.get_stale(cache_key)
+    if result is not None:
+        return result
+    
+    response = upstream_request('GET', DNS_API_URL, params={'name': name, 'type': record_type})
+    if response.status_code != 200:
+        return None
+    
+    data = response.json()
+    rcode = data.get('Status')
+    if rcode not in (0, 3):  # NOERROR, NXDOMAIN
+        return None
+    
+    type_code = DNS_RECORD_TYPES[record_type]
+    answers = [answer for answer in data.get('Answer', []) if answer.get('type') == type_code]
+    
+    if answers:
+        ttl = min(answer.get('TTL', DNS_MIN_TTL) for answer in answers)
+        ttl = max(DNS_MIN_TTL, min(ttl, DNS_MAX_TTL))
+    else:
+        # RFC 2308: negative answers are cached for the SOA record's TTL
+        soa_ttls = [answer.get('TTL') for answer in data.get('Authority', [])
+                    if answer.get('type') == DNS_RECORD_TYPES['SOA'] and answer.get('TTL') is not None]
+        ttl = max(DNS_MIN_TTL, min(soa_ttls + [DNS_NEGATIVE_TTL]))
+    
+    result = {
+        'status': 'NXDOMAIN' if rcode == 3 else 'NOERROR',
+        'answers': [answer.get('data') for answer in answers]
     }
+    dns_cache.set(cache_key, result, ttl)
+    return result
+
+def is_parking_nameserver(nameserver):
+    """Check whether a nameserver is, or is under, one of the PARKING_NAMESERVERS domains"""
+    nameserver = nameserver.lower().rstrip('.')
+    return any(nameserver == parking or nameserver.endswith('.' + parking) for parking in PARKING_NAMESERVERS)
+
+def classify_resolved_domain(addresses, nameservers=None):
+    """Classify a domain that resolved to `addresses`, with the given nameservers if known, as 'live' or 'parked'"""
+    if addresses & LIVENESS_PARKING_IPS:
+        return 'parked'
+    if nameservers and any(is_parking_nameserver(nameserver) for nameserver in nameservers):
+        return 'parked'
+    return 'live'
+
+def lookup_nameservers(domain, timeout):
+    """
+    Get a domain's nameservers over DNS-over-HTTPS within `timeout` seconds.
+    
+    Meant to run in a fresh context on a worker thread, where it sets its own
+    deadline.
+    
+    Returns:
+        list: Nameserver names, or None if the lookup failed
+    """
+    request_deadline.set(time.monotonic() + timeout)
+    try:
+        result = resolve_dns(domain, 'NS')
+    except Exception as e:
+        logging.debug(f"Error resolving NS records for {domain}: {str(e)}")
+        return None
+    return result['answers'] if result is not None else None
+
+async def run_blocking(executor, timeout, fn, *args):
+    """
+    Run a blocking call on `executor`, waiting at most `timeout` seconds once it has started.
+    
+    Time spent queued behind other calls doesn't count, so calls stuck on
+    the pool's threads can't time out the ones waiting for a thread.
+    
+    Raises:
+        asyncio.TimeoutError: If the call runs for longer than `timeout`
+    """
+    loop = asyncio.get_running_loop()
+    started = loop.create_future()
+    
+    def mark_started():
+        if not started.done():
+            started.set_result(None)
+    
+    def call():
+        loop.call_soon_threadsafe(mark_started)
+        return fn(*args)
+    
+    future = loop.run_in_executor(executor, call)
+    await started
+    return await asyncio.wait_for(future, timeout)
+
+async def check_domain_liveness(domain, executor, semaphore, timeout):
+    """
+    Resolve a domain's A/AAAA records and classify it, using only cached nameservers.
+    
+    Returns:
+        str: 'live', 'parked', 'no_address', 'nxdomain' or 'unknown'
+    """
+    name = domain.lower().rstrip('.')
+    addresses = None
+    cached = dns_cache.get((name, 'A'))
+    if cached is not None:
+        if cached['status'] == 'NXDOMAIN':
+            return 'nxdomain'
+        if cached['answers']:
+            addresses = set(cached['answers'])
+    
+    if addresses is None:
+        async with semaphore:
+            try:
+                infos = await run_blocking(executor, timeout, socket.getaddrinfo, domain, None, 0, socket.SOCK_STREAM)
+            except asyncio.TimeoutError:
+                return 'unknown'
+            except socket.gaierror as e:
+                if e.errno == socket.EAI_NONAME:
+                    return 'nxdomain'
+                if e.errno == getattr(socket, 'EAI_NODATA', None):
+                    return 'no_address'
+                return 'unknown'
+            except Exception:
+                return 'unknown'
+        
+        addresses = {info[4][0] for info in infos}
+        if not addresses:
+            return 'no_address'
+    
+    cached = dns_cache.get((name, 'NS'))
+    return classify_resolved_domain(addresses, cached['answers'] if cached is not None else None)
+
+async def has_parking_nameservers(domain, executor, semaphore, timeout):
+    """Look up a domain's nameservers within `timeout` and check them against PARKING_NAMESERVERS"""
+    async with semaphore:
+        try:
+            nameservers = await run_blocking(executor, timeout, contextvars.Context().run,
+                                             lookup_nameservers, domain.lower().rstrip('.'), timeout)
+        except asyncio.TimeoutError:
+            return False
+    return classify_resolved_domain(set(), nameservers) == 'parked'
+
+def sweep_domain_liveness(domains, deadline=LIVENESS_DEADLINE, timeout=LIVENESS_TIMEOUT, concurrency=LIVENESS_CONCURRENCY):
+    """
+    Check the liveness of many domains concurrently.
+    
+    Lookups are bounded by `concurrency`, each domain gets `timeout` seconds
+    and the whole sweep stops after `deadline` seconds. Domains that weren't
+    resolved in time are reported as 'unknown'. With LIVENESS_NS_LOOKUPS, the
+    time left after every domain is resolved goes to looking up the
+    nameservers of live domains, which are 'parked' if a parking service
+    hosts them.
+    
+    Args:
+        domains (list): Domains to check
+        
+    Returns:
+        dict: Domain -> status
+    """
+    if not domains:
+        return {}
+    
+    # getaddrinfo blocks, so lookups run on a dedicated pool. The pool isn't
+    # waited on at the end, so stuck lookups can't hold the sweep past its deadline.
+    executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='liveness')
+    
+    async def run():
+        semaphore = asyncio.Semaphore(concurrency)
+        tasks = {
+            asyncio.ensure_future(check_domain_liveness(domain, executor, semaphore, timeout)): domain
+            for domain in domains
+        }
+        done, pending = await asyncio.wait(tasks, timeout=deadline)
+        for task in pending:
+            task.cancel()
+        
+        statuses = {}
+        for task, domain in tasks.items():
+            if task in done and task.exception() is None:
+                statuses[domain] = task.result()
+            else:
+                statuses[domain] = 'unknown'
+        
+        remaining = deadline - (time.monotonic() - started_at)
+        unchecked = [domain for domain, status in statuses.items()
+                     if status == 'live' and dns_cache.get((domain.lower().rstrip('.'), 'NS')) is None]
+        if LIVENESS_NS_LOOKUPS and unchecked and remaining > 0:
+            tasks = {
+                asyncio.ensure_future(has_parking_nameservers(domain, executor, semaphore, timeout)): domain
+                for domain in unchecked
+            }
+            done, pending = await asyncio.wait(tasks, timeout=remaining)
+            for task in pending:
+                task.cancel()
+            for task in done:
+                if task.exception() is None and task.result():
+                    statuses[tasks[task]] = 'parked'
+        return statuses
+    
+    started = time.time()
+    started_at = time.monotonic()
+    try:
+        statuses = asyncio.run(run())
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+    
+    logging.info(f"💓 Liveness sweep of {len(domains)} domains took {time.time() - started:.2f}s")
+    return statuses
+
+def apply_liveness(domains, mode, deadline=LIVENESS_DEADLINE):
+    """
+    Run a liveness sweep over domains.
+    
+    In 'filter' mode parked, unresolvable and non-existent domains are dropped.
+    Domains whose status is unknown are kept.
+    
+    Returns:
+        tuple: (domains, statuses, summary counts by status)
+    """
+    statuses = sweep_domain_liveness(domains, deadline)
+    summary = defaultdict(int)
+    for status in statuses.values():
+        summary[status] += 1
+    
+    if mode == 'filter':
+        domains = [domain for domain in domains if statuses.get(domain) in ('live', 'unknown')]
+        statuses = {domain: statuses[domain] for domain in domains}
+    
+    return domains, statuses, dict(summary)
+
+def get_domain_ip(domain):
+    """Get the IP address for a domain"""
+    try:
+        result = resolve_dns(domain, 'A')
+        if result is not None:
+            return result['answers'][0] if result['answers'] else None
+    except Exception as e:
+        logging.debug(f"Error resolving A record for {domain} over DNS-over-HTTPS: {str(e)}")
+    
+    # Fall back to the system resolver when DNS-over-HTTPS is unavailable
+    return system_resolve_ip(domain)
+
+def system_resolve_ip(domain):
+    """Get the IP address for a domain from the system resolver"""
+    # The system resolver can't be given a timeout, so don't start it past the deadline
+    if deadline_exceeded():
+        return None
     
     try:
-        r = requests.get(url, params=params)
+        return socket.gethostbyname(domain)
+    except Exception as e:
+        logging.error(f"Error getting IP for {domain}: {str(e)}")
+        return None
+
+GEO_FIELDS = ('country', 'region', 'city', 'postal', 'latitude', 'longitude', 'org', 'asn')
+
+def ip_sort_key(ip_address):
+    """Sort key for IP addresses: all IPv4 addresses sort before IPv6 addresses"""
+    ip = ipaddress.ip_address(ip_address.strip())
+    return (ip.version, int(ip))
+
+class GeoIPCsvDatabase:
+    """
+    Range lookups over a local GeoIP CSV file through a memory map.
+    
+    The file must have a header row with at least `start_ip` and `end_ip`
+    columns, plus any of the GEO_FIELDS columns, and be sorted by start_ip
+    with IPv4 ranges before IPv6 ranges. Lookups binary search the mapped
+    file directly, so the file is never loaded into memory.
+    """
+    
+    def __init__(self, path):
+        self._file = open(path, 'rb')
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        header_end = self._map.find(b'\n')
+        self._columns = [column.strip() for column in self._map[:header_end].decode('utf-8').split(',')]
+        self._data_start = header_end + 1
+        self._start_index = self._columns.index('start_ip')
+        self._end_index = self._columns.index('end_ip')
+    
+    def _line_at(self, offset):
+        """Get the (start offset, fields) of the first full line at or after offset"""
+        if offset > self._data_start and self._map[offset - 1:offset] != b'\n':
+            offset = self._map.find(b'\n', offset) + 1
+            if offset == 0:
+                return len(self._map), None
+        end = self._map.find(b'\n', offset)
+        if end == -1:
+            end = len(self._map)
+        if end == offset:
+            return offset, None
+        line = self._map[offset:end].decode('utf-8')
+        return offset, next(csv.reader([line]))
+    
+    def lookup(self, ip_address):
+        """Find the location for an IP address, or None if it isn't in any range"""
+        key = ip_sort_key(ip_address)
+        low, high = self._data_start, len(self._map)
+        match = None
+        
+        # Find the last line whose start_ip <= ip
+        while low < high:
+            mid = (low + high) // 2
+            line_start, fields = self._line_at(mid)
+            if fields is None or line_start >= high:
+                high = mid
+                continue
+            if ip_sort_key(fields[self._start_index]) <= key:
+                match = fields
+                low = self._map.find(b'\n', line_start) + 1 or len(self._map)
+            else:
+                high = mid
+        
+        if match is None or ip_sort_key(match[self._end_index]) < key:
+            return None
+        
+        row = dict(zip(self._columns, match))
+        location = {field: row.get(field) or None for field in GEO_FIELDS}
+        for field in ('latitude', 'longitude'):
+            try:
+                location[field] = float(location[field]) if location[field] else None
+            except ValueError:
+                location[field] = None
+        return location
+
+class GeoIPMmdbDatabase:
+    """Lookups in a local MaxMind DB file, memory mapped by the maxminddb reader"""
+    
+    def __init__(self, path):
+        self._reader = maxminddb.open_database(path, maxminddb.MODE_MMAP)
+    
+    def lookup(self, ip_address):
+        record = self._reader.get(ip_address)
+        if not record:
+            return None
+        
+        def name(entry):
+            return (entry or {}).get('names', {}).get('en')
+        
+        subdivisions = record.get('subdivisions') or [{}]
+        location = record.get('location') or {}
+        asn = record.get('autonomous_system_number')
+        return {
+            'country': name(record.get('country')),
+            'region': name(subdivisions[0]),
+            'city': name(record.get('city')),
+            'postal': (record.get('postal') or {}).get('code'),
+            'latitude': location.get('latitude'),
+            'longitude': location.get('longitude'),
+            'org': record.get('autonomous_system_organization'),
+            'asn': f"AS{asn}" if asn else None
+        }
+
+_geoip_database = None
+_geoip_database_lock = threading.Lock()
+
+def get_geoip_database():
+    """Open the local GeoIP database configured by GEOIP_DB_PATH, or None if there isn't one"""
+    global _geoip_database
+    if not GEOIP_DB_PATH:
+        return None
+    
+    with _geoip_database_lock:
+        if _geoip_database is None:
+            try:
+                if GEOIP_DB_PATH.endswith('.mmdb'):
+                    if maxminddb is None:
+                        logging.error("❌ GEOIP_DB_PATH is an .mmdb file but the maxminddb package is not installed")
+                        return None
+                    _geoip_database = GeoIPMmdbDatabase(GEOIP_DB_PATH)
+                else:
+                    _geoip_database = GeoIPCsvDatabase(GEOIP_DB_PATH)
+                logging.info(f"🌍 Loaded local GeoIP database {GEOIP_DB_PATH}")
+            except Exception as e:
+                logging.error(f"❌ Error opening GeoIP database {GEOIP_DB_PATH}: {str(e)}")
+                return None
+        return _geoip_database
+
+def get_ip_prefix(ip_address):
+    """Get the network prefix an IP address is cached under (/24 for IPv4, /48 for IPv6)"""
+    ip = ipaddress.ip_address(ip_address)
+    prefix_length = 24 if ip.version == 4 else 48
+    return str(ipaddress.ip_network(f"{ip}/{prefix_length}", strict=False))
+
+def lookup_geolocation_api(ip_address):
+    """Look up geolocation information for an IP address with ipapi.co"""
+    # Use a free IP geolocation API
+    response = upstream_request('GET', GEOLOCATION_API_URL.format(ip=ip_address))
+    if response.status_code != 200:
+        return None
+    
+    data = response.json()
+    if data.get('error'):
+        return None
+    
+    return {
+        'country': data.get('country_name'),
+        'region': data.get('region'),
+        'city': data.get('city'),
+        'postal': data.get('postal'),
+        'latitude': data.get('latitude'),
+        'longitude': data.get('longitude'),
+        'org': data.get('org'),  # Usually contains ISP/hosting info
+        'asn': data.get('asn')
+    }
+
+def get_geolocation(ip_address):
+    """Get geolocation information for an IP address"""
+    if not ip_address:
+        return None
+        
+    try:
+        location = geo_ip_cache.get(ip_address)
+        if location is None and GEOLOCATION_MODE != 'local' and circuit_open(GEOLOCATION_API_URL):
+            location = geo_ip_cache.get_stale(ip_address)
+        if location is not None:
+            return location
+        
+        # Addresses in the same prefix almost always share a location
+        prefix = get_ip_prefix(ip_address)
+        location = geo_prefix_cache.get(prefix)
+        
+        if location is None and GEOLOCATION_MODE in ('local', 'hybrid'):
+            database = get_geoip_database()
+            if database is not None:
+                location = database.lookup(ip_address)
+        
+        if location is None and GEOLOCATION_MODE in ('api', 'hybrid'):
+            location = lookup_geolocation_api(ip_address)
+        
+        if location is not None:
+            geo_ip_cache.set(ip_address, location)
+            geo_prefix_cache.set(prefix, location)
+        
+        return location
+    except Exception as e:
+        logging.error(f"Error getting geolocation for {ip_address}: {str(e)}")
+        return None
+
+def get_dns_records(domain):
+    """Get DNS records for a domain from the shared DNS cache or a public DNS API"""
+    records = {
+        'a': [],
+        'aaaa': [],
+        'mx': [],
+        'txt': [],
+        'ns': [],
+        'cname': []
+    }
+    
+    try:
+        for record_type in ('A', 'NS', 'MX', 'TXT', 'AAAA', 'CNAME'):
+            result = None
+            try:
+                result = resolve_dns(domain, record_type)
+            except Exception as e:
+                logging.debug(f"Error getting {record_type} records for {domain}: {str(e)}")
+            
+            if result is None:
+                if record_type == 'A':
+                    # Fall back to the system resolver for the address, DNS-over-HTTPS just failed
+                    ip = system_resolve_ip(domain)
+                    if ip:
+                        records['a'].append(ip)
+                continue
+            
+            for data in result['answers']:
+                if record_type == 'MX':
+                    parts = data.split(' ', 1)
+                    if len(parts) == 2:
+                        preference = parts[0]
+                        exchange = parts[1]
+                        records['mx'].append({'preference': preference, 'exchange': exchange})
+                else:
+                    records[record_type.lower()].append(data)
+            
+            # A name that doesn't exist has no records of any type
+            if result['status'] == 'NXDOMAIN':
+                break
+            
+        return records
+    except Exception as e:
+        logging.error(f"Error getting DNS records for {domain}: {str(e)}")
+        return records
+
+def normalize_whois_record(whois_record):
+    """
+    Normalize a WhoisXML API WHOIS record into the domain details returned by the app.
+    
+    Used for single lookups and bulk lookups alike. Network enrichment
+    (IP, geolocation and DNS) is added separately by enrich_domain_details.
+    """
+    whois_record = whois_record or {}
+    
+    # Default values
+    domain_info = {
+        'created': None,
+        'updated': None,
+        'expires': None,
+        'registrar': None,
+        'nameservers': [],
+        'statuses': [],
+        'registrant': {
+            'name': None,
+            'organization': None,
+            'email': None,
+            'phone': None,
+            'country': None,
+            'state': None,
+            'city': None
+        },
+        'admin': {
+            'name': None,
+            'organization': None,
+            'email': None,
+            'phone': None,
+            'country': None,
+            'state': None,
+            'city': None
+        },
+        'tech': {
+            'name': None,
+            'organization': None,
+            'email': None,
+            'phone': None,
+            'country': None,
+            'state': None,
+            'city': None
+        },
+        'dnssec': None,
+        'rawText': whois_record.get('rawText', None)
+    }
+    
+    # Extract dates with better fallbacks
+    try:
+        domain_info['created'] = whois_record.get('createdDate')
+        domain_info['updated'] = whois_record.get('updatedDate')
+        domain_info['expires'] = whois_record.get('expiresDate')
+        
+        # If not found at top level, look in registryData
+        if 'registryData' in whois_record:
+            registry = whois_record['registryData']
+            if not domain_info['created']:
+                domain_info['created'] = registry.get('createdDate')
+            if not domain_info['updated']:
+                domain_info['updated'] = registry.get('updatedDate')
+            if not domain_info['expires']:
+                domain_info['expires'] = registry.get('expiresDate')
+                
+        # Additional fallbacks for dates
+        if not domain_info['created'] and 'createdDateNormalized' in whois_record:
+            domain_info['created'] = whois_record.get('createdDateNormalized')
+        if not domain_info['updated'] and 'updatedDateNormalized' in whois_record:
+            domain_info['updated'] = whois_record.get('updatedDateNormalized')
+        if not domain_info['expires'] and 'expiresDateNormalized' in whois_record:
+            domain_info['expires'] = whois_record.get('expiresDateNormalized')
+            
+        # More fallbacks from standardized data if available
+        if not domain_info['created'] and 'standardRegCreatedDate' in whois_record:
+            domain_info['created'] = whois_record.get('standardRegCreatedDate')
+        if not domain_info['updated'] and 'standardRegUpdatedDate' in whois_record:
+            domain_info['updated'] = whois_record.get('standardRegUpdatedDate')
+        if not domain_info['expires'] and 'standardRegExpiresDate' in whois_record:
+            domain_info['expires'] = whois_record.get('standardRegExpiresDate')
+            
+    except Exception as e:
+        logging.error(f"Error extracting dates: {str(e)}")
+        pass
+    
+    # Extract registrar information with better fallbacks
+    try:
+        domain_info['registrar'] = whois_record.get('registrarName')
+        
+        # If not found, check registryData
+        if not domain_info['registrar'] and 'registryData' in whois_record:
+            domain_info['registrar'] = whois_record['registryData'].get('registrarName')
+            
+        # Try another possible location
+        if not domain_info['registrar']:
+            if 'registrar' in whois_record and 'name' in whois_record['registrar']:
+                domain_info['registrar'] = whois_record['registrar'].get('name')
+            elif 'registrarIANAID' in whois_record:
+                domain_info['registrar'] = f"IANA ID: {whois_record['registrarIANAID']}"
+    except Exception:
+        pass
+    
+    # Extract nameservers
+    try:
+        if 'nameServers' in whois_record:
+            ns_data = whois_record['nameServers']
+            if 'hostNames' in ns_data:
+                domain_info['nameservers'] = ns_data['hostNames']
+            elif isinstance(ns_data, list):
+                domain_info['nameservers'] = ns_data
+            
+        # If not found, check registryData
+        if not domain_info['nameservers'] and 'registryData' in whois_record:
+            if 'nameServers' in whois_record['registryData']:
+                ns_data = whois_record['registryData']['nameServers']
+                if 'hostNames' in ns_data:
+                    domain_info['nameservers'] = ns_data['hostNames']
+                elif isinstance(ns_data, list):
+                    domain_info['nameservers'] = ns_data
+    except Exception:
+        pass
+    
+    # Extract domain statuses
+    try:
+        if 'status' in whois_record:
+            domain_info['statuses'] = whois_record['status']
+        elif 'registryData' in whois_record and 'status' in whois_record['registryData']:
+            domain_info['statuses'] = whois_record['registryData']['status']
+            
+        # Convert string to list if needed
+        if isinstance(domain_info['statuses'], str):
+            domain_info['statuses'] = [domain_info['statuses']]
+    except Exception:
+        pass
+    
+    # Extract contact information (registrant, admin, technical)
+    contacts = ['registrant', 'admin', 'tech']
+    for contact_type in contacts:
+        try:
+            # Try in main record
+            contact_key = f"{contact_type}Contact"
+            if contact_key in whois_record:
+                contact = whois_record[contact_key]
+                domain_info[contact_type]['name'] = contact.get('name')
+                domain_info[contact_type]['organization'] = contact.get('organization')
+                domain_info[contact_type]['email'] = contact.get('email')
+                domain_info[contact_type]['phone'] = contact.get('telephone')
+                domain_info[contact_type]['country'] = contact.get('country')
+                domain_info[contact_type]['state'] = contact.get('state')
+                domain_info[contact_type]['city'] = contact.get('city')
+            
+            # Try in registryData
+            elif 'registryData' in whois_record and contact_key in whois_record['registryData']:
+                contact = whois_record['registryData'][contact_key]
+                domain_info[contact_type]['name'] = contact.get('name')
+                domain_info[contact_type]['organization'] = contact.get('organization')
+                domain_info[contact_type]['email'] = contact.get('email')
+                domain_info[contact_type]['phone'] = contact.get('telephone')
+                domain_info[contact_type]['country'] = contact.get('country')
+                domain_info[contact_type]['state'] = contact.get('state')
+                domain_info[contact_type]['city'] = contact.get('city')
+                
+            # The second-level contacts format 
+            elif contact_type in whois_record:
+                contact = whois_record[contact_type]
+                domain_info[contact_type]['name'] = contact.get('name')
+                domain_info[contact_type]['organization'] = contact.get('organization')
+                domain_info[contact_type]['email'] = contact.get('email')
+                domain_info[contact_type]['phone'] = contact.get('telephone')
+                domain_info[contact_type]['country'] = contact.get('country')
+                domain_info[contact_type]['state'] = contact.get('state')
+                domain_info[contact_type]['city'] = contact.get('city')
+        except Exception as e:
+            logging.error(f"Error extracting {contact_type} contact information: {str(e)}")
+            pass  # Continue processing other contacts even if one fails
+    
+    # DNSSEC information
+    try:
+        domain_info['dnssec'] = whois_record.get('dnssec')
+        if not domain_info['dnssec'] and 'registryData' in whois_record:
+            domain_info['dnssec'] = whois_record['registryData'].get('dnssec')
+    except Exception:
+        pass
+    
+    # Check if domain is available (should always be registered if we have WHOIS data)
+    domain_info['is_registered'] = True
+    
+    # Extract important dates from raw text for additional fallback
+    if not domain_info['created'] or not domain_info['updated'] or not domain_info['expires']:
+        raw_text = domain_info['rawText']
+        if raw_text:
+            for line in raw_text.split('\n'):
+                line = line.lower()
+                if not domain_info['created'] and ('creation date' in line or 'created on' in line or 'created:' in line):
+                    try:
+                        domain_info['created'] = line.split(':', 1)[1].strip()
+                    except:
+                        pass
+                if not domain_info['updated'] and ('updated date' in line or 'updated on' in line or 'updated:' in line):
+                    try:
+                        domain_info['updated'] = line.split(':', 1)[1].strip()
+                    except:
+                        pass
+                if not domain_info['expires'] and ('expiration date' in line or 'expires on' in line or 'expires:' in line):
+                    try:
+                        domain_info['expires'] = line.split(':', 1)[1].strip()
+                    except:
+                        pass
+    
+    return domain_info
+
+def enrich_domain_details(domain, domain_info):
+    """Add IP, geolocation and DNS records to domain details, within the request deadline"""
+    # Additional technical information. Once the request deadline has passed
+    # the remaining lookups are skipped and the details are marked partial.
+    domain_info['ip_address'] = None
+    domain_info['geolocation'] = None
+    domain_info['dns_records'] = None
+    
+    if not deadline_exceeded():
+        domain_info['ip_address'] = get_domain_ip(domain)
+    if not deadline_exceeded():
+        domain_info['geolocation'] = get_geolocation(domain_info['ip_address'])
+    if not deadline_exceeded():
+        domain_info['dns_records'] = get_dns_records(domain)
+    if deadline_exceeded():
+        domain_info['partial'] = True
+    domain_info['content_hash'] = hash_domain_details(domain_info)
+    return domain_info
+
+def hash_domain_details(domain_info):
+    """Hex content hash of domain details, which is cached with them and used for their ETag"""
+    content = {key: value for key, value in domain_info.items() if key not in ('content_hash', 'stale')}
+    encoded = json.dumps(content, sort_keys=True, default=str).encode('utf-8')
+    return hashlib.blake2b(encoded, digest_size=16).hexdigest()
+
+def get_domain_details(domain, api_key):
+    """Fetch WHOIS details for a domain"""
+    url = WHOIS_API_URL
+    
+    params = {
+        "apiKey": api_key,
+        "domainName": domain,
+        "outputFormat": "JSON"
+    }
+    
+    try:
+        r = upstream_request('GET', url, params=params)
+        
+        if r.status_code != 200:
+            logging.error(f"❌ WHOIS API returned status code {r.status_code}")
+            return False, f"API returned status code {r.status_code}: {r.text}", None
+        
+        response_data = r.json()
+        whois_record = response_data.get('WhoisRecord', {})
+        domain_info = normalize_whois_record(whois_record)
+        return True, None, enrich_domain_details(domain, domain_info)
+    
+    except requests.exceptions.RequestException as e:
+        logging.error(f"❌ WHOIS Request error: {str(e)}")
+        return False, f"Request error: {str(e)}", None
+    except json.JSONDecodeError as e:
+        logging.error(f"❌ Invalid JSON response from WHOIS API: {str(e)}")
+        return False, f"Invalid JSON response: {str(e)}", None
+    except Exception as e:
+        logging.error(f"❌ Error occurred while fetching WHOIS data: {str(e)}")
+        return False, f"Error occurred while fetching domain details: {str(e)}", None
+
+def normalize_pivot_value(field, value):
+    """
+    Normalize a WHOIS value for the pivot index.
+    
+    Returns:
+        str: The normalized value, or None if it is empty or a privacy placeholder
+    """
+    if not isinstance(value, str):
+        return None
+    value = ' '.join(value.split()).lower()
+    if field == 'nameserver':
+        value = value.rstrip('.')
+    if not value or PIVOT_PLACEHOLDER_PATTERN.search(value):
+        return None
+    return value
+
+def get_pivot_values(info):
+    """Get the (field, value) pairs of domain details that go in the pivot index"""
+    values = set()
+    for contact_type in ('registrant', 'admin', 'tech'):
+        contact = info.get(contact_type) or {}
+        for field in ('email', 'organization'):
+            value = normalize_pivot_value(field, contact.get(field))
+            if value:
+                values.add((field, value))
+    
+    for nameserver in info.get('nameservers') or []:
+        value = normalize_pivot_value('nameserver', nameserver)
+        if value:
+            values.add(('nameserver', value))
+    
+    value = normalize_pivot_value('registrar', info.get('registrar'))
+    if value:
+        values.add(('registrar', value))
+    return values
+
+def parse_whois_date(value):
+    """
+    Parse a WHOIS date in any of the formats registries use.
+    
+    Returns:
+        float: UTC timestamp, or None if the date can't be parsed
+    """
+    if not isinstance(value, str) or not value.strip():
+        return None
+    
+    text = value.strip()
+    text = re.sub(r'(:\d{2})\.\d+', r'\1', text)  # Fractional seconds
+    text = re.sub(r'\s*(z|utc|gmt)$', '+0000', text, flags=re.IGNORECASE)
+    for date_format in WHOIS_DATE_FORMATS:
+        try:
+            parsed = datetime.strptime(text, date_format)
+        except ValueError:
+            continue
+        if parsed.tzinfo is None:
+            parsed = parsed.replace(tzinfo=timezone.utc)
+        return parsed.timestamp()
+    
+    # Fall back to the first ISO-like date anywhere in the string
+    match = re.search(r'(\d{4})-(\d{2})-(\d{2})', text)
+    if match:
+        try:
+            return datetime(*map(int, match.groups()), tzinfo=timezone.utc).timestamp()
+        except ValueError:
+            pass
+    return None
+
+def format_timestamp(timestamp):
+    if timestamp is None:
+        return None
+    return datetime.fromtimestamp(timestamp, timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+_pivot_writes = 0
+
+def index_domain_details(domain, info):
+    """Replace the pivot and date index entries for a domain with those from its WHOIS details"""
+    global _pivot_writes
+    domain = domain.lower()
+    now = time.time()
+    try:
+        db = get_db()
+        with db:
+            db.execute("DELETE FROM whois_pivots WHERE domain = ?", (domain,))
+            db.executemany(
+                "INSERT OR REPLACE INTO whois_pivots (field, value, domain, indexed_at) VALUES (?, ?, ?, ?)",
+                [(field, value, domain, now) for field, value in get_pivot_values(info)]
+            )
+            db.execute(
+                "INSERT OR REPLACE INTO whois_dates (domain, created_at, updated_at, expires_at, indexed_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (domain, parse_whois_date(info.get('created')), parse_whois_date(info.get('updated')),
+                 parse_whois_date(info.get('expires')), now)
+            )
+            _pivot_writes += 1
+            if _pivot_writes % 256 == 0:
+                db.execute("DELETE FROM whois_pivots WHERE indexed_at < ?", (now - PIVOT_INDEX_TTL,))
+    except sqlite3.Error as e:
+        logging.warning(f"⚠️ Failed to index WHOIS details for {domain}: {str(e)}")
+
+def find_pivot_domains(field, value, limit=PIVOT_MAX_RESULTS):
+    """
+    Look up the domains indexed under a contact, nameserver or registrar.
+    
+    Returns:
+        tuple: (normalized value, list of domains, total number of domains)
+    """
+    value = normalize_pivot_value(field, value)
+    if value is None:
+        return None, [], 0
+    
+    since = time.time() - PIVOT_INDEX_TTL
+    db = get_db()
+    total = db.execute(
+        "SELECT COUNT(*) FROM whois_pivots WHERE field = ? AND value = ? AND indexed_at >= ?",
+        (field, value, since)
+    ).fetchone()[0]
+    rows = db.execute(
+        "SELECT domain FROM whois_pivots WHERE field = ? AND value = ? AND indexed_at >= ? ORDER BY domain LIMIT ?",
+        (field, value, since, limit)
+    ).fetchall()
+    return value, [row['domain'] for row in rows], total
+
+def get_domain_pivots(domain):
+    """Get the indexed pivots of a domain along with how many domains share each one"""
+    since = time.time() - PIVOT_INDEX_TTL
+    rows = get_db().execute(
+        "SELECT p.field, p.value, COUNT(o.domain) AS domain_count FROM whois_pivots p "
+        "JOIN whois_pivots o ON o.field = p.field AND o.value = p.value AND o.indexed_at >= ? "
+        "WHERE p.domain = ? AND p.indexed_at >= ? GROUP BY p.field, p.value ORDER BY p.field, p.value",
+        (since, domain.lower(), since)
+    ).fetchall()
+    return [{'field': row['field'], 'value': row['value'], 'domain_count': row['domain_count']} for row in rows]
+
+def find_domains_by_date(field, start=None, end=None, scope=None, limit=DATE_INDEX_MAX_RESULTS):
+    """
+    Range scan the date index for domains whose `field` date is in [start, end).
+    
+    Args:
+        field (str): 'created', 'updated' or 'expires'
+        start (float): Earliest timestamp, or None for no lower bound
+        end (float): Timestamp to stop before, or None for no upper bound
+        scope (set): Only return these domains, or None for every indexed domain
+        limit (int): Maximum number of domains to return
+        
+    Returns:
+        tuple: (list of domain date dicts ordered by the field, whether the list was truncated)
+    """
+    column = DATE_INDEX_FIELDS[field]
+    rows = get_db().execute(
+        f"SELECT * FROM whois_dates WHERE {column} >= ? AND {column} < ? ORDER BY {column}, domain",
+        (start if start is not None else float('-inf'), end if end is not None else float('inf'))
+    )
+    
+    matches = []
+    for row in rows:
+        if scope is not None and row['domain'] not in scope:
+            continue
+        if len(matches) == limit:
+            return matches, True
+        matches.append({
+            'domain': row['domain'],
+            'created': format_timestamp(row['created_at']),
+            'updated': format_timestamp(row['updated_at']),
+            'expires': format_timestamp(row['expires_at']),
+            'indexed_at': row['indexed_at']
+        })
+    return matches, False
+
+def get_watchlist_domains():
+    """Get the domains in the latest snapshot of every watched keyword"""
+    domains = set()
+    for watch in get_db().execute("SELECT keyword, search_type FROM watchlist").fetchall():
+        snapshot = get_latest_snapshot(watch['keyword'], watch['search_type'])
+        if snapshot is not None:
+            domains.update(snapshot['domains'])
+    return domains
+
+def load_domain_details(domain, api_key):
+    """Cache loader for domain details. Partial details are never cached."""
+    success, error, info = get_domain_details(domain, api_key)
+    success = success and not info.get('partial')
+    if success:
+        index_domain_details(domain, info)
+    return success, info
+
+def cached_get_domain_details(domain, api_key):
+    """
+    Fetch WHOIS details for a domain, reusing cached details when available.
+    
+    Cached details past their soft TTL are returned immediately and refreshed
+    in the background.
+    """
+    cache_key = domain.lower()
+    info = get_or_revalidate(domain_info_cache, cache_key, load_domain_details, domain, api_key)
+    if info is not None:
+        return True, None, info
+    
+    # Serve expired details rather than failing while the WHOIS API is down
+    if circuit_open(WHOIS_API_URL):
+        info = domain_info_cache.get_stale(cache_key)
+        if info is not None:
+            logging.info(f"⚡ WHOIS API unavailable, serving stale details for {domain}")
+            return True, None, dict(info, stale=True)
+    
+    success, error, info = get_domain_details(domain, api_key)
+    if success and not info.get('partial'):
+        domain_info_cache.set(cache_key, info)
+        index_domain_details(domain, info)
+    return success, error, info
+
+def submit_bulk_whois(domains, api_key):
+    """
+    Submit a list of domains to the bulk WHOIS API.
+    
+    Returns:
+        tuple: (success, error message, request ID)
+    """
+    try:
+        r = upstream_request('POST', f'{BULK_WHOIS_API_URL}/bulkWhois', json={
+            "apiKey": api_key,
+            "domains": domains,
+            "outputFormat": "JSON"
+        })
+        if r.status_code != 200:
+            logging.error(f"❌ Bulk WHOIS API returned status code {r.status_code}")
+            return False, f"API returned status code {r.status_code}: {r.text}", None
+        
+        request_id = r.json().get('requestId')
+        if not request_id:
+            return False, "Bulk WHOIS API did not return a request ID", None
+        return True, None, request_id
+    except requests.exceptions.RequestException as e:
+        logging.error(f"❌ Bulk WHOIS request error: {str(e)}")
+        return False, f"Request error: {str(e)}", None
+    except json.JSONDecodeError as e:
+        return False, f"Invalid JSON response: {str(e)}", None
+
+def poll_bulk_whois(request_id, api_key, start_index, max_records):
+    """
+    Get the finished records of a bulk WHOIS request, starting at a 1-based index.
+    
+    Returns:
+        tuple: (success, error message, records, number of records still being processed)
+    """
+    try:
+        r = upstream_request('POST', f'{BULK_WHOIS_API_URL}/getRecords', json={
+            "apiKey": api_key,
+            "requestId": request_id,
+            "startIndex": start_index,
+            "maxRecords": max_records,
+            "outputFormat": "JSON"
+        })
+        if r.status_code != 200:
+            return False, f"API returned status code {r.status_code}: {r.text}", [], None
+        
+        data = r.json()
+        return True, None, data.get('whoisRecords') or [], data.get('recordsLeft', 0)
+    except requests.exceptions.RequestException as e:
+        return False, f"Request error: {str(e)}", [], None
+    except json.JSONDecodeError as e:
+        return False, f"Invalid JSON response: {str(e)}", [], None
+
+def bulk_get_domain_details(domains, api_key):
+    """
+    Fetch WHOIS details for many domains through the bulk WHOIS API.
+    
+    All chunks are submitted up front and then polled together, so a whole
+    result set costs a few requests per chunk instead of one per domain. Records
+    go through the same normalizer and enrichment as single lookups.
+    
+    Returns:
+        tuple: (details by domain, error message by domain)
+    """
+    details = {}
+    errors = {}
+    pending = {}
+    
+    for chunk in chunk_rows(domains, BULK_WHOIS_CHUNK_SIZE):
+        success, error, request_id = submit_bulk_whois(chunk, api_key)
+        if not success:
+            errors.update((domain, error) for domain in chunk)
+            continue
+        pending[request_id] = {'domains': set(chunk), 'next_index': 1, 'failures': 0}
+    
+    logging.info(f"📦 Submitted {len(domains)} domains in {len(pending)} bulk WHOIS requests")
+    
+    give_up_at = time.monotonic() + BULK_WHOIS_TIMEOUT
+    while pending and time.monotonic() < give_up_at:
+        remaining = deadline_remaining()
+        if remaining is not None and remaining <= BULK_WHOIS_POLL_INTERVAL:
+            break
+        time.sleep(BULK_WHOIS_POLL_INTERVAL)
+        
+        for request_id, state in list(pending.items()):
+            success, error, records, records_left = poll_bulk_whois(
+                request_id, api_key, state['next_index'], len(state['domains'])
+            )
+            if not success:
+                state['failures'] += 1
+                if state['failures'] >= 3:
+                    errors.update((domain, error) for domain in state['domains'])
+                    del pending[request_id]
+                continue
+            
+            state['failures'] = 0
+            state['next_index'] += len(records)
+            for record in records:
+                domain = (record.get('domainName') or '').lower()
+                if domain not in state['domains']:
+                    continue
+                state['domains'].discard(domain)
+                if record.get('whoisRecord'):
+                    details[domain] = normalize_whois_record(record['whoisRecord'])
+                else:
+                    errors[domain] = record.get('whoisRecordStatus') or 'No WHOIS record returned'
+            
+            if not state['domains'] or (records_left == 0 and not records):
+                errors.update((domain, 'No WHOIS record returned') for domain in state['domains'])
+                del pending[request_id]
+    
+    for state in pending.values():
+        errors.update((domain, 'Timed out waiting for the bulk WHOIS API') for domain in state['domains'])
+    
+    # Network enrichment is per domain, but goes to DNS and geolocation services rather than the WHOIS API
+    with ThreadPoolExecutor(max_workers=BULK_WHOIS_ENRICH_WORKERS) as executor:
+        futures = [submit_with_context(executor, enrich_domain_details, domain, info) for domain, info in details.items()]
+        for future in futures:
+            future.result()
+    
+    return details, errors
+
+def cached_bulk_get_domain_details(domains, api_key):
+    """
+    Fetch WHOIS details for many domains, using the cache where possible and
+    the bulk WHOIS API for the rest. Fetched details are cached and indexed.
+    
+    Returns:
+        tuple: (details by domain, error message by domain, number of domains served from the cache)
+    """
+    details = {}
+    missing = []
+    for domain in OrderedDict.fromkeys(domain.lower() for domain in domains):
+        info = domain_info_cache.get(domain)
+        if info is not None:
+            details[domain] = info
+        else:
+            missing.append(domain)
+    cached = len(details)
+    
+    fetched, errors = bulk_get_domain_details(missing, api_key) if missing else ({}, {})
+    for domain, info in fetched.items():
+        if not info.get('partial'):
+            domain_info_cache.set(domain, info)
+            index_domain_details(domain, info)
+        details[domain] = info
+    
+    return details, errors, cached
+
+bulk_job_executor = ThreadPoolExecutor(max_workers=BULK_WHOIS_JOB_WORKERS, thread_name_prefix='bulk')
+
+def start_bulk_job(domains, api_key, include_details=False):
+    """
+    Queue a bulk WHOIS lookup on a background thread.
+    
+    The job is recorded in the database, so any worker process can report
+    its progress. Jobs older than BULK_WHOIS_JOB_TTL are dropped.
+    
+    Returns:
+        str: The job ID
+    """
+    job_id = secrets.token_hex(8)
+    now = time.time()
+    db = get_db()
+    with db:
+        db.execute("DELETE FROM bulk_jobs WHERE created_at < ?", (now - BULK_WHOIS_JOB_TTL,))
+        db.execute(
+            "INSERT INTO bulk_jobs (id, state, domain_count, created_at) VALUES (?, 'running', ?, ?)",
+            (job_id, len(domains), now)
+        )
+    bulk_job_executor.submit(run_bulk_job, job_id, domains, api_key, include_details)
+    return job_id
+
+def run_bulk_job(job_id, domains, api_key, include_details):
+    """Run a queued bulk WHOIS job and store its result"""
+    try:
+        details, errors, cached = cached_bulk_get_domain_details(domains, api_key)
+        state = 'done'
+        result = {
+            'requested': len(details) + len(errors),
+            'cached': cached,
+            'fetched': len(details) - cached,
+            'failed': errors,
+            'partial': any(info.get('partial') for info in details.values())
+        }
+        if include_details:
+            result['details'] = details
+    except Exception as e:
+        logging.exception(f"Unexpected error in bulk WHOIS job {job_id}")
+        state = 'failed'
+        result = {'message': f'An unexpected error occurred: {str(e)}'}
+    
+    db = get_db()
+    with db:
+        db.execute(
+            "UPDATE bulk_jobs SET state = ?, result = ?, finished_at = ? WHERE id = ?",
+            (state, json.dumps(result), time.time(), job_id)
+        )
+    logging.info(f"📦 Bulk WHOIS job {job_id} {state}")
+
+def get_bulk_job(job_id):
+    """
+    Get the state of a bulk WHOIS job, with its result once it has finished.
+    
+    A job still running long after BULK_WHOIS_TIMEOUT was lost with the
+    process that ran it and is reported as failed.
+    
+    Returns:
+        dict: The job, or None if there is no such job
+    """
+    row = get_db().execute("SELECT * FROM bulk_jobs WHERE id = ?", (job_id,)).fetchone()
+    if row is None:
+        return None
+    
+    job = {
+        'job_id': row['id'],
+        'state': row['state'],
+        'requested': row['domain_count'],
+        'created_at': format_timestamp(row['created_at']),
+        'finished_at': format_timestamp(row['finished_at'])
+    }
+    if row['result']:
+        job.update(json.loads(row['result']))
+    elif row['state'] == 'running' and time.time() - row['created_at'] > 2 * BULK_WHOIS_TIMEOUT:
+        job['state'] = 'failed'
+        job['message'] = 'The job was interrupted'
+    return job
+
+class TokenBucket:
+    """Token bucket rate limiter"""
+    
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+    
+    def acquire(self):
+        """
+        Take a token if one is available.
+        
+        Returns:
+            float: 0 if a token was taken, otherwise the seconds until one is available
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0
+            return (1 - self._tokens) / self.rate
+
+class SharedTokenBucket:
+    """Token bucket rate limiter whose state lives in the SQLite store, shared by all worker processes"""
+    
+    def __init__(self, name, rate, capacity):
+        self.name = name
+        self.rate = rate
+        self.capacity = capacity
+    
+    def acquire(self):
+        """
+        Take a token if one is available.
+        
+        Returns:
+            float: 0 if a token was taken, otherwise the seconds until one is available
+        """
+        db = get_db()
+        now = time.time()
+        # BEGIN IMMEDIATE takes the write lock up front so two workers can't spend the same token
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            row = db.execute("SELECT tokens, updated_at FROM rate_limits WHERE name = ?", (self.name,)).fetchone()
+            if row is None:
+                tokens = float(self.capacity)
+            else:
+                tokens = min(self.capacity, row['tokens'] + max(0, now - row['updated_at']) * self.rate)
+            
+            wait = 0 if tokens >= 1 else (1 - tokens) / self.rate
+            if wait == 0:
+                tokens -= 1
+            db.execute(
+                "INSERT OR REPLACE INTO rate_limits (name, tokens, updated_at) VALUES (?, ?, ?)",
+                (self.name, tokens, now)
+            )
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        return wait
+
+prefetch_queue = queue.PriorityQueue(maxsize=PREFETCH_QUEUE_SIZE)
+prefetch_budget = TokenBucket(PREFETCH_RATE, PREFETCH_BURST)
+_prefetch_queued = set()
+_prefetch_lock = threading.Lock()
+_prefetch_sequence = 0
+_prefetch_thread = None
+
+def prefetch_worker():
+    """Warm domain details for queued domains within the prefetch rate limit"""
+    while True:
+        priority, sequence, domain, api_key = prefetch_queue.get()
+        try:
+            # Skip domains that got cached, e.g. by the user opening them, while queued
+            if domain_info_cache.lookup(domain.lower()) is not None or circuit_open(WHOIS_API_URL):
+                continue
+            
+            wait = prefetch_budget.acquire()
+            while wait:
+                time.sleep(wait)
+                wait = prefetch_budget.acquire()
+            
+            success, info = load_domain_details(domain, api_key)
+            if success:
+                domain_info_cache.set(domain.lower(), info)
+        except Exception as e:
+            logging.error(f"❌ Error prefetching details for {domain}: {str(e)}")
+        finally:
+            with _prefetch_lock:
+                _prefetch_queued.discard(domain.lower())
+            prefetch_queue.task_done()
+
+def prefetch_domain_details(domains, api_key, priority=1):
+    """
+    Queue domains for background WHOIS and DNS enrichment.
+    
+    Domains that are already cached or queued are skipped, and domains that
+    don't fit in the queue are dropped.
+    
+    Returns:
+        int: Number of domains queued
+    """
+    global _prefetch_sequence, _prefetch_thread
+    queued = 0
+    
+    with _prefetch_lock:
+        if _prefetch_thread is None:
+            _prefetch_thread = threading.Thread(target=prefetch_worker, name='prefetch', daemon=True)
+            _prefetch_thread.start()
+        
+        for domain in domains[:PREFETCH_MAX_DOMAINS]:
+            cache_key = domain.lower()
+            if cache_key in _prefetch_queued or domain_info_cache.lookup(cache_key) is not None:
+                continue
+            
+            _prefetch_sequence += 1
+            try:
+                prefetch_queue.put_nowait((priority, _prefetch_sequence, domain, api_key))
+            except queue.Full:
+                break
+            _prefetch_queued.add(cache_key)
+            queued += 1
+    
+    return queued
+
+def iter_result_set(keyword, search_type='current'):
+    """
+    Get an iterator over the domains of a previously searched keyword.
+    
+    The in-memory search cache is used first, falling back to the latest
+    snapshot, which is decompressed lazily.
+    
+    Returns:
+        iterator: Domains in the result set, or None if the keyword hasn't been searched
+    """
+    cached = search_cache.get(get_query_plan_key(keyword, search_type))
+    if cached is not None:
+        return iter(cached[0])
+    
+    row = get_db().execute(
+        "SELECT domains FROM snapshots WHERE plan_key = ? ORDER BY created_at DESC, id DESC LIMIT 1",
+        (get_query_plan_key(keyword, search_type),)
+    ).fetchone()
+    if row is not None:
+        return iter_snapshot_domains(row['domains'])
+    
+    return None
+
+EXPORT_COLUMNS = ['domain']
+ENRICHED_EXPORT_COLUMNS = [
+    'domain', 'registrar', 'created', 'updated', 'expires',
+    'registrant_organization', 'registrant_email', 'registrant_country',
+    'nameservers', 'ip_address', 'country', 'asn',
+    'dns_a', 'dns_aaaa', 'dns_ns', 'dns_mx'
+]
+
+def get_cached_dns_answers(name, record_type):
+    """Join the cached DNS answers for a name, or return None if the record isn't cached"""
+    result = dns_cache.get((name, record_type))
+    if result is None:
+        return None
+    return ';'.join(answer.rstrip('.') for answer in result['answers'] if isinstance(answer, str))
+
+def get_export_row(domain, enrich=False):
+    """
+    Build an export row for a domain.
+    
+    Enrichment only reads cached domain details, DNS answers and geolocations
+    and never calls an API, so domains that haven't been looked up have empty
+    enrichment columns. Cached DNS answers fill in the IP address and its
+    geolocation when there are no cached domain details.
+    """
+    if not enrich:
+        return {'domain': domain}
+    
+    name = domain.lower().rstrip('.')
+    info = domain_info_cache.get(name) or {}
+    registrant = info.get('registrant') or {}
+    dns_a = get_cached_dns_answers(name, 'A')
+    ip_address = info.get('ip_address') or (dns_a.split(';')[0] if dns_a else None)
+    geolocation = info.get('geolocation') or (geo_ip_cache.get(ip_address) if ip_address else None) or {}
+    
+    return {
+        'domain': domain,
+        'registrar': info.get('registrar'),
+        'created': info.get('created'),
+        'updated': info.get('updated'),
+        'expires': info.get('expires'),
+        'registrant_organization': registrant.get('organization'),
+        'registrant_email': registrant.get('email'),
+        'registrant_country': registrant.get('country'),
+        'nameservers': ';'.join(info.get('nameservers') or []),
+        'ip_address': ip_address,
+        'country': geolocation.get('country'),
+        'asn': geolocation.get('asn'),
+        'dns_a': dns_a,
+        'dns_aaaa': get_cached_dns_answers(name, 'AAAA'),
+        'dns_ns': get_cached_dns_answers(name, 'NS'),
+        'dns_mx': get_cached_dns_answers(name, 'MX')
+    }
+
+def chunk_rows(rows, size):
+    """Group an iterator of rows into lists of at most `size` rows"""
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def export_csv(rows, columns):
+    """Stream rows as CSV, one chunk of rows at a time"""
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=columns)
+    writer.writeheader()
+    for chunk in chunk_rows(rows, EXPORT_CHUNK_ROWS):
+        writer.writerows(chunk)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue()
+
+def export_jsonl(rows, columns):
+    """Stream rows as newline-delimited JSON"""
+    for chunk in chunk_rows(rows, EXPORT_CHUNK_ROWS):
+        yield ''.join(json.dumps(row) + '\n' for row in chunk)
+
+def export_columnar(rows, columns):
+    """
+    Stream rows in a compact columnar format.
+    
+    Rows are grouped into row groups. Within each group every column is stored
+    as a zlib-compressed block of newline separated values, so repetitive
+    columns such as registrar or country compress well. Layout:
+    
+        magic, JSON header line,
+        per row group: uint32 row count, then per column: uint32 length + block,
+        uint32 0 terminator
+    
+    All integers are little endian. Use read_columnar_export to decode.
+    """
+    yield COLUMNAR_MAGIC
+    yield json.dumps({'columns': columns, 'row_group_size': EXPORT_ROW_GROUP_SIZE}).encode('utf-8') + b'\n'
+    
+    for chunk in chunk_rows(rows, EXPORT_ROW_GROUP_SIZE):
+        parts = [struct.pack('<I', len(chunk))]
+        for column in columns:
+            values = ('' if row.get(column) is None else str(row[column]).replace('\n', ' ') for row in chunk)
+            block = zlib.compress('\n'.join(values).encode('utf-8'))
+            parts.append(struct.pack('<I', len(block)))
+            parts.append(block)
+        yield b''.join(parts)
+    
+    yield struct.pack('<I', 0)
+
+def read_columnar_export(stream):
+    """
+    Read a columnar export produced by export_columnar.
+    
+    Args:
+        stream: Binary file-like object
+        
+    Yields:
+        dict: One row at a time, with empty values as None
+    """
+    if stream.read(len(COLUMNAR_MAGIC)) != COLUMNAR_MAGIC:
+        raise ValueError("Not a revwhoix columnar export")
+    
+    columns = json.loads(stream.readline())['columns']
+    while True:
+        (row_count,) = struct.unpack('<I', stream.read(4))
+        if row_count == 0:
+            return
+        
+        column_values = []
+        for _ in columns:
+            (length,) = struct.unpack('<I', stream.read(4))
+            column_values.append(zlib.decompress(stream.read(length)).decode('utf-8').split('\n'))
+        
+        for i in range(row_count):
+            yield {column: values[i] or None for column, values in zip(columns, column_values)}
+
+EXPORTERS = {
+    'csv': (export_csv, 'text/csv', 'csv'),
+    'jsonl': (export_jsonl, 'application/x-ndjson', 'jsonl'),
+    'columnar': (export_columnar, 'application/octet-stream', 'rwxcol')
+}
+
+def wants_compact_encoding():
+    """Check whether the client asked for the compact response encoding"""
+    if request.args.get('encoding') == 'compact':
+        return True
+    # The response now depends on the Accept header, see vary_on_accept
+    g.vary_accept = True
+    return request.accept_mimetypes[COMPACT_MIMETYPE] > request.accept_mimetypes['application/json']
+
+def compact_domains(domains):
+    """
+    Group domains by suffix with the shared suffix removed from each name.
+    
+    ['acme.com', 'acme.co.uk', 'getacme.com'] becomes
+    {'co.uk': ['acme'], 'com': ['acme', 'getacme']}
+    """
+    grouped = defaultdict(list)
+    for domain in domains:
+        name, _, suffix = domain.partition('.')
+        grouped[suffix].append(name)
+    return {suffix: sorted(names) for suffix, names in sorted(grouped.items())}
+
+def compact_value(value):
+    """Recursively drop empty values (None, empty strings, lists and dicts) from a response"""
+    if isinstance(value, dict):
+        compacted = {key: compact_value(item) for key, item in value.items()}
+        return {key: item for key, item in compacted.items() if item not in (None, '', [], {})}
+    if isinstance(value, list):
+        return [compact_value(item) for item in value]
+    return value
+
+def choose_content_encoding(available=None):
+    """
+    Pick the best supported compression for the request's Accept-Encoding header.
+    
+    Args:
+        available: Only consider these encodings, for bodies that were compressed ahead of time
+    """
+    accepted = request.accept_encodings
+    candidates = []
+    if zstandard is not None:
+        candidates.append('zstd')
+    if brotli is not None:
+        candidates.append('br')
+    candidates.append('gzip')
+    if available is not None:
+        candidates = [encoding for encoding in candidates if encoding in available]
+    
+    best = None
+    best_quality = 0
+    for encoding in candidates:
+        # Earlier candidates compress better, so they win ties
+        quality = accepted[encoding]
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+def compress_body(body, encoding):
+    """Compress a response body with the given content encoding"""
+    if encoding == 'zstd':
+        return zstandard.ZstdCompressor(level=3).compress(body)
+    if encoding == 'br':
+        return brotli.compress(body, quality=5)
+    return gzip.compress(body, compresslevel=6)
+
+def scan_quoted(source, start):
+    """Get the index just past the string literal starting at `start`"""
+    quote = source[start]
+    i = start + 1
+    while i < len(source):
+        if source[i] == '\\':
+            i += 2
+            continue
+        if source[i] == quote or source[i] == '\n':
+            return i + 1
+        i += 1
+    return len(source)
+
+def scan_template(source, start):
+    """
+    Get the end of a template literal chunk starting at `start`, which is
+    either the opening backtick or the `}` closing a substitution.
+    
+    Returns:
+        tuple: (index just past the chunk, whether it opened a ${...} substitution)
+    """
+    i = start + 1
+    while i < len(source):
+        if source[i] == '\\':
+            i += 2
+            continue
+        if source[i] == '`':
+            return i + 1, False
+        if source.startswith('${', i):
+            return i + 2, True
+        i += 1
+    return len(source), False
+
+def scan_regex(source, start):
+    """Get the index just past the regular expression literal starting at `start`"""
+    i = start + 1
+    in_class = False
+    while i < len(source) and source[i] != '\n':
+        c = source[i]
+        if c == '\\':
+            i += 2
+            continue
+        if c == '[':
+            in_class = True
+        elif c == ']':
+            in_class = False
+        elif c == '/' and not in_class:
+            i += 1
+            break
+        i += 1
+    while i < len(source) and (source[i].isalnum() or source[i] == '_'):
+        i += 1
+    return i
+
+JS_REGEX_KEYWORDS = ('return', 'typeof', 'case', 'do', 'else', 'in', 'of', 'new', 'delete', 'void', 'throw', 'yield', 'await', 'instanceof')
+JS_CONTROL_KEYWORDS = ('if', 'while', 'for', 'with')
+JS_BLOCK_KEYWORDS = ('else', 'do', 'try', 'finally')
+
+def is_word_char(c):
+    return c.isalnum() or c in '_$' or ord(c) > 127
+
+def minify_js(source):
+    """
+    Conservatively minify JavaScript.
+    
+    Comments, indentation and whitespace around punctuation are dropped, and
+    line breaks are only dropped where automatic semicolon insertion can't
+    depend on them. Strings, template literals and regular expressions are
+    copied untouched.
+    
+    A `/` starts a regular expression wherever an expression can start. After
+    `)` that is the case only when the parentheses belong to `if`, `while`,
+    `for` or `with`, and after `}` only when the braces closed a block rather
+    than an object literal.
+    """
+    out = []
+    last = ''          # Last character written
+    space = newline = False
+    regex_ok = True    # Whether a `/` here starts a regular expression
+    keyword = ''       # Keyword written just before the current token
+    parens = []        # For each open `(`, whether it follows a control keyword
+    braces = []        # For each open `{`, whether it opens a block
+    depth = 0          # Brace depth, to find the `}` that closes a template substitution
+    substitutions = []
+    i, n = 0, len(source)
+    
+    def write(token):
+        nonlocal last, space, newline
+        if out and newline and last not in '{[(,;' and token[0] not in '}]),;':
+            out.append('\n')
+        elif out and (space or newline):
+            if (is_word_char(last) and is_word_char(token[0])) or (last in '+-' and token[0] in '+-') \
+                    or (last == '/' and token[0] == '/') or (last.isdigit() and token[0] == '.'):
+                out.append(' ')
+        out.append(token)
+        last = token[-1]
+        space = newline = False
+    
+    while i < n:
+        c = source[i]
+        if c == '\n':
+            newline = True
+            i += 1
+        elif c.isspace():
+            space = True
+            i += 1
+        elif source.startswith('//', i):
+            end = source.find('\n', i)
+            i = n if end == -1 else end
+        elif source.startswith('/*', i):
+            end = source.find('*/', i + 2)
+            end = n if end == -1 else end + 2
+            if '\n' in source[i:end]:
+                newline = True
+            else:
+                space = True
+            i = end
+        elif c in '\'"':
+            end = scan_quoted(source, i)
+            write(source[i:end])
+            regex_ok = False
+            keyword = ''
+            i = end
+        elif c == '`' or (c == '}' and substitutions and substitutions[-1] == depth):
+            if c == '}':
+                substitutions.pop()
+                depth -= 1
+            end, opened = scan_template(source, i)
+            if opened:
+                depth += 1
+                substitutions.append(depth)
+            write(source[i:end])
+            regex_ok = opened
+            keyword = ''
+            i = end
+        elif c == '/' and regex_ok:
+            end = scan_regex(source, i)
+            write(source[i:end])
+            regex_ok = False
+            keyword = ''
+            i = end
+        elif is_word_char(c):
+            end = i + 1
+            while end < n and (is_word_char(source[end]) or (source[end] == '.' and source[i].isdigit())):
+                end += 1
+            # `x.return` is a property, not a keyword
+            keyword = source[i:end] if last != '.' else ''
+            regex_ok = keyword in JS_REGEX_KEYWORDS
+            write(source[i:end])
+            i = end
+        else:
+            if c == '(':
+                parens.append(keyword in JS_CONTROL_KEYWORDS)
+                regex_ok = True
+            elif c == ')':
+                regex_ok = parens.pop() if parens else False
+            elif c == '{':
+                depth += 1
+                braces.append(not out or last in '){};' or (last == '>' and out[-2:] == ['=', '>'])
+                              or keyword in JS_BLOCK_KEYWORDS)
+                regex_ok = True
+            elif c == '}':
+                depth -= 1
+                regex_ok = braces.pop() if braces else True
+            elif c == ']':
+                regex_ok = False
+            elif c in '+-' and last == c and not (space or newline):
+                # `a++ / b` divides, and `++/x/` is not valid
+                regex_ok = False
+            else:
+                regex_ok = True
+            write(c)
+            keyword = ''
+            i += 1
+    
+    return ''.join(out) + '\n'
+
+def minify_css(source):
+    """
+    Conservatively minify CSS by dropping comments, collapsing whitespace and
+    removing it around braces, semicolons, commas and child combinators.
+    Whitespace before a colon is kept, since it separates descendant selectors.
+    """
+    out = []
+    space = False
+    i, n = 0, len(source)
+    while i < n:
+        c = source[i]
+        if c.isspace():
+            space = True
+            i += 1
+        elif source.startswith('/*', i):
+            end = source.find('*/', i + 2)
+            i = n if end == -1 else end + 2
+            space = True
+        elif c in '\'"':
+            end = scan_quoted(source, i)
+            if space and out and out[-1][-1] not in '{};,>:':
+                out.append(' ')
+            out.append(source[i:end])
+            space = False
+            i = end
+        else:
+            if c == '}' and out and out[-1] == ';':
+                out.pop()
+            if space and out and out[-1][-1] not in '{};,>:' and c not in '{};,>':
+                out.append(' ')
+            out.append(c)
+            space = False
+            i += 1
+    return ''.join(out).strip() + '\n'
+
+ASSET_MINIFIERS = {'.css': minify_css, '.js': minify_js}
+
+# Built assets by source filename, and by fingerprinted filename for /assets
+asset_manifest = {}
+asset_files = {}
+
+def precompress(body):
+    """Compress an asset body ahead of time with every available codec, keeping only smaller variants"""
+    variants = {'gzip': gzip.compress(body, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        variants['br'] = brotli.compress(body, quality=11)
+    if zstandard is not None:
+        variants['zstd'] = zstandard.ZstdCompressor(level=19).compress(body)
+    return {encoding: data for encoding, data in variants.items() if len(data) < len(body)}
+
+def build_asset(filename):
+    """Minify, fingerprint and precompress one static asset"""
+    path = os.path.join(app.static_folder, filename)
+    mtime = os.path.getmtime(path)
+    with open(path, 'rb') as f:
+        body = f.read()
+    
+    root, ext = os.path.splitext(filename)
+    minifier = ASSET_MINIFIERS.get(ext)
+    if ASSET_MINIFY and minifier is not None:
+        body = minifier(body.decode('utf-8')).encode('utf-8')
+    
+    digest = hashlib.sha256(body).hexdigest()[:16]
+    return {
+        'source': filename,
+        'filename': f'{root}.{digest}{ext}',
+        'mimetype': ASSET_MIMETYPES.get(ext, 'application/octet-stream'),
+        'etag': digest,
+        'mtime': mtime,
+        'body': body,
+        'variants': precompress(body)
+    }
+
+def build_assets():
+    """Build every asset in ASSET_FILES. Assets that fail to build are served from /static as they are."""
+    for filename in ASSET_FILES:
+        try:
+            asset = build_asset(filename)
+        except (OSError, UnicodeDecodeError) as e:
+            logging.error(f"❌ Error building asset {filename}: {str(e)}")
+            continue
+        
+        previous = asset_manifest.get(filename)
+        if previous is not None:
+            asset_files.pop(previous['filename'], None)
+        asset_manifest[filename] = asset
+        asset_files[asset['filename']] = asset
+        sizes = ', '.join(f"{encoding} {len(data)}" for encoding, data in asset['variants'].items())
+        logging.info(f"📦 Built {asset['filename']}: {len(asset['body'])} bytes ({sizes})")
+
+def asset_url(filename):
+    """URL of a static asset, fingerprinted when the asset pipeline built it"""
+    asset = asset_manifest.get(filename)
+    if asset is not None and app.debug:
+        # Pick up edits to the source while developing
+        try:
+            if os.path.getmtime(os.path.join(app.static_folder, filename)) != asset['mtime']:
+                build_assets()
+                asset = asset_manifest.get(filename)
+        except OSError:
+            pass
+    if asset is None:
+        return url_for('static', filename=filename)
+    return url_for('serve_asset', filename=asset['filename'])
+
+@app.context_processor
+def inject_asset_url():
+    return {'asset_url': asset_url}
+
+def frame_label(code):
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+class StackSampler:
+    """
+    Sampling profiler for one thread.
+    
+    A background thread records the target thread's stack every `interval`
+    seconds. Samples are counted per stack, which is the collapsed-stack
+    format flame graph tools read.
+    """
+    
+    def __init__(self, interval=PROFILE_INTERVAL):
+        self.interval = interval
+        self.stacks = defaultdict(int)
+        self.samples = 0
+        self._thread_id = None
+        self._stop = threading.Event()
+        self._thread = None
+    
+    def start(self):
+        self._thread_id = threading.get_ident()
+        self._thread = threading.Thread(target=self._run, name='profile-sampler', daemon=True)
+        self._thread.start()
+    
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self._thread_id)
+            stack = []
+            while frame is not None:
+                stack.append(frame_label(frame.f_code))
+                frame = frame.f_back
+            if stack:
+                self.stacks[';'.join(reversed(stack))] += 1
+                self.samples += 1
+    
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+    
+    def save(self, path):
+        with open(path, 'w') as f:
+            for stack, count in sorted(self.stacks.items()):
+                f.write(f"{stack} {count}\n")
+    
+    def top_functions(self, limit=PROFILE_TOP_FUNCTIONS):
+        """Functions with the most samples at the top of the stack"""
+        counts = defaultdict(int)
+        for stack, count in self.stacks.items():
+            counts[stack.rsplit(';', 1)[-1]] += count
+        ranked = sorted(counts.items(), key=lambda item: -item[1])[:limit]
+        return [{'function': function, 'samples': count, 'share': round(count / max(self.samples, 1), 4)}
+                for function, count in ranked]
+
+class CallProfiler:
+    """Deterministic profiler for one request, built on cProfile"""
+    
+    def __init__(self):
+        self._profile = cProfile.Profile()
+        self.samples = None
+    
+    def start(self):
+        self._profile.enable()
+    
+    def stop(self):
+        self._profile.disable()
+    
+    def save(self, path):
+        self._profile.dump_stats(path)
+    
+    def top_functions(self, limit=PROFILE_TOP_FUNCTIONS):
+        """Functions with the most time spent in their own code"""
+        stats = pstats.Stats(self._profile).stats
+        ranked = sorted(stats.items(), key=lambda item: -item[1][2])[:limit]
+        return [{
+            'function': f"{name} ({os.path.basename(filename)}:{line})",
+            'calls': calls,
+            'own_seconds': round(own_time, 6),
+            'cumulative_seconds': round(cumulative_time, 6)
+        } for (filename, line, name), (_, calls, own_time, cumulative_time, _) in ranked]
+
+# cProfile can only run once at a time, so concurrent requests fall back to sampling
+_call_profiler_lock = threading.Lock()
+
+def save_profile(profiler, metadata):
+    """Write a profile and its metadata to PROFILE_DIR, pruning the oldest profiles"""
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    extension = 'prof' if metadata['mode'] == 'cprofile' else 'folded'
+    metadata['file'] = f"{metadata['id']}.{extension}"
+    profiler.save(os.path.join(PROFILE_DIR, metadata['file']))
+    metadata['top'] = profiler.top_functions()
+    with open(os.path.join(PROFILE_DIR, f"{metadata['id']}.json"), 'w') as f:
+        json.dump(metadata, f)
+    
+    profiles = sorted(name for name in os.listdir(PROFILE_DIR) if name.endswith('.json'))
+    for name in profiles[:max(0, len(profiles) - PROFILE_MAX_FILES)]:
+        profile_id = name[:-len('.json')]
+        for stale in os.listdir(PROFILE_DIR):
+            if stale.startswith(profile_id + '.'):
+                os.remove(os.path.join(PROFILE_DIR, stale))
+
+def list_profiles(limit=50):
+    """Get the metadata of the most recent profiles, newest first"""
+    if not os.path.isdir(PROFILE_DIR):
+        return []
+    names = sorted((name for name in os.listdir(PROFILE_DIR) if name.endswith('.json')), reverse=True)
+    profiles = []
+    for name in names[:limit]:
+        try:
+            with open(os.path.join(PROFILE_DIR, name)) as f:
+                profiles.append(json.load(f))
+        except (OSError, ValueError):
+            continue
+    return profiles
+
+def has_profile_token(environ):
+    token = environ.get('HTTP_X_PROFILE', '')
+    return bool(PROFILE_TOKEN) and hmac.compare_digest(token.encode('utf-8'), PROFILE_TOKEN.encode('utf-8'))
+
+class ProfilingMiddleware:
+    """
+    WSGI middleware that profiles opted-in requests from start to the last byte of the body.
+    
+    Wrapping the WSGI app rather than a view also covers request parsing,
+    after_request hooks such as compression, and streamed bodies.
+    """
+    
+    def __init__(self, wsgi_app):
+        self.wsgi_app = wsgi_app
+    
+    def choose_mode(self, environ):
+        """Get the profiling mode for a request, or None if it shouldn't be profiled"""
+        if environ.get('PATH_INFO', '').startswith('/api/profiles'):
+            return None
+        if has_profile_token(environ):
+            mode = environ.get('HTTP_X_PROFILE_MODE', PROFILE_MODE)
+            return mode if mode in PROFILE_MODES else PROFILE_MODE
+        if (PROFILE_SAMPLE_RATE > 0 and environ.get('PATH_INFO', '').startswith('/api/')
+                and random.random() < PROFILE_SAMPLE_RATE):
+            return PROFILE_MODE
+        return None
+    
+    def __call__(self, environ, start_response):
+        mode = self.choose_mode(environ)
+        if mode is None:
+            return self.wsgi_app(environ, start_response)
+        
+        if mode == 'cprofile' and _call_profiler_lock.acquire(blocking=False):
+            profiler = CallProfiler()
+        else:
+            mode = 'sample'
+            profiler = StackSampler()
+        
+        metadata = {
+            'id': f"{int(time.time() * 1000):013d}-{secrets.token_hex(4)}",
+            'method': environ.get('REQUEST_METHOD'),
+            'path': environ.get('PATH_INFO'),
+            'query': environ.get('QUERY_STRING', ''),
+            'mode': mode,
+            'created_at': time.time()
+        }
+        
+        def capture_start_response(status, headers, exc_info=None):
+            metadata['status'] = int(status.split(' ', 1)[0])
+            headers.append(('X-Profile-Id', metadata['id']))
+            return start_response(status, headers, exc_info)
+        
+        started = time.perf_counter()
+        profiler.start()
+        try:
+            body = self.wsgi_app(environ, capture_start_response)
+        except BaseException:
+            self.finish(profiler, metadata, started)
+            raise
+        return self.iterate(body, profiler, metadata, started)
+    
+    def iterate(self, body, profiler, metadata, started):
+        try:
+            for chunk in body:
+                yield chunk
+        finally:
+            if hasattr(body, 'close'):
+                body.close()
+            self.finish(profiler, metadata, started)
+    
+    def finish(self, profiler, metadata, started):
+        profiler.stop()
+        if isinstance(profiler, CallProfiler):
+            _call_profiler_lock.release()
+        metadata['duration_ms'] = round((time.perf_counter() - started) * 1000, 3)
+        metadata['samples'] = profiler.samples
+        try:
+            save_profile(profiler, metadata)
+            logging.info(f"🔬 Profiled {metadata['method']} {metadata['path']} in {metadata['duration_ms']}ms ({metadata['id']})")
+        except Exception as e:
+            logging.error(f"❌ Failed to save profile {metadata['id']}: {str(e)}")
+
+app.wsgi_app = ProfilingMiddleware(app.wsgi_app)
+
+@app.before_request
+def set_request_deadline():
+    """Start the request's time budget from the X-Request-Deadline-Ms header or deadline_ms parameter"""
+    deadline_ms = request.headers.get('X-Request-Deadline-Ms') or request.args.get('deadline_ms')
+    if deadline_ms is None and request.is_json:
+        # Bodies that aren't JSON objects are left for the route's own validation
+        body = request.get_json(silent=True)
+        if isinstance(body, dict):
+            deadline_ms = body.get('deadline_ms')
+    
+    try:
+        deadline_ms = int(deadline_ms) if deadline_ms is not None else REQUEST_DEADLINE_MS
+    except (TypeError, ValueError):
+        return jsonify({'status': 'error', 'message': 'deadline_ms must be a number of milliseconds'}), 400
+    
+    if deadline_ms > 0:
+        request_deadline.set(time.monotonic() + min(deadline_ms, MAX_REQUEST_DEADLINE_MS) / 1000)
+    else:
+        request_deadline.set(None)
+
+@app.after_request
+def vary_on_accept(response):
+    """Tell shared caches that a response chose its encoding from the Accept header"""
+    if g.get('vary_accept'):
+        response.vary.add('Accept')
+    return response
+
+@app.after_request
+def compress_response(response):
+    """Compress JSON API responses according to the client's Accept-Encoding"""
+    if (response.direct_passthrough or response.is_streamed
+            or response.status_code < 200 or response.status_code in (204, 304)
+            or 'Content-Encoding' in response.headers
+            or response.mimetype not in COMPRESS_MIMETYPES):
+        return response
+    
+    response.vary.add('Accept-Encoding')
+    
+    body = response.get_data()
+    if len(body) < COMPRESS_MIN_SIZE:
+        return response
+    
+    encoding = choose_content_encoding()
+    if encoding is None:
+        return response
+    
+    response.set_data(compress_body(body, encoding))
+    response.headers['Content-Encoding'] = encoding
+    return response
+
+@app.route('/')
+def index():
+    # The page is small and changes rarely, so browsers revalidate it and usually get a 304
+    response = make_response(render_template('index.html'))
+    response.add_etag(weak=True)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response.make_conditional(request)
+
+@app.route('/assets/<path:filename>')
+def serve_asset(filename):
+    """Serve a fingerprinted asset from memory, precompressed and cached for good"""
+    asset = asset_files.get(filename)
+    if asset is None:
+        return jsonify({'status': 'error', 'message': 'Asset not found'}), 404
+    
+    if request.if_none_match.contains_weak(asset['etag']):
+        response = Response(status=304)
+    else:
+        encoding = choose_content_encoding(asset['variants'])
+        body = asset['variants'].get(encoding)
+        if body is None:
+            response = Response(asset['body'], mimetype=asset['mimetype'])
+        else:
+            response = Response(body, mimetype=asset['mimetype'])
+            response.headers['Content-Encoding'] = encoding
+    
+    response.set_etag(asset['etag'], weak=True)
+    response.vary.add('Accept-Encoding')
+    response.headers['Cache-Control'] = f'public, max-age={ASSET_MAX_AGE}, immutable'
+    return response
+
+def encode_ipv4(ip_address):
+    """Encode a dotted IPv4 address as an integer, or return None for anything else"""
+    try:
+        return struct.unpack('!I', socket.inet_aton(ip_address))[0]
+    except (OSError, TypeError):
+        return None
+
+def decode_ipv4(value):
+    return socket.inet_ntoa(struct.pack('!I', value))
+
+def normalize_asn(asn):
+    if asn is None or asn == '':
+        return None
+    asn = str(asn).strip().upper()
+    return asn if asn.startswith('AS') else f'AS{asn}'
+
+def get_cached_infrastructure(domain):
+    """
+    Get the nameservers, IPv4 addresses and ASNs of a domain from the caches only.
+    
+    DNS answers are preferred, with the cached WHOIS details as a fallback.
+    
+    Returns:
+        tuple: (set of nameservers, set of integer IPv4 addresses, set of ASNs)
+    """
+    name = domain.lower().rstrip('.')
+    info = domain_info_cache.get(name) or {}
+    
+    ns_result = dns_cache.get((name, 'NS'))
+    nameservers = ns_result['answers'] if ns_result else info.get('nameservers') or []
+    nameservers = {ns.lower().rstrip('.') for ns in nameservers if isinstance(ns, str) and ns}
+    
+    a_result = dns_cache.get((name, 'A'))
+    addresses = a_result['answers'] if a_result else [info.get('ip_address')]
+    ips = {ip for ip in map(encode_ipv4, addresses) if ip is not None}
+    
+    asns = set()
+    for ip in ips:
+        location = geo_ip_cache.get(decode_ipv4(ip))
+        asn = normalize_asn(location.get('asn')) if location else None
+        if asn:
+            asns.add(asn)
+    if not asns and info.get('geolocation'):
+        asn = normalize_asn(info['geolocation'].get('asn'))
+        if asn:
+            asns.add(asn)
+    
+    return nameservers, ips, asns
+
+def cluster_domains(domains, min_size=CLUSTER_MIN_SIZE, max_groups=CLUSTER_MAX_GROUPS):
+    """
+    Group a result set by shared nameservers, IPs, /24 networks and ASNs.
+    
+    Only enrichment that is already cached is used, so domains that were never
+    looked up are counted as not covered rather than fetched. IPv4 addresses are
+    kept as integers, and each dimension is a hash join from key to domain indices.
+    
+    Returns:
+        dict: Groups per dimension, largest first, plus the number of domains covered
+    """
+    joins = {dimension: defaultdict(list) for dimension in CLUSTER_DIMENSIONS}
+    covered = 0
+    
+    for position, domain in enumerate(domains):
+        nameservers, ips, asns = get_cached_infrastructure(domain)
+        if nameservers or ips or asns:
+            covered += 1
+        
+        for nameserver in nameservers:
+            joins['nameserver'][nameserver].append(position)
+        for ip in ips:
+            joins['ip'][ip].append(position)
+        for prefix in {ip >> 8 for ip in ips}:
+            joins['prefix24'][prefix].append(position)
+        for asn in asns:
+            joins['asn'][asn].append(position)
+    
+    key_labels = {
+        'ip': decode_ipv4,
+        'prefix24': lambda prefix: f'{decode_ipv4(prefix << 8)}/24'
+    }
+    
+    clusters = {}
+    for dimension, join in joins.items():
+        groups = sorted(
+            ((key, positions) for key, positions in join.items() if len(positions) >= min_size),
+            key=lambda group: (-len(group[1]), str(group[0]))
+        )
+        label = key_labels.get(dimension, str)
+        clusters[dimension] = [
+            {'key': label(key), 'size': len(positions), 'domains': [domains[position] for position in positions]}
+            for key, positions in groups[:max_groups]
+        ]
+    
+    clusters['covered'] = covered
+    clusters['total'] = len(domains)
+    return clusters
+
+def search_success_response(keyword, domains, count, search_type='current', monitor=False, searched_keyword=None,
+                            liveness=None, liveness_deadline=LIVENESS_DEADLINE, prefetch=0, api_key=None,
+                            cluster=False):
+    """
+    Build the JSON response for a successful search.
+    
+    When monitoring, the result is recorded as a snapshot and only the
+    domains added or removed since the previous snapshot are returned.
+    When a liveness mode is given, the returned domains are swept and
+    annotated or filtered by their liveness status. With `prefetch`, the
+    details of the first `prefetch` returned domains are warmed in the background.
+    With `cluster`, the returned domains are grouped by shared infrastructure.
+    
+    Plain GET searches of a cached result set carry an ETag, and a request
+    whose If-None-Match matches it gets a 304 without the body being built.
+    """
+    searched_keyword = searched_keyword or keyword
+    etag = None
+    if request.method in ('GET', 'HEAD') and not (monitor or liveness or prefetch or cluster):
+        etag = search_etag(keyword, searched_keyword, search_type, api_key)
+        if etag and request.if_none_match.contains_weak(etag):
+            return not_modified_response(etag)
+    
+    response = {
+        'status': 'success',
+        'count': count,
+        'keyword': keyword,
+        'searched_keyword': searched_keyword,
+        'search_type': search_type
+    }
+    
+    if searched_keyword != keyword:
+        response['note'] = f"Results shown are for '{searched_keyword}'"
+    
+    if monitor:
+        response['monitor'] = True
+        response.update(record_snapshot(searched_keyword, domains, search_type))
+    else:
+        response['domains'] = domains
+    
+    if liveness:
+        remaining = deadline_remaining()
+        if remaining is not None:
+            liveness_deadline = max(0, min(liveness_deadline, remaining))
+        
+        field = 'added' if monitor else 'domains'
+        response[field], response['liveness'], response['liveness_summary'] = apply_liveness(
+            response[field], liveness, liveness_deadline
+        )
+        if liveness == 'filter' and not monitor:
+            response['count'] = len(response['domains'])
+        # Domains left unchecked because of the deadline are reported as unknown
+        response['partial'] = deadline_exceeded()
+    
+    if prefetch and api_key:
+        response['prefetched'] = prefetch_domain_details(response.get('domains') or response.get('added') or [],
+                                                         api_key, priority=2)
+    
+    if cluster:
+        response['clusters'] = cluster_domains(response.get('domains') or response.get('added') or [])
+    
+    if wants_compact_encoding():
+        response['encoding'] = 'compact'
+        for field in ('domains', 'added', 'removed'):
+            if field in response:
+                response[field] = compact_domains(response[field])
+    
+    response = jsonify(response)
+    if etag:
+        response.set_etag(etag, weak=True)
+        response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+def make_etag(*parts):
+    """Build an ETag from content hashes and everything else that changes the response body"""
+    return hashlib.blake2b(json.dumps(parts).encode('utf-8'), digest_size=16).hexdigest()
+
+def not_modified_response(etag):
+    """Empty 304 response for a client that already has the current representation"""
+    response = Response(status=304)
+    response.set_etag(etag, weak=True)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+def search_etag(keyword, searched_keyword, search_type, api_key):
+    """
+    ETag of a plain search response, from the content hash of its cached result set.
+    
+    Returns:
+        str: The ETag, or None if the result set isn't cached
+    """
+    cached = get_or_revalidate(search_cache, get_query_plan_key(searched_keyword, search_type),
+                               load_domains, searched_keyword, api_key, search_type)
+    if cached is None:
+        return None
+    domain_set, count = cached
+    return make_etag(keyword, searched_keyword, search_type, count, domain_set.digest, wants_compact_encoding())
+
+def deadline_exceeded_response():
+    """Response for a search that ran out of time before finding any domains"""
+    return jsonify({
+        'status': 'error',
+        'partial': True,
+        'message': 'The request deadline was reached before the search completed. Try again with a longer deadline.'
+    }), 504
+
+@app.route('/api/search', methods=['GET', 'POST'])
+def search():
+    """
+    Search for domains by keyword.
+    
+    POST takes every option as JSON. GET takes only `keyword`, `search_type`
+    and `try_alternative` as query parameters, and is the form to revalidate
+    with If-None-Match, since only GET and HEAD may answer 304.
+    """
+    try:
+        if request.method in ('GET', 'HEAD'):
+            data = {
+                'keyword': request.args.get('keyword', '').strip(),
+                'search_type': request.args.get('search_type', 'current'),
+                'try_alternative': request.args.get('try_alternative', '').lower() in ('1', 'true', 'yes')
+            }
+        else:
+            data = request.get_json() or {}  # Handle None case by providing empty dict
+        keyword = data.get('keyword', '')
+        
+        if not keyword:
+            return jsonify({'status': 'error', 'message': 'Keyword is required'}), 400
+        
+        search_type = data.get('search_type', 'current')
+        if search_type not in SEARCH_TYPES:
+            return jsonify({
+                'status': 'error',
+                'message': f"Invalid search_type '{search_type}'. Expected one of: {', '.join(SEARCH_TYPES)}"
+            }), 400
+        
+        # Monitored searches return only the changes since the last snapshot,
+        # so they always purchase a fresh result set instead of using the cache
+        monitor = bool(data.get('monitor', False))
+        fetch = fetch_domains if monitor else cached_fetch_domains
+        
+        # Optional liveness sweep of the result set
+        liveness = data.get('liveness')
+        if liveness is True:
+            liveness = 'annotate'
+        if liveness and liveness not in LIVENESS_MODES:
+            return jsonify({
+                'status': 'error',
+                'message': f"Invalid liveness mode '{liveness}'. Expected one of: {', '.join(LIVENESS_MODES)}"
+            }), 400
+        
+        try:
+            liveness_deadline = min(float(data.get('liveness_deadline', LIVENESS_DEADLINE)), LIVENESS_MAX_DEADLINE)
+        except (TypeError, ValueError):
+            return jsonify({'status': 'error', 'message': 'liveness_deadline must be a number of seconds'}), 400
+        
+        # Optionally warm domain details for the first page of results
+        try:
+            prefetch = min(max(int(data.get('prefetch', 0)), 0), PREFETCH_MAX_DOMAINS)
+        except (TypeError, ValueError):
+            return jsonify({'status': 'error', 'message': 'prefetch must be a number of domains'}), 400
+        
+        # Optionally group the results by shared infrastructure from cached enrichment
+        cluster = bool(data.get('cluster', False))
+        
+        # Get API key
+        api_key = get_api_key()
+        if not api_key:
+            return jsonify({
+                'status': 'error',
+                'message': 'API Key not found or invalid. Please check your environment variables.'
+            }), 400
+        
+        # Answer a revalidation of a cached result set before any preview or upstream call
+        if request.method in ('GET', 'HEAD') and request.if_none_match and not (monitor or liveness or prefetch or cluster):
+            etag = search_etag(keyword, keyword, search_type, api_key)
+            if etag and request.if_none_match.contains_weak(etag):
+                return not_modified_response(etag)
+        
+        # Try alternative search approaches if direct search fails
+        try_alternative = data.get('try_alternative', False)
+        
+        # Check if domains exist
+        exists, error_message = preview_domains(keyword, api_key, search_type)
+        
+        if not exists:
+            if deadline_exceeded():
+                return deadline_exceeded_response()
+            
+            # If this is already an alternative search and it failed, try one more approach
+            if try_alternative:
+                # Try removing common TLDs that might be part of the keyword
+                common_tlds = ['.com', '.org', '.net', '.io', '.co']
+                for tld in common_tlds:
+                    if keyword.lower().endswith(tld):
+                        if deadline_exceeded():
+                            return deadline_exceeded_response()
+                        alt_keyword = keyword[:-len(tld)]
+                        logging.info(f"🔄 Trying alternative search with '{alt_keyword}' after removing TLD")
+                        alt_exists, alt_error = preview_domains(alt_keyword, api_key, search_type)
+                        
+                        if alt_exists:
+                            # Found domains, proceed with fetching
+                            success, error, domains, count = fetch(alt_keyword, api_key, search_type)
+                            if success:
+                                return search_success_response(keyword, domains, count, search_type, monitor, alt_keyword,
+                                                               liveness, liveness_deadline, prefetch, api_key, cluster)
+                
+                # If all alternatives fail
+                return jsonify({
+                    'status': 'error',
+                    'message': 'No domains found even with alternative search methods. Please try a different keyword.'
+                }), 404
+            
+            # Try alternative search approach - if keyword has spaces, remove them
+            alternative_keyword = keyword.replace(" ", "")
+            if alternative_keyword != keyword:
+                logging.info(f"🔄 Trying alternative search with '{alternative_keyword}'")
+                alt_exists, alt_error = preview_domains(alternative_keyword, api_key, search_type)
+                
+                if alt_exists:
+                    # Found domains with alternative search, proceed with fetching
+                    success, error, domains, count = fetch(alternative_keyword, api_key, search_type)
+                    if success:
+                        return search_success_response(keyword, domains, count, search_type, monitor, alternative_keyword,
+                                                       liveness, liveness_deadline, prefetch, api_key, cluster)
+            
+            # If no alternative worked, try prefix/suffix modifications in the planner's order
+            for strategy, mod_keyword in fallback_planner.candidates(keyword, search_type):
+                if deadline_exceeded():
+                    return deadline_exceeded_response()
+                logging.info(f"🔄 Trying alternative search with '{mod_keyword}'")
+                mod_success, mod_error, mod_count = cached_preview_domain_count(mod_keyword, api_key, search_type)
+                if not mod_success:
+                    # Upstream failures say nothing about the strategy
+                    continue
+                mod_exists = mod_count > 0
+                fallback_planner.record(strategy, mod_exists)
+                
+                if mod_exists:
+                    # Found domains with modified keyword, proceed with fetching
+                    success, error, domains, count = fetch(mod_keyword, api_key, search_type)
+                    if success:
+                        return search_success_response(keyword, domains, count, search_type, monitor, mod_keyword,
+                                                       liveness, liveness_deadline, prefetch, api_key, cluster)
+            
+            # If no alternative worked or no alternatives to try
+            return jsonify({
+                'status': 'error',
+                'message': error_message or 'No domains found for this keyword'
+            }), 404
+        
+        # Fetch domains
+        success, error, domains, count = fetch(keyword, api_key, search_type)
+        if not success:
+            if deadline_exceeded():
+                return deadline_exceeded_response()
+            return jsonify({
+                'status': 'error',
+                'message': error or 'An error occurred while fetching domains'
+            }), 400
+        
+        return search_success_response(keyword, domains, count, search_type, monitor, None,
+                                       liveness, liveness_deadline, prefetch, api_key, cluster)
+        
+    except Exception as e:
+        logging.exception("Unexpected error in search endpoint")
+        return jsonify({
+            'status': 'error',
+            'message': f'An unexpected error occurred: {str(e)}'
+        }), 500
+
+@app.route('/api/search/batch', methods=['POST'])
+def search_batch():
+    try:
+        data = request.get_json() or {}
+        keywords = data.get('keywords', [])
+        
+        if not isinstance(keywords, list) or not keywords:
+            return jsonify({'status': 'error', 'message': 'A non-empty list of keywords is required'}), 400
+        
+        # Deduplicate while keeping the requested order
+        keywords = list(OrderedDict.fromkeys(
+            keyword.strip() for keyword in keywords if isinstance(keyword, str) and keyword.strip()
+        ))
+        
+        if not keywords:
+            return jsonify({'status': 'error', 'message': 'A non-empty list of keywords is required'}), 400
+        
+        if len(keywords) > BATCH_MAX_KEYWORDS:
+            return jsonify({
+                'status': 'error',
+                'message': f'At most {BATCH_MAX_KEYWORDS} keywords can be searched in one batch'
+            }), 400
+        
+        search_type = data.get('search_type', 'current')
+        if search_type not in SEARCH_TYPES:
+            return jsonify({
+                'status': 'error',
+                'message': f"Invalid search_type '{search_type}'. Expected one of: {', '.join(SEARCH_TYPES)}"
+            }), 400
+        
+        api_key = get_api_key()
+        if not api_key:
+            return jsonify({
+                'status': 'error',
+                'message': 'API Key not found or invalid. Please check your environment variables.'
+            }), 400
+        
+        def run_batch():
+            """Yield (keyword result, new domains) pairs as keywords complete"""
+            merged = {}
+            executor = ThreadPoolExecutor(max_workers=min(BATCH_MAX_WORKERS, len(keywords)))
+            futures = {
+                submit_with_context(executor, search_keyword, keyword, api_key, search_type): keyword
+                for keyword in keywords
+            }
+            pending = set(futures)
+            try:
+                for future in as_completed(futures, timeout=deadline_remaining()):
+                    pending.discard(future)
+                    keyword = futures[future]
+                    try:
+                        success, error, domains, count = future.result()
+                    except Exception as e:
+                        logging.error(f"❌ Error searching '{keyword}' in batch: {str(e)}")
+                        success, error, domains, count = False, str(e), None, 0
+                    
+                    result = {'keyword': keyword, 'status': 'success' if success else 'error', 'count': count}
+                    if success:
+                        result['domains'] = domains
+                        merge_domain_results(merged, keyword, domains)
+                    else:
+                        result['message'] = error
+                    yield result, merged
+            except FuturesTimeoutError:
+                # Report keywords that didn't finish in time instead of waiting for them
+                for future in pending:
+                    future.cancel()
+                    yield {
+                        'keyword': futures[future],
+                        'status': 'error',
+                        'count': 0,
+                        'message': 'Request deadline exceeded',
+                        'partial': True
+                    }, merged
+            finally:
+                executor.shutdown(wait=False, cancel_futures=True)
+        
+        def merged_domains(merged):
+            return [{'domain': domain, 'keywords': matched} for domain, matched in sorted(merged.items())]
+        
+        if data.get('stream', True):
+            def generate():
+                merged = {}
+                partial = False
+                for result, merged in run_batch():
+                    partial = partial or result.get('partial', False)
+                    yield json.dumps(dict(result, type='keyword')) + '\n'
+                yield json.dumps({
+                    'type': 'summary',
+                    'status': 'success',
+                    'search_type': search_type,
+                    'partial': partial,
+                    'count': len(merged),
+                    'domains': merged_domains(merged)
+                }) + '\n'
+            
+            return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+        
+        results = []
+        merged = {}
+        for result, merged in run_batch():
+            result.pop('domains', None)
+            results.append(result)
+        
+        return jsonify({
+            'status': 'success',
+            'search_type': search_type,
+            'partial': any(result.get('partial', False) for result in results),
+            'results': results,
+            'count': len(merged),
+            'domains': merged_domains(merged)
+        })
+        
+    except Exception as e:
+        logging.exception("Unexpected error in batch search endpoint")
+        return jsonify({
+            'status': 'error',
+            'message': f'An unexpected error occurred: {str(e)}'
+        }), 500
+
+@app.route('/api/domain-info', methods=['GET'])
+def domain_info():
+    try:
+        domain = request.args.get('domain', '')
+        
+        if not domain:
+            return jsonify({'status': 'error', 'message': 'Domain parameter is required'}), 400
+        
+        # Get API key
+        api_key = get_api_key()
+        if not api_key:
+            return jsonify({
+                'status': 'error',
+                'message': 'API Key not found or invalid. Please check your environment variables.'
+            }), 400
+        
+        # Fetch domain info
+        success, error, info = cached_get_domain_details(domain, api_key)
+        
+        if not success:
+            return jsonify({
+                'status': 'error',
+                'message': error or 'Failed to fetch domain information'
+            }), 400
+        
+        # Cached details carry a content hash. Partial and stale details are never revalidated.
+        compact = wants_compact_encoding()
+        etag = None
+        if info.get('content_hash') and not info.get('partial') and not info.get('stale'):
+            etag = make_etag(domain, info['content_hash'], compact)
+            if request.if_none_match.contains_weak(etag):
+                return not_modified_response(etag)
+        
+        if compact:
+            response = jsonify({
+                'status': 'success',
+                'encoding': 'compact',
+                'info': compact_value(info),
+                'domain': domain,
+                'partial': bool(info.get('partial')),
+                'stale': bool(info.get('stale'))
+            })
+        else:
+            response = jsonify({
+                'status': 'success',
+                'info': info,
+                'domain': domain,
+                'partial': bool(info.get('partial')),
+                'stale': bool(info.get('stale'))
+            })
+        
+        if etag:
+            response.set_etag(etag, weak=True)
+            response.headers['Cache-Control'] = 'no-cache'
+        return response
+        
+    except Exception as e:
+        logging.exception("Unexpected error in domain info endpoint")
+        return jsonify({
+            'status': 'error',
+            'message': f'An unexpected error occurred: {str(e)}'
+        }), 500
+
+@app.route('/api/pivot', methods=['GET'])
+def pivot():
+    """
+    Answer pivots from the WHOIS details cached so far, without a reverse WHOIS purchase.
+    
+    `field` and `value` list the domains sharing a contact email, organization,
+    nameserver or registrar. `domain` lists the pivots of one domain instead.
+    """
+    try:
+        domain = request.args.get('domain', '').strip()
+        if domain:
+            return jsonify({
+                'status': 'success',
+                'domain': domain,
+                'pivots': get_domain_pivots(domain)
+            })
+        
+        field = request.args.get('field', '').strip().lower()
+        value = request.args.get('value', '')
+        if field not in PIVOT_FIELDS:
+            return jsonify({
+                'status': 'error',
+                'message': f"field must be one of: {', '.join(PIVOT_FIELDS)}"
+            }), 400
+        if not value.strip():
+            return jsonify({'status': 'error', 'message': 'value parameter is required'}), 400
+        
+        try:
+            limit = min(max(int(request.args.get('limit', PIVOT_MAX_RESULTS)), 1), PIVOT_MAX_RESULTS)
+        except ValueError:
+            return jsonify({'status': 'error', 'message': 'limit must be an integer'}), 400
+        
+        normalized, domains, total = find_pivot_domains(field, value, limit)
+        return jsonify({
+            'status': 'success',
+            'field': field,
+            'value': normalized,
+            'domains': domains,
+            'count': total,
+            'truncated': total > len(domains)
+        })
+    
+    except Exception as e:
+        logging.exception("Unexpected error in pivot endpoint")
+        return jsonify({
+            'status': 'error',
+            'message': f'An unexpected error occurred: {str(e)}'
+        }), 500
+
+@app.route('/api/prefetch', methods=['POST'])
+def prefetch_domains():
+    try:
+        data = request.get_json() or {}
+        domains = data.get('domains', [])
+        
+        if not isinstance(domains, list) or not all(isinstance(domain, str) for domain in domains):
+            return jsonify({'status': 'error', 'message': 'domains must be a list of domain names'}), 400
+        
+        api_key = get_api_key()
+        if not api_key:
+            return jsonify({
+                'status': 'error',
+                'message': 'API Key not found or invalid. Please check your environment variables.'
+            }), 400
+        
+        domains = [domain.strip() for domain in domains if domain.strip()]
+        return jsonify({
+            'status': 'success',
+            'queued': prefetch_domain_details(domains, api_key)
+        }), 202
+        
+    except Exception as e:
+        logging.exception("Unexpected error in prefetch endpoint")
+        return jsonify({
+            'status': 'error',
+            'message': f'An unexpected error occurred: {str(e)}'
+        }), 500
+
+@app.route('/api/whois-dates', methods=['GET'])
+def whois_dates():
+    """
+    Find domains by creation, update or expiry date from the WHOIS details cached so far.
+    
+    `expires_within=N` finds domains expiring in the next N days and
+    `registered_since=DATE` domains created on or after DATE. Otherwise `field`
+    picks the date and `after`/`before` bound it. `keyword` or `watchlist=1`
+    limit the scan to a cached result set or to the watched keywords' latest snapshots.
+    """
+    try:
+        args = request.args
+        field = args.get('field', 'expires')
+        if field not in DATE_INDEX_FIELDS:
+            return jsonify({
+                'status': 'error',
+                'message': f"field must be one of: {', '.join(DATE_INDEX_FIELDS)}"
+            }), 400
+        
+        try:
+            start = end = None
+            if args.get('expires_within'):
+                field = 'expires'
+                start = time.time()
+                end = start + float(args['expires_within']) * 86400
+            elif args.get('registered_since'):
+                field = 'created'
+                start = parse_whois_date(args['registered_since'])
+                if start is None:
+                    raise ValueError
+            else:
+                if args.get('after'):
+                    start = parse_whois_date(args['after'])
+                    if start is None:
+                        raise ValueError
+                if args.get('before'):
+                    end = parse_whois_date(args['before'])
+                    if end is None:
+                        raise ValueError
+            limit = min(max(int(args.get('limit', DATE_INDEX_MAX_RESULTS)), 1), DATE_INDEX_MAX_RESULTS)
+        except ValueError:
+            return jsonify({
+                'status': 'error',
+                'message': 'Dates must look like YYYY-MM-DD, and expires_within and limit must be numbers'
+            }), 400
+        
+        scope = None
+        keyword = args.get('keyword', '').strip()
+        if keyword:
+            domains = iter_result_set(keyword, args.get('search_type', 'current'))
+            if domains is None:
+                return jsonify({
+                    'status': 'error',
+                    'message': f"No results for '{keyword}'. Search for it first."
+                }), 404
+            scope = set(domains)
+        elif args.get('watchlist') in ('1', 'true', 'yes'):
+            scope = get_watchlist_domains()
+        
+        matches, truncated = find_domains_by_date(field, start, end, scope, limit)
+        return jsonify({
+            'status': 'success',
+            'field': field,
+            'after': format_timestamp(start),
+            'before': format_timestamp(end),
+            'domains': matches,
+            'truncated': truncated
+        })
+    
+    except Exception as e:
+        logging.exception("Unexpected error in WHOIS dates endpoint")
+        return jsonify({
+            'status': 'error',
+            'message': f'An unexpected error occurred: {str(e)}'
+        }), 500
+
+@app.route('/api/domain-info/bulk', methods=['POST'])
+def bulk_domain_info():
+    """
+    Start enriching many domains at once through the bulk WHOIS API.
+    
+    The lookup runs as a background job, since the bulk API can take minutes.
+    Details end up in the same cache as /api/domain-info. Poll the returned
+    `status_url` for the result.
+    """
+    try:
+        data = request.get_json() or {}
+        domains = data.get('domains', [])
+        
+        if not isinstance(domains, list) or not all(isinstance(domain, str) for domain in domains):
+            return jsonify({'status': 'error', 'message': 'domains must be a list of domain names'}), 400
         
-        if r.status_code != 200:
-            logging.error(f"❌ WHOIS API returned status code {r.status_code}")
-            return False, f"API returned status code {r.status_code}: {r.text}", None
+        domains = [domain.strip() for domain in domains if domain.strip()]
+        if not domains:
+            return jsonify({'status': 'error', 'message': 'A non-empty list of domains is required'}), 400
+        if len(domains) > BULK_WHOIS_MAX_DOMAINS:
+            return jsonify({
+                'status': 'error',
+                'message': f'At most {BULK_WHOIS_MAX_DOMAINS} domains can be enriched in one request'
+            }), 400
         
-        response_data = r.json()
-        whois_record = response_data.get('WhoisRecord', {})
+        api_key = get_api_key()
+        if not api_key:
+            return jsonify({
+                'status': 'error',
+                'message': 'API Key not found or invalid. Please check your environment variables.'
+            }), 400
         
-        # Default values
-        domain_info = {
-            'created': None,
-            'updated': None,
-            'expires': None,
-            'registrar': None,
-            'nameservers': [],
-            'statuses': [],
-            'registrant': {
-                'name': None,
-                'organization': None,
-                'email': None,
-                'phone': None,
-                'country': None,
-                'state': None,
-                'city': None
-            },
-            'admin': {
-                'name': None,
-                'organization': None,
-                'email': None,
-                'phone': None,
-                'country': None,
-                'state': None,
-                'city': None
-            },
-            'tech': {
-                'name': None,
-                'organization': None,
-                'email': None,
-                'phone': None,
-                'country': None,
-                'state': None,
-                'city': None
-            },
-            'dnssec': None,
-            'rawText': whois_record.get('rawText', None)
-        }
+        job_id = start_bulk_job(domains, api_key, bool(data.get('include_details')))
+        return jsonify({
+            'status': 'success',
+            'job_id': job_id,
+            'state': 'running',
+            'requested': len(domains),
+            'status_url': url_for('bulk_domain_info_status', job_id=job_id)
+        }), 202
         
-        # Extract dates with better fallbacks
-        try:
-            domain_info['created'] = whois_record.get('createdDate')
-            domain_info['updated'] = whois_record.get('updatedDate')
-            domain_info['expires'] = whois_record.get('expiresDate')
-            
-            # If not found at top level, look in registryData
-            if 'registryData' in whois_record:
-                registry = whois_record['registryData']
-                if not domain_info['created']:
-                    domain_info['created'] = registry.get('createdDate')
-                if not domain_info['updated']:
-                    domain_info['updated'] = registry.get('updatedDate')
-                if not domain_info['expires']:
-                    domain_info['expires'] = registry.get('expiresDate')
-                    
-            # Additional fallbacks for dates
-            if not domain_info['created'] and 'createdDateNormalized' in whois_record:
-                domain_info['created'] = whois_record.get('createdDateNormalized')
-            if not domain_info['updated'] and 'updatedDateNormalized' in whois_record:
-                domain_info['updated'] = whois_record.get('updatedDateNormalized')
-            if not domain_info['expires'] and 'expiresDateNormalized' in whois_record:
-                domain_info['expires'] = whois_record.get('expiresDateNormalized')
-                
-            # More fallbacks from standardized data if available
-            if not domain_info['created'] and 'standardRegCreatedDate' in whois_record:
-                domain_info['created'] = whois_record.get('standardRegCreatedDate')
-            if not domain_info['updated'] and 'standardRegUpdatedDate' in whois_record:
-                domain_info['updated'] = whois_record.get('standardRegUpdatedDate')
-            if not domain_info['expires'] and 'standardRegExpiresDate' in whois_record:
-                domain_info['expires'] = whois_record.get('standardRegExpiresDate')
-                
-        except Exception as e:
-            logging.error(f"Error extracting dates: {str(e)}")
-            pass
+    except Exception as e:
+        logging.exception("Unexpected error in bulk domain info endpoint")
+        return jsonify({
+            'status': 'error',
+            'message': f'An unexpected error occurred: {str(e)}'
+        }), 500
+
+@app.route('/api/domain-info/bulk/<job_id>', methods=['GET'])
+def bulk_domain_info_status(job_id):
+    """Report the state of a bulk WHOIS job, with its result once it is done"""
+    try:
+        job = get_bulk_job(job_id)
+        if job is None:
+            return jsonify({'status': 'error', 'message': 'Bulk job not found'}), 404
+        return jsonify(dict(job, status='success'))
         
-        # Extract registrar information with better fallbacks
-        try:
-            domain_info['registrar'] = whois_record.get('registrarName')
-            
-            # If not found, check registryData
-            if not domain_info['registrar'] and 'registryData' in whois_record:
-                domain_info['registrar'] = whois_record['registryData'].get('registrarName')
-                
-            # Try another possible location
-            if not domain_info['registrar']:
-                if 'registrar' in whois_record and 'name' in whois_record['registrar']:
-                    domain_info['registrar'] = whois_record['registrar'].get('name')
-                elif 'registrarIANAID' in whois_record:
-                    domain_info['registrar'] = f"IANA ID: {whois_record['registrarIANAID']}"
-        except Exception:
-            pass
+    except Exception as e:
+        logging.exception("Unexpected error in bulk job status endpoint")
+        return jsonify({
+            'status': 'error',
+            'message': f'An unexpected error occurred: {str(e)}'
+        }), 500
+
+@app.route('/api/results', methods=['GET'])
+def search_results():
+    """
+    Page through, or look up domains in, the cached result set of a keyword.
+    
+    `prefix` and `contains` narrow the result set before paging with
+    `offset` and `limit`. Nothing is fetched from upstream.
+    """
+    try:
+        keyword = request.args.get('keyword', '').strip()
+        search_type = request.args.get('search_type', 'current')
+        prefix = request.args.get('prefix', '').strip()
+        contains = request.args.get('contains', '').strip()
         
-        # Extract nameservers
-        try:
-            if 'nameServers' in whois_record:
-                ns_data = whois_record['nameServers']
-                if 'hostNames' in ns_data:
-                    domain_info['nameservers'] = ns_data['hostNames']
-                elif isinstance(ns_data, list):
-                    domain_info['nameservers'] = ns_data
-                
-            # If not found, check registryData
-            if not domain_info['nameservers'] and 'registryData' in whois_record:
-                if 'nameServers' in whois_record['registryData']:
-                    ns_data = whois_record['registryData']['nameServers']
-                    if 'hostNames' in ns_data:
-                        domain_info['nameservers'] = ns_data['hostNames']
-                    elif isinstance(ns_data, list):
-                        domain_info['nameservers'] = ns_data
-        except Exception:
-            pass
+        if not keyword:
+            return jsonify({'status': 'error', 'message': 'Keyword parameter is required'}), 400
+        if search_type not in SEARCH_TYPES:
+            return jsonify({
+                'status': 'error',
+                'message': f"Invalid search_type '{search_type}'. Expected one of: {', '.join(SEARCH_TYPES)}"
+            }), 400
         
-        # Extract domain statuses
         try:
-            if 'status' in whois_record:
-                domain_info['statuses'] = whois_record['status']
-            elif 'registryData' in whois_record and 'status' in whois_record['registryData']:
-                domain_info['statuses'] = whois_record['registryData']['status']
-                
-            # Convert string to list if needed
-            if isinstance(domain_info['statuses'], str):
-                domain_info['statuses'] = [domain_info['statuses']]
-        except Exception:
-            pass
+            offset = max(int(request.args.get('offset', 0)), 0)
+            limit = min(max(int(request.args.get('limit', RESULTS_PAGE_SIZE)), 1), RESULTS_MAX_PAGE_SIZE)
+        except ValueError:
+            return jsonify({'status': 'error', 'message': 'offset and limit must be integers'}), 400
         
-        # Extract contact information (registrant, admin, technical)
-        contacts = ['registrant', 'admin', 'tech']
-        for contact_type in contacts:
-            try:
-                # Try in main record
-                contact_key = f"{contact_type}Contact"
-                if contact_key in whois_record:
-                    contact = whois_record[contact_key]
-                    domain_info[contact_type]['name'] = contact.get('name')
-                    domain_info[contact_type]['organization'] = contact.get('organization')
-                    domain_info[contact_type]['email'] = contact.get('email')
-                    domain_info[contact_type]['phone'] = contact.get('telephone')
-                    domain_info[contact_type]['country'] = contact.get('country')
-                    domain_info[contact_type]['state'] = contact.get('state')
-                    domain_info[contact_type]['city'] = contact.get('city')
-                
-                # Try in registryData
-                elif 'registryData' in whois_record and contact_key in whois_record['registryData']:
-                    contact = whois_record['registryData'][contact_key]
-                    domain_info[contact_type]['name'] = contact.get('name')
-                    domain_info[contact_type]['organization'] = contact.get('organization')
-                    domain_info[contact_type]['email'] = contact.get('email')
-                    domain_info[contact_type]['phone'] = contact.get('telephone')
-                    domain_info[contact_type]['country'] = contact.get('country')
-                    domain_info[contact_type]['state'] = contact.get('state')
-                    domain_info[contact_type]['city'] = contact.get('city')
-                    
-                # The second-level contacts format 
-                elif contact_type in whois_record:
-                    contact = whois_record[contact_type]
-                    domain_info[contact_type]['name'] = contact.get('name')
-                    domain_info[contact_type]['organization'] = contact.get('organization')
-                    domain_info[contact_type]['email'] = contact.get('email')
-                    domain_info[contact_type]['phone'] = contact.get('telephone')
-                    domain_info[contact_type]['country'] = contact.get('country')
-                    domain_info[contact_type]['state'] = contact.get('state')
-                    domain_info[contact_type]['city'] = contact.get('city')
-            except Exception as e:
-                logging.error(f"Error extracting {contact_type} contact information: {str(e)}")
-                pass  # Continue processing other contacts even if one fails
+        cached = search_cache.get(get_query_plan_key(keyword, search_type))
+        if cached is None:
+            return jsonify({
+                'status': 'error',
+                'message': f"No cached results for '{keyword}'. Search for it first."
+            }), 404
         
-        # DNSSEC information
-        try:
-            domain_info['dnssec'] = whois_record.get('dnssec')
-            if not domain_info['dnssec'] and 'registryData' in whois_record:
-                domain_info['dnssec'] = whois_record['registryData'].get('dnssec')
-        except Exception:
-            pass
-            
-        # Additional technical information
-        ip_address = get_domain_ip(domain)
-        domain_info['ip_address'] = ip_address
-        domain_info['geolocation'] = get_geolocation(ip_address)
-        domain_info['dns_records'] = get_dns_records(domain)
+        domain_set = cached[0]
+        if prefix or contains:
+            matches = domain_set.with_prefix(prefix) if prefix else domain_set.containing(contains)
+            if prefix and contains:
+                matches = [domain for domain in matches if contains.lower() in domain]
+            matched = len(matches)
+            domains = matches[offset:offset + limit]
+        else:
+            matched = len(domain_set)
+            domains = list(domain_set[offset:offset + limit])
+        
+        response = {
+            'status': 'success',
+            'keyword': keyword,
+            'search_type': search_type,
+            'total': len(domain_set),
+            'matched': matched,
+            'offset': offset,
+            'limit': limit,
+            'domains': domains
+        }
+        if wants_compact_encoding():
+            response['encoding'] = 'compact'
+            response['domains'] = compact_domains(domains)
+        return jsonify(response)
         
-        # Check if domain is available (should always be registered if we have WHOIS data)
-        domain_info['is_registered'] = True
-        
-        # Extract important dates from raw text for additional fallback
-        if not domain_info['created'] or not domain_info['updated'] or not domain_info['expires']:
-            raw_text = domain_info['rawText']
-            if raw_text:
-                for line in raw_text.split('\n'):
-                    line = line.lower()
-                    if not domain_info['created'] and ('creation date' in line or 'created on' in line or 'created:' in line):
-                        try:
-                            domain_info['created'] = line.split(':', 1)[1].strip()
-                        except:
-                            pass
-                    if not domain_info['updated'] and ('updated date' in line or 'updated on' in line or 'updated:' in line):
-                        try:
-                            domain_info['updated'] = line.split(':', 1)[1].strip()
-                        except:
-                            pass
-                    if not domain_info['expires'] and ('expiration date' in line or 'expires on' in line or 'expires:' in line):
-                        try:
-                            domain_info['expires'] = line.split(':', 1)[1].strip()
-                        except:
-                            pass
-        
-        return True, None, domain_info
-    
-    except requests.exceptions.RequestException as e:
-        logging.error(f"❌ WHOIS Request error: {str(e)}")
-        return False, f"Request error: {str(e)}", None
-    except json.JSONDecodeError as e:
-        logging.error(f"❌ Invalid JSON response from WHOIS API: {str(e)}")
-        return False, f"Invalid JSON response: {str(e)}", None
     except Exception as e:
-        logging.error(f"❌ Error occurred while fetching WHOIS data: {str(e)}")
-        return False, f"Error occurred while fetching domain details: {str(e)}", None
-
-@app.route('/')
-def index():
-    return render_template('index.html')
+        logging.exception("Unexpected error in results endpoint")
+        return jsonify({
+            'status': 'error',
+            'message': f'An unexpected error occurred: {str(e)}'
+        }), 500
 
-@app.route('/api/search', methods=['POST'])
-def search():
+@app.route('/api/export', methods=['GET'])
+def export_domains():
     try:
-        data = request.get_json() or {}  # Handle None case by providing empty dict
-        keyword = data.get('keyword', '')
+        keyword = request.args.get('keyword', '')
         
         if not keyword:
             return jsonify({'status': 'error', 'message': 'Keyword is required'}), 400
         
-        # Get API key
-        api_key = get_api_key()
-        if not api_key:
+        search_type = request.args.get('search_type', 'current')
+        if search_type not in SEARCH_TYPES:
             return jsonify({
                 'status': 'error',
-                'message': 'API Key not found or invalid. Please check your environment variables.'
+                'message': f"Invalid search_type '{search_type}'. Expected one of: {', '.join(SEARCH_TYPES)}"
             }), 400
         
-        # Try alternative search approaches if direct search fails
-        try_alternative = data.get('try_alternative', False)
+        export_format = request.args.get('format', 'csv')
+        if export_format not in EXPORT_FORMATS:
+            return jsonify({
+                'status': 'error',
+                'message': f"Invalid format '{export_format}'. Expected one of: {', '.join(EXPORT_FORMATS)}"
+            }), 400
         
-        # Check if domains exist
-        exists, error_message = preview_domains(keyword, api_key)
+        enrich = request.args.get('enrich', '').lower() in ('1', 'true', 'yes')
         
-        if not exists:
-            # If this is already an alternative search and it failed, try one more approach
-            if try_alternative:
-                # Try removing common TLDs that might be part of the keyword
-                common_tlds = ['.com', '.org', '.net', '.io', '.co']
-                for tld in common_tlds:
-                    if keyword.lower().endswith(tld):
-                        alt_keyword = keyword[:-len(tld)]
-                        logging.info(f"🔄 Trying alternative search with '{alt_keyword}' after removing TLD")
-                        alt_exists, alt_error = preview_domains(alt_keyword, api_key)
-                        
-                        if alt_exists:
-                            # Found domains, proceed with fetching
-                            success, error, domains, count = fetch_domains(alt_keyword, api_key)
-                            if success:
-                                return jsonify({
-                                    'status': 'success',
-                                    'domains': domains,
-                                    'count': count,
-                                    'keyword': keyword,
-                                    'note': f"Results shown are for '{alt_keyword}'"
-                                })
-                
-                # If all alternatives fail
-                return jsonify({
-                    'status': 'error',
-                    'message': 'No domains found even with alternative search methods. Please try a different keyword.'
-                }), 404
-            
-            # Try alternative search approach - if keyword has spaces, remove them
-            alternative_keyword = keyword.replace(" ", "")
-            if alternative_keyword != keyword:
-                logging.info(f"🔄 Trying alternative search with '{alternative_keyword}'")
-                alt_exists, alt_error = preview_domains(alternative_keyword, api_key)
-                
-                if alt_exists:
-                    # Found domains with alternative search, proceed with fetching
-                    success, error, domains, count = fetch_domains(alternative_keyword, api_key)
-                    if success:
-                        return jsonify({
-                            'status': 'success',
-                            'domains': domains,
-                            'count': count,
-                            'keyword': keyword,
-                            'note': f"Results shown are for '{alternative_keyword}'"
-                        })
-            
-            # If no alternative worked, try prefix/suffix modifications
-            modifications = [
-                f"{keyword}s",  # Try plural
-                f"{keyword}app",
-                f"{keyword}inc",
-                f"my{keyword}",
-                f"get{keyword}"
-            ]
-            
-            for mod_keyword in modifications:
-                logging.info(f"🔄 Trying alternative search with '{mod_keyword}'")
-                mod_exists, mod_error = preview_domains(mod_keyword, api_key)
-                
-                if mod_exists:
-                    # Found domains with modified keyword, proceed with fetching
-                    success, error, domains, count = fetch_domains(mod_keyword, api_key)
-                    if success:
-                        return jsonify({
-                            'status': 'success',
-                            'domains': domains,
-                            'count': count,
-                            'keyword': keyword,
-                            'note': f"Results shown are for '{mod_keyword}'"
-                        })
-            
-            # If no alternative worked or no alternatives to try
+        domains = iter_result_set(keyword, search_type)
+        if domains is None:
             return jsonify({
                 'status': 'error',
-                'message': error_message or 'No domains found for this keyword'
+                'message': 'No results found for this keyword. Run the search first.'
             }), 404
         
-        # Fetch domains
-        success, error, domains, count = fetch_domains(keyword, api_key)
-        if not success:
+        exporter, mimetype, extension = EXPORTERS[export_format]
+        columns = ENRICHED_EXPORT_COLUMNS if enrich else EXPORT_COLUMNS
+        rows = (get_export_row(domain, enrich) for domain in domains)
+        
+        safe_keyword = re.sub(r'[^A-Za-z0-9._-]+', '-', keyword).strip('-') or 'export'
+        filename = f"revwhoix-{safe_keyword}-{time.strftime('%Y-%m-%d')}.{extension}"
+        
+        return Response(
+            stream_with_context(exporter(rows, columns)),
+            mimetype=mimetype,
+            headers={'Content-Disposition': f'attachment; filename="{filename}"'}
+        )
+        
+    except Exception as e:
+        logging.exception("Unexpected error in export endpoint")
+        return jsonify({
+            'status': 'error',
+            'message': f'An unexpected error occurred: {str(e)}'
+        }), 500
+
+@app.route('/api/upstreams', methods=['GET'])
+def upstream_status():
+    with _circuit_breakers_lock:
+        breakers = list(circuit_breakers.values())
+    return jsonify({
+        'status': 'success',
+        'upstreams': [breaker.to_dict() for breaker in breakers]
+    })
+
+@app.route('/api/fallbacks', methods=['GET'])
+def fallback_status():
+    return jsonify(dict(fallback_planner.to_dict(), status='success'))
+
+@app.route('/api/profiles', methods=['GET'])
+def profiles():
+    """List recent request profiles. Requires the PROFILE_TOKEN in an X-Profile header."""
+    if not has_profile_token(request.environ):
+        return jsonify({'status': 'error', 'message': 'A valid X-Profile token is required'}), 403
+    try:
+        limit = min(max(int(request.args.get('limit', 50)), 1), PROFILE_MAX_FILES)
+    except ValueError:
+        return jsonify({'status': 'error', 'message': 'limit must be an integer'}), 400
+    return jsonify({'status': 'success', 'profiles': list_profiles(limit)})
+
+@app.route('/api/profiles/<profile_id>', methods=['GET'])
+def download_profile(profile_id):
+    """Download a profile: collapsed stacks for sampled profiles, pstats data for cProfile ones"""
+    if not has_profile_token(request.environ):
+        return jsonify({'status': 'error', 'message': 'A valid X-Profile token is required'}), 403
+    if not re.fullmatch(r'[0-9]+-[0-9a-f]+', profile_id):
+        return jsonify({'status': 'error', 'message': 'Invalid profile id'}), 400
+    for extension in ('folded', 'prof'):
+        if os.path.exists(os.path.join(PROFILE_DIR, f'{profile_id}.{extension}')):
+            return send_from_directory(PROFILE_DIR, f'{profile_id}.{extension}', as_attachment=True)
+    return jsonify({'status': 'error', 'message': 'Profile not found'}), 404
+
+@app.route('/api/watchlist', methods=['GET'])
+def list_watchlist():
+    try:
+        rows = get_db().execute("SELECT * FROM watchlist ORDER BY keyword").fetchall()
+        return jsonify({
+            'status': 'success',
+            'watchlist': [watch_to_dict(row) for row in rows]
+        })
+    except Exception as e:
+        logging.exception("Unexpected error in watchlist endpoint")
+        return jsonify({
+            'status': 'error',
+            'message': f'An unexpected error occurred: {str(e)}'
+        }), 500
+
+@app.route('/api/watchlist', methods=['POST'])
+def add_to_watchlist():
+    try:
+        data = request.get_json() or {}
+        keyword = data.get('keyword', '')
+        
+        if not keyword:
+            return jsonify({'status': 'error', 'message': 'Keyword is required'}), 400
+        
+        search_type = data.get('search_type', 'current')
+        if search_type not in SEARCH_TYPES:
             return jsonify({
                 'status': 'error',
-                'message': error or 'An error occurred while fetching domains'
+                'message': f"Invalid search_type '{search_type}'. Expected one of: {', '.join(SEARCH_TYPES)}"
+            }), 400
+        
+        try:
+            interval_seconds = int(data.get('interval_seconds', WATCHLIST_DEFAULT_INTERVAL))
+        except (TypeError, ValueError):
+            return jsonify({'status': 'error', 'message': 'interval_seconds must be an integer'}), 400
+        
+        if interval_seconds < WATCHLIST_MIN_INTERVAL:
+            return jsonify({
+                'status': 'error',
+                'message': f'interval_seconds must be at least {WATCHLIST_MIN_INTERVAL}'
             }), 400
         
         return jsonify({
             'status': 'success',
-            'domains': domains,
-            'count': count,
-            'keyword': keyword
+            'watch': add_watch(keyword, search_type, interval_seconds)
         })
         
     except Exception as e:
-        logging.exception("Unexpected error in search endpoint")
+        logging.exception("Unexpected error in watchlist endpoint")
         return jsonify({
             'status': 'error',
             'message': f'An unexpected error occurred: {str(e)}'
         }), 500
 
-@app.route('/api/domain-info', methods=['GET'])
-def domain_info():
+@app.route('/api/watchlist/<int:watch_id>', methods=['DELETE'])
+def remove_from_watchlist(watch_id):
     try:
-        domain = request.args.get('domain', '')
+        db = get_db()
+        with db:
+            cursor = db.execute("DELETE FROM watchlist WHERE id = ?", (watch_id,))
+            db.execute("DELETE FROM watchlist_runs WHERE watch_id = ?", (watch_id,))
         
-        if not domain:
-            return jsonify({'status': 'error', 'message': 'Domain parameter is required'}), 400
+        if cursor.rowcount == 0:
+            return jsonify({'status': 'error', 'message': 'Watchlist entry not found'}), 404
         
-        # Get API key
+        return jsonify({'status': 'success'})
+        
+    except Exception as e:
+        logging.exception("Unexpected error in watchlist endpoint")
+        return jsonify({
+            'status': 'error',
+            'message': f'An unexpected error occurred: {str(e)}'
+        }), 500
+
+@app.route('/api/watchlist/<int:watch_id>/runs', methods=['GET'])
+def list_watchlist_runs(watch_id):
+    try:
+        limit = min(request.args.get('limit', 20, type=int), 100)
+        rows = get_db().execute(
+            "SELECT * FROM watchlist_runs WHERE watch_id = ? ORDER BY ran_at DESC LIMIT ?", (watch_id, limit)
+        ).fetchall()
+        
+        runs = [{
+            'ran_at': row['ran_at'],
+            'status': row['status'],
+            'preview_count': row['preview_count'],
+            'purchased': bool(row['purchased']),
+            'added': json.loads(row['added'] or '[]'),
+            'removed': json.loads(row['removed'] or '[]'),
+            'message': row['message']
+        } for row in rows]
+        
+        return jsonify({'status': 'success', 'runs': runs})
+        
+    except Exception as e:
+        logging.exception("Unexpected error in watchlist endpoint")
+        return jsonify({
+            'status': 'error',
+            'message': f'An unexpected error occurred: {str(e)}'
+        }), 500
+
+@app.route('/api/watchlist/run', methods=['POST'])
+def run_watchlist():
+    """Run due watchlist entries now. Intended for cron triggers where no scheduler thread can run."""
+    try:
         api_key = get_api_key()
         if not api_key:
             return jsonify({
@@ -751,23 +5020,24 @@ def domain_info():
                 'message': 'API Key not found or invalid. Please check your environment variables.'
             }), 400
         
-        # Fetch domain info
-        success, error, info = get_domain_details(domain, api_key)
-        
-        if not success:
-            return jsonify({
-                'status': 'error',
-                'message': error or 'Failed to fetch domain information'
-            }), 400
+        data = request.get_json(silent=True)
+        if not isinstance(data, dict):
+            data = {}
+        try:
+            limit = int(data.get('limit', WATCHLIST_BATCH_SIZE))
+        except (TypeError, ValueError):
+            limit = 0
+        if limit < 1:
+            return jsonify({'status': 'error', 'message': 'limit must be a positive integer'}), 400
+        limit = min(limit, WATCHLIST_BATCH_SIZE)
         
         return jsonify({
             'status': 'success',
-            'info': info,
-            'domain': domain
+            'runs': run_due_watches(api_key, limit)
         })
         
     except Exception as e:
-        logging.exception("Unexpected error in domain info endpoint")
+        logging.exception("Unexpected error in watchlist endpoint")
         return jsonify({
             'status': 'error',
             'message': f'An unexpected error occurred: {str(e)}'
@@ -777,5 +5047,174 @@ def domain_info():
 def handler(event, context):
     return app(event["body"], context)
 
+def use_shared_state():
+    """Move the caches and the prefetch rate limit into the SQLite store so worker processes share them"""
+    global prefetch_budget, negative_preview_cache
+    for name in SHARED_CACHES:
+        cache = globals()[name]
+        if not isinstance(cache, SharedTTLCache):
+            globals()[name] = SharedTTLCache(name, cache.ttl, cache.max_entries, cache.soft_ttl)
+    if not isinstance(negative_preview_cache, SharedNegativeCache):
+        negative_preview_cache = SharedNegativeCache('negative_preview_cache', negative_preview_cache.ttl,
+                                                     negative_preview_cache.max_entries)
+    if not isinstance(prefetch_budget, SharedTokenBucket):
+        prefetch_budget = SharedTokenBucket('prefetch', PREFETCH_RATE, PREFETCH_BURST)
+    logging.info("🗄️ Using shared SQLite cache and rate limits")
+
+def reset_worker_state():
+    """Drop state inherited from the parent process that must not be shared with a forked worker"""
+    global _prefetch_thread
+    _db_local.conn = None
+    _prefetch_thread = None
+
+class PooledWSGIServer(BaseWSGIServer):
+    """WSGI server that handles requests on a fixed-size thread pool"""
+    
+    multithread = True
+    
+    def __init__(self, host, port, app, threads=SERVER_THREADS, fd=None):
+        super().__init__(host, port, app, fd=fd)
+        self._pool = ThreadPoolExecutor(max_workers=threads, thread_name_prefix='http')
+    
+    def process_request(self, request, client_address):
+        self._pool.submit(self._handle_request, request, client_address)
+    
+    def _handle_request(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+def serve_with_gunicorn(wsgi_app, host, port, workers, threads, post_fork=None):
+    """Run the app under gunicorn with threaded workers"""
+    from gunicorn.app.base import BaseApplication
+    
+    class StandaloneApplication(BaseApplication):
+        def load_config(self):
+            self.cfg.set('bind', f'{host}:{port}')
+            self.cfg.set('workers', workers)
+            self.cfg.set('threads', threads)
+            self.cfg.set('worker_class', 'gthread')
+            if post_fork:
+                self.cfg.set('post_fork', lambda server, worker: post_fork())
+        
+        def load(self):
+            return wsgi_app
+    
+    StandaloneApplication().run()
+
+def serve(wsgi_app, host='127.0.0.1', port=5000, workers=SERVER_WORKERS, threads=SERVER_THREADS, post_fork=None):
+    """
+    Run a production server with `workers` processes of `threads` threads each.
+    
+    Uses gunicorn when it is installed. Otherwise the listening socket is opened
+    here and shared by forked worker processes, each running a PooledWSGIServer.
+    Platforms without fork get a single threaded process.
+    
+    Args:
+        wsgi_app: The WSGI application to serve
+        host (str): Address to bind
+        port (int): Port to bind
+        workers (int): Number of worker processes
+        threads (int): Request threads per worker
+        post_fork (callable): Called in each worker process after it is forked
+    """
+    workers = max(1, workers)
+    threads = max(1, threads)
+    try:
+        import gunicorn  # noqa: F401
+    except ImportError:
+        gunicorn = None
+    if gunicorn is not None and hasattr(os, 'fork'):
+        logging.info(f"🚀 Starting gunicorn on {host}:{port} with {workers} workers x {threads} threads")
+        serve_with_gunicorn(wsgi_app, host, port, workers, threads, post_fork)
+        return
+    
+    if not hasattr(os, 'fork'):
+        workers = 1
+    
+    listener = socket.socket(socket.AF_INET6 if ':' in host else socket.AF_INET, socket.SOCK_STREAM)
+    listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    listener.bind((host, port))
+    listener.listen(1024)
+    # Workers all wait on the same socket; the ones that lose the race for a connection just go back to waiting
+    listener.setblocking(False)
+    logging.info(f"🚀 Serving on {host}:{port} with {workers} workers x {threads} threads")
+    
+    def run_worker():
+        server = PooledWSGIServer(host, port, wsgi_app, threads=threads, fd=listener.fileno())
+        server.multiprocess = workers > 1
+        try:
+            server.serve_forever()
+        finally:
+            server.server_close()
+    
+    if workers == 1:
+        run_worker()
+        return
+    
+    children = set()
+    for _ in range(workers):
+        pid = os.fork()
+        if pid == 0:
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            if post_fork:
+                post_fork()
+            try:
+                run_worker()
+            finally:
+                os._exit(0)
+        children.add(pid)
+    listener.close()
+    
+    def stop(signum, frame):
+        for pid in children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+    
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        except InterruptedError:
+            continue
+        children.discard(pid)
+        if os.WIFSIGNALED(status) and os.WTERMSIG(status) != signal.SIGTERM:
+            logging.error(f"❌ Worker {pid} died with signal {os.WTERMSIG(status)}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Run the Revwhoix web app')
+    parser.add_argument('--production', action='store_true',
+                        help='Run the multi-process production server instead of the debug server')
+    parser.add_argument('--host', default=os.environ.get('HOST', '127.0.0.1'))
+    parser.add_argument('--port', type=int, default=int(os.environ.get('PORT', '5000')))
+    parser.add_argument('--workers', type=int, default=SERVER_WORKERS, help='Worker processes')
+    parser.add_argument('--threads', type=int, default=SERVER_THREADS, help='Request threads per worker')
+    args = parser.parse_args(argv)
+    
+    if not args.production:
+        app.run(debug=True, host=args.host, port=args.port)
+        return
+    
+    if args.workers > 1:
+        use_shared_state()
+    serve(app, args.host, args.port, args.workers, args.threads, post_fork=reset_worker_state)
+
+build_assets()
+
+if SHARED_CACHE:
+    use_shared_state()
+
+if WATCHLIST_SCHEDULER:
+    start_watchlist_scheduler()
+
 if __name__ == '__main__':
-    app.run(debug=True)
+    main()
@@ -1,4 +1,4 @@
-from flask import Flask, render_template, request, jsonify
+from flask import Flask, render_template, request, jsonify, url_for
 import os
 import sys
 import json
@@ -287,6 +287,11 @@ def get_domain_details(domain, api_key):
         logging.error(f"❌ Error occurred while fetching WHOIS data: {str(e)}")
         return False, f"Error occurred while fetching domain details: {str(e)}", None
 
+@app.context_processor
+def inject_asset_url():
+    # The fingerprinted asset pipeline lives in api/index.py; this app serves the sources as they are
+    return {'asset_url': lambda filename: url_for('static', filename=filename)}
+
 @app.route('/')
 def index():
     return render_template('index.html')
@@ -451,4 +456,10 @@ def domain_info():
         }), 500
 
 if __name__ == '__main__':
-    app.run(debug=True)
+    if '--production' in sys.argv[1:]:
+        # The production server, with its shared caches and per-worker setup, runs the full app in
+        # api/index.py, whose main() defines and parses the server's command line flags
+        from api.index import main
+        main()
+    else:
+        app.run(debug=True)
@@ -0,0 +1,82 @@
+"""
+Local stand-in for the WhoisXML bulk WHOIS API.
+
+Implements `bulkWhois` and `getRecords` with made-up records that are
+"processed" at a fixed rate, so the bulk client can be exercised without
+spending API credits. Point the app at it with:
+
+    python benchmarks/bulk_whois_standin.py --port 8081
+    BULK_WHOIS_API_URL=http://127.0.0.1:8081 python api/index.py
+"""
+import argparse
+import threading
+import time
+import uuid
+
+from flask import Flask, jsonify, request
+
+app = Flask(__name__)
+
+# Records finished per second for each bulk request
+RECORDS_PER_SECOND = 200.0
+
+_requests = {}
+_lock = threading.Lock()
+
+
+def make_record(domain):
+    organization = domain.split('.')[0].title()
+    return {
+        'domainName': domain,
+        'createdDate': '2015-03-01T00:00:00Z',
+        'updatedDate': '2024-03-01T00:00:00Z',
+        'expiresDate': '2027-03-01T00:00:00Z',
+        'registrarName': 'Stand-in Registrar, Inc.',
+        'nameServers': {'hostNames': [f'ns1.{domain}', f'ns2.{domain}']},
+        'status': 'clientTransferProhibited',
+        'registrantContact': {'organization': organization, 'email': f'hostmaster@{domain}', 'country': 'US'},
+        'rawText': f'Domain Name: {domain}'
+    }
+
+
+@app.route('/bulkWhois', methods=['POST'])
+def bulk_whois():
+    data = request.get_json() or {}
+    domains = data.get('domains') or []
+    if not data.get('apiKey') or not domains:
+        return jsonify({'messageCode': 400, 'message': 'apiKey and domains are required'}), 400
+
+    request_id = uuid.uuid4().hex
+    with _lock:
+        _requests[request_id] = {'domains': [domain.lower() for domain in domains], 'submitted_at': time.time()}
+    return jsonify({'messageCode': 200, 'message': 'OK', 'requestId': request_id})
+
+
+@app.route('/getRecords', methods=['POST'])
+def get_records():
+    data = request.get_json() or {}
+    with _lock:
+        bulk = _requests.get(data.get('requestId'))
+    if bulk is None:
+        return jsonify({'messageCode': 404, 'message': 'Unknown requestId'}), 404
+
+    domains = bulk['domains']
+    done = min(len(domains), int((time.time() - bulk['submitted_at']) * RECORDS_PER_SECOND))
+    start = max(int(data.get('startIndex', 1)), 1) - 1
+    end = min(done, start + int(data.get('maxRecords', len(domains))))
+    records = [{
+        'domainName': domain,
+        'domainStatus': 'I',
+        'whoisRecordStatus': 'OK',
+        'whoisRecord': make_record(domain)
+    } for domain in domains[start:end]]
+    return jsonify({'recordsLeft': len(domains) - done, 'whoisRecords': records})
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Run a local stand-in for the bulk WHOIS API')
+    parser.add_argument('--port', type=int, default=8081)
+    parser.add_argument('--rate', type=float, default=RECORDS_PER_SECOND, help='Records processed per second')
+    args = parser.parse_args()
+    RECORDS_PER_SECOND = args.rate
+    app.run(port=args.port, threaded=True)
@@ -0,0 +1,115 @@
+"""
+Compare static and adaptive fallback candidate ordering against a local mock
+of the reverse WHOIS API.
+
+Every searched keyword has no domains of its own, so /api/search walks the
+fallback candidates. Each candidate strategy hits with a fixed probability.
+A share of the searches repeat an earlier keyword, whose candidates are then
+answered from the preview and negative caches.
+The benchmark reports the searches that found results and the upstream preview
+calls spent per successful search for static ordering, adaptive reordering,
+and adaptive ordering with pruning.
+
+Usage:
+    python benchmarks/fallback_ordering.py [--searches 2000] [--repeat-rate 0.3] [--seed 1]
+"""
+import argparse
+import json
+import logging
+import os
+import random
+import sys
+import tempfile
+
+os.environ.setdefault('WHOISXML_API_KEY', 'benchmark')
+os.environ['REVWHOIX_DATA_DIR'] = tempfile.mkdtemp(prefix='revwhoix-bench-')
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'api'))
+
+import requests  # noqa: E402
+
+import index  # noqa: E402
+
+# Chance that each strategy's candidate has domains, roughly what we see for brand names
+HIT_RATES = {'plural': 0.03, 'app': 0.08, 'inc': 0.01, 'my': 0.20, 'get': 0.35}
+
+
+class MockResponse:
+    status_code = 200
+
+    def __init__(self, data):
+        self._data = data
+        self.text = json.dumps(data)
+
+    def json(self):
+        return self._data
+
+
+class MockReverseWhois:
+    """Answers previews and purchases from a fixed table of candidate keywords with domains"""
+
+    def __init__(self):
+        self.live = {}
+        self.previews = 0
+
+    def request(self, method, url, json=None, **kwargs):
+        keyword = json['basicSearchTerms']['include'][0]
+        domains = self.live.get(keyword, [])
+        if json.get('mode') == 'preview':
+            self.previews += 1
+            return MockResponse({'domainsCount': len(domains)})
+        return MockResponse({'domainsCount': len(domains), 'domainsList': domains})
+
+
+def run(mode, searches, seed, prune=False, repeat_rate=0.0):
+    rng = random.Random(seed)
+    mock = MockReverseWhois()
+    requests.request = mock.request
+    index.preview_cache.clear()
+    index.search_cache.clear()
+    index.negative_preview_cache = index.NegativeCache(index.NEGATIVE_CACHE_TTL, index.NEGATIVE_CACHE_SIZE)
+    index.fallback_planner = index.FallbackPlanner(mode=mode, prune=prune)
+    random.seed(seed)
+    client = index.app.test_client()
+
+    successes = 0
+    keywords = []
+    for n in range(searches):
+        if keywords and rng.random() < repeat_rate:
+            keyword = rng.choice(keywords)
+        else:
+            keyword = f'brand{n}'
+            keywords.append(keyword)
+            for name, pattern in index.FALLBACK_STRATEGIES.items():
+                if rng.random() < HIT_RATES[name]:
+                    candidate = pattern.format(keyword=keyword)
+                    mock.live[candidate] = [f'{candidate}.com']
+        response = client.post('/api/search', json={'keyword': keyword})
+        successes += response.status_code == 200
+
+    return {
+        'mode': f'{mode}+prune' if prune else mode,
+        'searches': searches,
+        'successes': successes,
+        'previews': mock.previews,
+        'previews_per_success': round(mock.previews / max(successes, 1), 3),
+        'plan': index.fallback_planner.plan()
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--searches', type=int, default=2000)
+    parser.add_argument('--repeat-rate', type=float, default=0.3)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+    logging.disable(logging.CRITICAL)
+
+    for mode, prune in (('static', False), ('adaptive', False), ('adaptive', True)):
+        result = run(mode, args.searches, args.seed, prune, args.repeat_rate)
+        print(f"{result['mode']:>14}: {result['successes']}/{result['searches']} found, "
+              f"{result['previews']} previews, {result['previews_per_success']} per success, "
+              f"final order {', '.join(result['plan'])}")
+
+
+if __name__ == '__main__':
+    main()
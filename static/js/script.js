@@ -17,6 +17,7 @@ document.addEventListener('DOMContentLoaded', function() {
     const prevPageButton = document.getElementById('prevPage');
     const nextPageButton = document.getElementById('nextPage');
     const pageIndicator = document.getElementById('pageIndicator');
+    const paginationElement = document.querySelector('.pagination');
     const notification = document.getElementById('notification');
     const notificationText = document.getElementById('notificationText');
     
@@ -77,6 +78,35 @@ document.addEventListener('DOMContentLoaded', function() {
     let filteredDomains = [];
     let currentPage = 1;
     const domainsPerPage = 30;
+    let currentSearch = null;  // Keyword and search type of the server-side result set
+    
+    // Larger result sets are shown as one virtualized, scrollable grid instead of pages.
+    // Only the visible rows (plus a few above and below) are in the DOM, and their cards are reused.
+    const virtualThreshold = 300;
+    const virtualOverscan = 4;
+    const virtualRowEstimate = 60;
+    let virtualMode = false;
+    let virtualCards = [];
+    let virtualRange = null;
+    let virtualColumns = 1;
+    let virtualRowHeight = 0;
+    let virtualWidth = 0;
+    let virtualFrame = null;
+    
+    // Filtering is debounced, narrows the previous matches while the query only grows,
+    // and runs in a Web Worker for large result sets
+    const filterDelay = 150;
+    const filterWorkerThreshold = 20000;
+    let allDomainsLower = [];
+    let lastFilter = null;
+    let filterTimer = null;
+    let filterRequest = 0;
+    let filterWorker = null;
+    let filterWorkerLoaded = false;
+    
+    // Last response of recent searches with their ETag, reused when the server answers 304 Not Modified
+    const searchResponses = new Map();
+    const maxSearchResponses = 20;
     
     // Event Listeners
     searchButton.addEventListener('click', performSearch);
@@ -123,18 +153,28 @@ document.addEventListener('DOMContentLoaded', function() {
         hideAllContainers();
         loadingElement.style.display = 'flex';
         
-        // Make API request
-        fetch('/api/search', {
-            method: 'POST',
-            headers: {
-                'Content-Type': 'application/json'
-            },
-            body: JSON.stringify({ 
-                keyword,
-                try_alternative: tryAlternative 
-            })
-        })
+        // Make API request. Plain searches use GET so that they can be revalidated.
+        const params = new URLSearchParams({ keyword });
+        // Called as an event listener, tryAlternative is the event
+        if (tryAlternative === true) {
+            params.set('try_alternative', 'true');
+        }
+        const searchUrl = `/api/search?${params}`;
+        const previous = searchResponses.get(searchUrl);
+        const headers = {
+            // Ask for domains grouped by suffix, which is much smaller for large result sets
+            'Accept': 'application/vnd.revwhoix.compact+json, application/json;q=0.9'
+        };
+        if (previous) {
+            headers['If-None-Match'] = previous.etag;
+        }
+        
+        fetch(searchUrl, { headers })
         .then(response => {
+            if (response.status === 304 && previous) {
+                // Unchanged since the last time this search was run
+                return previous.data;
+            }
             if (!response.ok) {
                 if (response.status === 404) {
                     // Custom handling for "not found" errors
@@ -146,7 +186,22 @@ document.addEventListener('DOMContentLoaded', function() {
                     throw new Error(data.message || `HTTP error ${response.status}`);
                 });
             }
-            return response.json();
+            return response.json().then(data => {
+                if (data.encoding === 'compact') {
+                    data.domains = expandCompactDomains(data.domains);
+                    delete data.encoding;
+                }
+                
+                const etag = response.headers.get('ETag');
+                if (etag) {
+                    searchResponses.delete(searchUrl);
+                    searchResponses.set(searchUrl, { etag, data });
+                    if (searchResponses.size > maxSearchResponses) {
+                        searchResponses.delete(searchResponses.keys().next().value);
+                    }
+                }
+                return data;
+            });
         })
         .then(data => {
             // Hide loading
@@ -154,8 +209,12 @@ document.addEventListener('DOMContentLoaded', function() {
             
             if (data.status === 'success' && data.domains && data.domains.length > 0) {
                 // Update state
-                allDomains = data.domains;
+                setAllDomains(data.domains);
                 filteredDomains = [...allDomains];
+                currentSearch = {
+                    keyword: data.searched_keyword || data.keyword,
+                    searchType: data.search_type || 'current'
+                };
                 
                 // Update UI
                 searchKeywordElement.textContent = data.keyword;
@@ -166,11 +225,9 @@ document.addEventListener('DOMContentLoaded', function() {
                     showNotification(data.note, 'info');
                 }
                 
-                // Render domains
-                renderDomains();
-                
-                // Show results
+                // Show results, then render domains so the grid can be measured
                 resultsElement.style.display = 'block';
+                renderDomains();
                 
                 // Scroll to results with smooth animation
                 resultsElement.scrollIntoView({ behavior: 'smooth', block: 'start' });
@@ -203,13 +260,72 @@ document.addEventListener('DOMContentLoaded', function() {
         });
     }
     
+    function matchDomainIndices(domains, query, previous) {
+        // Indices of the domains containing the query. When the query only grew
+        // since the previous one, only the previous matches can still match.
+        const indices = [];
+        if (previous && query.includes(previous.query)) {
+            for (const index of previous.indices) {
+                if (domains[index].includes(query)) {
+                    indices.push(index);
+                }
+            }
+        } else {
+            for (let index = 0; index < domains.length; index++) {
+                if (domains[index].includes(query)) {
+                    indices.push(index);
+                }
+            }
+        }
+        return indices;
+    }
+    
+    function filterWorkerMain() {
+        // Runs inside the filter worker, which keeps its own copy of the domains and last matches
+        let domains = [];
+        let previous = null;
+        self.onmessage = (event) => {
+            const message = event.data;
+            if (message.type === 'load') {
+                domains = message.domains;
+                previous = null;
+                return;
+            }
+            const indices = matchDomainIndices(domains, message.query, previous);
+            previous = { query: message.query, indices };
+            const packed = Uint32Array.from(indices);
+            self.postMessage({ request: message.request, indices: packed }, [packed.buffer]);
+        };
+    }
+    
+    function expandCompactDomains(grouped) {
+        // Compact responses group domain names by their suffix: {"com": ["acme", "getacme"]}
+        const domains = [];
+        Object.keys(grouped || {}).forEach(suffix => {
+            grouped[suffix].forEach(name => {
+                domains.push(suffix ? `${name}.${suffix}` : name);
+            });
+        });
+        return domains;
+    }
+    
     function resetState() {
-        allDomains = [];
+        setAllDomains([]);
         filteredDomains = [];
         currentPage = 1;
+        currentSearch = null;
         filterInput.value = '';
     }
     
+    function setAllDomains(domains) {
+        allDomains = domains;
+        allDomainsLower = domains.map(domain => domain.toLowerCase());
+        lastFilter = null;
+        filterWorkerLoaded = false;
+        clearTimeout(filterTimer);
+        filterRequest++;
+    }
+    
     function hideAllContainers() {
         resultsElement.style.display = 'none';
         noResultsElement.style.display = 'none';
@@ -218,6 +334,12 @@ document.addEventListener('DOMContentLoaded', function() {
     }
     
     function renderDomains() {
+        if (filteredDomains.length > virtualThreshold) {
+            renderVirtualDomains(true);
+            return;
+        }
+        leaveVirtualMode();
+        
         // Clear grid
         domainsGrid.innerHTML = '';
         
@@ -256,15 +378,157 @@ document.addEventListener('DOMContentLoaded', function() {
             card.style.animationDelay = `${index * 0.05}s`;
             card.classList.add('fade-in');
         });
+        
+        prefetchDomainDetails(filteredDomains.slice(startIndex, endIndex));
+    }
+    
+    function enterVirtualMode() {
+        if (virtualMode) {
+            return;
+        }
+        virtualMode = true;
+        virtualCards = [];
+        virtualRange = null;
+        virtualRowHeight = 0;
+        domainsGrid.innerHTML = '';
+        domainsGrid.classList.add('virtual');
+        paginationElement.style.display = 'none';
+    }
+    
+    function leaveVirtualMode() {
+        if (!virtualMode) {
+            return;
+        }
+        virtualMode = false;
+        virtualCards = [];
+        virtualRange = null;
+        domainsGrid.classList.remove('virtual');
+        domainsGrid.style.paddingTop = '';
+        domainsGrid.style.paddingBottom = '';
+        domainsGrid.scrollTop = 0;
+        paginationElement.style.display = '';
+    }
+    
+    function measureVirtualGrid() {
+        // Cards have a fixed height in virtual mode, so one card gives the row height
+        if (virtualCards.length === 0) {
+            const card = createDomainCard(filteredDomains[0]);
+            virtualCards.push(card);
+            domainsGrid.appendChild(card);
+        }
+        const style = getComputedStyle(domainsGrid);
+        const gap = parseFloat(style.rowGap) || 0;
+        virtualColumns = Math.max(1, style.gridTemplateColumns.split(' ').length);
+        virtualWidth = domainsGrid.clientWidth;
+        // The grid can't be measured while the results are hidden, so estimate until it can
+        const cardHeight = virtualCards[0].offsetHeight;
+        virtualRowHeight = cardHeight > 0 ? cardHeight + gap : 0;
+    }
+    
+    function renderVirtualDomains(reset) {
+        enterVirtualMode();
+        if (reset) {
+            domainsGrid.scrollTop = 0;
+            virtualRange = null;
+        }
+        if (reset || !virtualRowHeight) {
+            measureVirtualGrid();
+        }
+        
+        const rowHeight = virtualRowHeight || virtualRowEstimate;
+        const rows = Math.ceil(filteredDomains.length / virtualColumns);
+        const firstRow = Math.max(0, Math.floor(domainsGrid.scrollTop / rowHeight) - virtualOverscan);
+        const lastRow = Math.min(rows, Math.ceil((domainsGrid.scrollTop + domainsGrid.clientHeight) / rowHeight) + virtualOverscan);
+        const start = firstRow * virtualColumns;
+        const end = Math.min(filteredDomains.length, lastRow * virtualColumns);
+        
+        if (virtualRange && virtualRange.start === start && virtualRange.end === end) {
+            return;
+        }
+        virtualRange = { start, end };
+        
+        // Padding stands in for the rows above and below the rendered ones
+        domainsGrid.style.paddingTop = `${firstRow * rowHeight}px`;
+        domainsGrid.style.paddingBottom = `${(rows - lastRow) * rowHeight}px`;
+        
+        for (let i = start; i < end; i++) {
+            const card = virtualCards[i - start];
+            if (card) {
+                setDomainCard(card, filteredDomains[i]);
+                card.hidden = false;
+            } else {
+                const newCard = createDomainCard(filteredDomains[i]);
+                virtualCards.push(newCard);
+                domainsGrid.appendChild(newCard);
+            }
+        }
+        for (let i = end - start; i < virtualCards.length; i++) {
+            virtualCards[i].hidden = true;
+        }
+        
+        // The grid only grows to its full height once the padding is in, so fill it on the next frame
+        if (lastRow < rows && (lastRow - firstRow) * rowHeight < domainsGrid.clientHeight) {
+            scheduleVirtualRender();
+        }
+        
+        prefetchDomainDetails(filteredDomains.slice(start, end));
+    }
+    
+    function scheduleVirtualRender() {
+        if (!virtualMode || virtualFrame) {
+            return;
+        }
+        virtualFrame = requestAnimationFrame(() => {
+            virtualFrame = null;
+            if (virtualMode) {
+                renderVirtualDomains(false);
+            }
+        });
+    }
+    
+    domainsGrid.addEventListener('scroll', scheduleVirtualRender, { passive: true });
+    
+    if (window.ResizeObserver) {
+        // Re-measure when the grid is first shown or its width changes the number of columns
+        new ResizeObserver(() => {
+            if (virtualMode && domainsGrid.clientWidth !== virtualWidth) {
+                virtualRowHeight = 0;
+                virtualRange = null;
+                scheduleVirtualRender();
+            }
+        }).observe(domainsGrid);
+    }
+    
+    let prefetchTimer = null;
+    
+    function prefetchDomainDetails(domains) {
+        // Ask the server to warm details for the visible page so opening a domain is fast.
+        // Debounced so quickly flipping through pages doesn't queue every page.
+        clearTimeout(prefetchTimer);
+        if (domains.length === 0) {
+            return;
+        }
+        
+        prefetchTimer = setTimeout(() => {
+            fetch('/api/prefetch', {
+                method: 'POST',
+                headers: {
+                    'Content-Type': 'application/json'
+                },
+                body: JSON.stringify({ domains })
+            }).catch(() => {
+                // Prefetching is best effort
+            });
+        }, 500);
     }
     
     function createDomainCard(domain) {
+        // Handlers read the card's current domain, so virtual mode can reuse the card for another one
         const card = document.createElement('div');
         card.className = 'domain-card';
         
         const domainName = document.createElement('div');
         domainName.className = 'domain-name';
-        domainName.textContent = domain;
         
         const actions = document.createElement('div');
         actions.className = 'domain-actions';
@@ -275,6 +539,7 @@ document.addEventListener('DOMContentLoaded', function() {
         copyBtn.title = 'Copy domain';
         copyBtn.addEventListener('click', (e) => {
             e.stopPropagation();
+            const domain = card.dataset.domain;
             navigator.clipboard.writeText(domain)
                 .then(() => showNotification(`Copied ${domain} to clipboard`))
                 .catch(() => showNotification('Failed to copy to clipboard', 'error'));
@@ -286,7 +551,7 @@ document.addEventListener('DOMContentLoaded', function() {
         visitBtn.title = 'Visit domain';
         visitBtn.addEventListener('click', (e) => {
             e.stopPropagation();
-            window.open(`https://${domain}`, '_blank');
+            window.open(`https://${card.dataset.domain}`, '_blank');
         });
         
         const detailsBtn = document.createElement('button');
@@ -295,7 +560,7 @@ document.addEventListener('DOMContentLoaded', function() {
         detailsBtn.title = 'View domain details';
         detailsBtn.addEventListener('click', (e) => {
             e.stopPropagation();
-            showDomainDetails(domain);
+            showDomainDetails(card.dataset.domain);
         });
         
         actions.appendChild(copyBtn);
@@ -307,28 +572,89 @@ document.addEventListener('DOMContentLoaded', function() {
         
         // Main card click opens the domain
         card.addEventListener('click', () => {
-            window.open(`https://${domain}`, '_blank');
+            window.open(`https://${card.dataset.domain}`, '_blank');
         });
         
+        setDomainCard(card, domain);
         return card;
     }
     
+    function setDomainCard(card, domain) {
+        const domainName = card.firstChild;
+        card.dataset.domain = domain;
+        domainName.textContent = domain;
+        domainName.title = domain;
+    }
+    
     function handleFilter() {
+        clearTimeout(filterTimer);
+        filterTimer = setTimeout(applyFilter, filterDelay);
+    }
+    
+    function applyFilter() {
         const filterValue = filterInput.value.toLowerCase();
+        const request = ++filterRequest;
         
-        if (filterValue) {
-            filteredDomains = allDomains.filter(domain => 
-                domain.toLowerCase().includes(filterValue)
-            );
-        } else {
-            filteredDomains = [...allDomains];
+        if (!filterValue) {
+            lastFilter = null;
+            showFilteredDomains([...allDomains]);
+            return;
+        }
+        
+        if (allDomains.length >= filterWorkerThreshold && getFilterWorker()) {
+            if (!filterWorkerLoaded) {
+                filterWorker.postMessage({ type: 'load', domains: allDomainsLower });
+                filterWorkerLoaded = true;
+            }
+            filterWorker.postMessage({ type: 'filter', request, query: filterValue });
+            return;
         }
         
+        const indices = matchDomainIndices(allDomainsLower, filterValue, lastFilter);
+        lastFilter = { query: filterValue, indices };
+        showFilteredDomains(indices.map(index => allDomains[index]));
+    }
+    
+    function showFilteredDomains(domains) {
+        filteredDomains = domains;
+        
         // Reset to first page when filtering
         currentPage = 1;
         renderDomains();
     }
     
+    function getFilterWorker() {
+        if (filterWorker !== null) {
+            return filterWorker;
+        }
+        
+        // The worker is built from this script's own functions, so there is no extra file to serve
+        try {
+            const source = `${matchDomainIndices.toString()}\n(${filterWorkerMain.toString()})();`;
+            const url = URL.createObjectURL(new Blob([source], { type: 'text/javascript' }));
+            filterWorker = new Worker(url);
+            URL.revokeObjectURL(url);
+        } catch (error) {
+            filterWorker = false;
+            return filterWorker;
+        }
+        
+        filterWorker.onmessage = (event) => {
+            // Drop answers to queries that have since been replaced
+            if (event.data.request !== filterRequest) {
+                return;
+            }
+            showFilteredDomains(Array.from(event.data.indices, index => allDomains[index]));
+        };
+        filterWorker.onerror = () => {
+            // Fall back to filtering on the page
+            filterWorker.terminate();
+            filterWorker = false;
+            applyFilter();
+        };
+        return filterWorker;
+    }
+    
     function goToPrevPage() {
         if (currentPage > 1) {
             currentPage--;
@@ -365,16 +691,46 @@ document.addEventListener('DOMContentLoaded', function() {
             return;
         }
         
+        // Unfiltered results are streamed by the server, including any cached WHOIS/DNS details.
+        // The server only has result sets it still caches, so check first and otherwise build the CSV here.
+        if (currentSearch && !filterInput.value) {
+            const params = new URLSearchParams({
+                keyword: currentSearch.keyword,
+                search_type: currentSearch.searchType,
+                format: 'csv',
+                enrich: '1'
+            });
+            const url = `/api/export?${params.toString()}`;
+            fetch(url, { method: 'HEAD' })
+                .then(response => {
+                    if (!response.ok) {
+                        throw new Error(`HTTP error ${response.status}`);
+                    }
+                    downloadFile(url);
+                    showNotification(`Exporting ${filteredDomains.length} domains as CSV`);
+                })
+                .catch(() => exportDomainsLocally());
+            return;
+        }
+        
+        exportDomainsLocally();
+    }
+    
+    function exportDomainsLocally() {
         const csvContent = 'data:text/csv;charset=utf-8,' + filteredDomains.join('\n');
-        const encodedUri = encodeURI(csvContent);
+        downloadFile(encodeURI(csvContent), `revwhoix-domains-${new Date().toISOString().split('T')[0]}.csv`);
+        
+        showNotification(`Exported ${filteredDomains.length} domains as CSV`);
+    }
+    
+    function downloadFile(href, filename = '') {
+        // The download attribute keeps the page from navigating away, even if the server answers with an error
         const link = document.createElement('a');
-        link.setAttribute('href', encodedUri);
-        link.setAttribute('download', `revwhoix-domains-${new Date().toISOString().split('T')[0]}.csv`);
+        link.setAttribute('href', href);
+        link.setAttribute('download', filename);
         document.body.appendChild(link);
         link.click();
         document.body.removeChild(link);
-        
-        showNotification(`Exported ${filteredDomains.length} domains as CSV`);
     }
     
     function showNotification(message, type = 'success') {
@@ -0,0 +1,8 @@
+import os
+import sys
+import tempfile
+
+# The app reads its settings at import time, so point its database at a
+# throwaway directory before any test imports it.
+os.environ.setdefault('REVWHOIX_DATA_DIR', tempfile.mkdtemp(prefix='revwhoix-tests-'))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
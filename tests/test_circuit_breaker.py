@@ -0,0 +1,184 @@
+import pytest
+import requests
+
+from api import index
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+    
+    def __call__(self):
+        return self.now
+
+
+class FakeResponse:
+    def __init__(self, status_code=200):
+        self.status_code = status_code
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(index.time, 'monotonic', clock)
+    return clock
+
+
+@pytest.fixture
+def settings(monkeypatch):
+    monkeypatch.setattr(index, 'CIRCUIT_WINDOW', 60)
+    monkeypatch.setattr(index, 'CIRCUIT_MIN_CALLS', 4)
+    monkeypatch.setattr(index, 'CIRCUIT_FAILURE_RATE', 0.5)
+    monkeypatch.setattr(index, 'CIRCUIT_SLOW_RATE', 0.5)
+    monkeypatch.setattr(index, 'CIRCUIT_SLOW_CALL', 5)
+    monkeypatch.setattr(index, 'CIRCUIT_COOLDOWN', 30)
+    monkeypatch.setattr(index, 'CIRCUIT_TRIAL_CALLS', 2)
+
+
+@pytest.fixture
+def breaker(clock, settings):
+    return index.CircuitBreaker('upstream.test')
+
+
+def open_breaker(breaker):
+    for _ in range(4):
+        assert breaker.allow_request()
+        breaker.record(True, 0.1)
+    assert breaker.state == breaker.OPEN
+
+
+def test_stays_closed_below_min_calls(breaker):
+    for _ in range(3):
+        breaker.record(True, 0.1)
+    assert breaker.state == breaker.CLOSED
+    assert breaker.allow_request()
+
+
+def test_opens_on_failure_rate(breaker):
+    breaker.record(False, 0.1)
+    breaker.record(False, 0.1)
+    breaker.record(True, 0.1)
+    assert breaker.state == breaker.CLOSED
+    breaker.record(True, 0.1)
+    assert breaker.state == breaker.OPEN
+    assert not breaker.allow_request()
+    assert breaker.is_open()
+
+
+def test_opens_on_slow_rate(breaker):
+    for duration in (0.1, 0.1, 6, 6):
+        breaker.record(False, duration)
+    assert breaker.state == breaker.OPEN
+
+
+def test_old_calls_leave_the_window(breaker, clock):
+    breaker.record(True, 0.1)
+    breaker.record(True, 0.1)
+    clock.now += 61
+    breaker.record(False, 0.1)
+    breaker.record(False, 0.1)
+    assert breaker.state == breaker.CLOSED
+    assert breaker.to_dict()['recent_calls'] == 2
+
+
+def test_half_open_trials_close_the_breaker(breaker, clock):
+    open_breaker(breaker)
+    clock.now += 31
+    assert not breaker.is_open()
+    assert breaker.allow_request()
+    assert breaker.state == breaker.HALF_OPEN
+    assert breaker.allow_request()
+    # Only CIRCUIT_TRIAL_CALLS trials at a time
+    assert not breaker.allow_request()
+    assert breaker.is_open()
+    
+    breaker.record(False, 0.1)
+    assert breaker.state == breaker.HALF_OPEN
+    breaker.record(False, 0.1)
+    assert breaker.state == breaker.CLOSED
+    assert breaker.to_dict()['recent_calls'] == 0
+
+
+def test_failed_trial_reopens(breaker, clock):
+    open_breaker(breaker)
+    clock.now += 31
+    assert breaker.allow_request()
+    breaker.record(False, 6)
+    assert breaker.state == breaker.OPEN
+    assert not breaker.allow_request()
+
+
+def test_release_gives_the_trial_slot_back(breaker, clock):
+    open_breaker(breaker)
+    clock.now += 31
+    assert breaker.allow_request()
+    assert breaker.allow_request()
+    breaker.release()
+    assert breaker.state == breaker.HALF_OPEN
+    assert breaker.allow_request()
+
+
+@pytest.fixture
+def upstream(monkeypatch, breaker):
+    monkeypatch.setitem(index.circuit_breakers, 'upstream.test', breaker)
+    
+    def call(outcome):
+        def fake_request(method, url, **kwargs):
+            if isinstance(outcome, BaseException):
+                raise outcome
+            return FakeResponse(outcome)
+        monkeypatch.setattr(index.requests, 'request', fake_request)
+        return index.upstream_request('GET', 'https://upstream.test/api')
+    
+    return call
+
+
+@pytest.mark.parametrize('outcome', [500, 429, requests.exceptions.ConnectionError('down')])
+def test_upstream_failures_reopen_a_half_open_breaker(upstream, breaker, clock, outcome):
+    open_breaker(breaker)
+    clock.now += 31
+    try:
+        upstream(outcome)
+    except requests.exceptions.RequestException:
+        pass
+    assert breaker.state == breaker.OPEN
+
+
+@pytest.mark.parametrize('outcome', [
+    RuntimeError('bug'),
+    requests.exceptions.InvalidURL('bad url'),
+    index.CircuitOpenError('nested'),
+])
+def test_errors_that_never_reached_the_upstream_release_the_trial(upstream, breaker, clock, outcome):
+    open_breaker(breaker)
+    clock.now += 31
+    for _ in range(3):
+        with pytest.raises(type(outcome)):
+            upstream(outcome)
+    assert breaker.state == breaker.HALF_OPEN
+    assert breaker.allow_request()
+
+
+def test_deadline_timeouts_are_not_recorded(upstream, breaker, clock):
+    open_breaker(breaker)
+    clock.now += 31
+    token = index.request_deadline.set(clock.now + 1)
+    try:
+        with pytest.raises(requests.exceptions.Timeout):
+            upstream(requests.exceptions.ReadTimeout('cut short'))
+    finally:
+        index.request_deadline.reset(token)
+    assert breaker.state == breaker.HALF_OPEN
+    assert breaker._trials_succeeded == 0
+    
+    with pytest.raises(requests.exceptions.Timeout):
+        upstream(requests.exceptions.ReadTimeout('upstream too slow'))
+    assert breaker.state == breaker.OPEN
+
+
+def test_successful_trials_close_through_upstream_request(upstream, breaker, clock):
+    open_breaker(breaker)
+    clock.now += 31
+    upstream(200)
+    upstream(404)
+    assert breaker.state == breaker.CLOSED
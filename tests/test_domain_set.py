@@ -0,0 +1,81 @@
+import json
+
+import pytest
+
+from api import index
+
+DOMAINS = ['Acme.com', 'getacme.com', 'acme.co.uk', 'acme.io', 'acme.com', 'localhost', 'zeta.com', 'acmeapp.io']
+
+
+@pytest.fixture
+def domain_set():
+    return index.CompactDomainSet(DOMAINS)
+
+
+def test_orders_by_last_label_then_domain_and_deduplicates(domain_set):
+    assert domain_set.to_list() == ['localhost', 'acme.com', 'getacme.com', 'zeta.com', 'acme.io', 'acmeapp.io',
+                                    'acme.co.uk']
+    assert len(domain_set) == 7
+
+
+def test_indexing(domain_set):
+    assert domain_set[0] == 'localhost'
+    assert domain_set[-1] == 'acme.co.uk'
+    assert [domain_set[i] for i in range(len(domain_set))] == domain_set.to_list()
+    with pytest.raises(IndexError):
+        domain_set[7]
+
+
+def test_membership_is_case_insensitive(domain_set):
+    assert 'ACME.com' in domain_set
+    assert 'localhost' in domain_set
+    assert 'acme.net' not in domain_set
+    assert 'acm.com' not in domain_set
+    assert 42 not in domain_set
+
+
+def test_pages_are_views_over_the_same_buffer(domain_set):
+    page = domain_set[1:4]
+    assert page.to_list() == ['acme.com', 'getacme.com', 'zeta.com']
+    assert page._names is domain_set._names
+    assert page[1:].to_list() == ['getacme.com', 'zeta.com']
+    assert 'zeta.com' in page and 'acme.io' not in page
+    assert domain_set.page(4, 100).to_list() == ['acme.io', 'acmeapp.io', 'acme.co.uk']
+    assert len(domain_set.page(4, 2)) == 0
+    with pytest.raises(ValueError):
+        domain_set[::2]
+
+
+def test_prefix_and_substring_search(domain_set):
+    assert domain_set.with_prefix('Acme') == ['acme.com', 'acme.io', 'acmeapp.io', 'acme.co.uk']
+    assert domain_set.containing('cme') == ['acme.com', 'getacme.com', 'acme.io', 'acmeapp.io', 'acme.co.uk']
+    assert domain_set.containing('e.c') == ['acme.com', 'getacme.com', 'acme.co.uk']
+    assert domain_set.containing('uk') == ['acme.co.uk']
+    assert domain_set.containing('io') == ['acme.io', 'acmeapp.io']
+    assert domain_set.containing('host') == ['localhost']
+
+
+def test_digest_depends_only_on_content(domain_set):
+    same = index.CompactDomainSet(reversed(DOMAINS))
+    assert same.digest == domain_set.digest
+    assert index.CompactDomainSet(DOMAINS + ['new.com']).digest != domain_set.digest
+    # A view hashes the same as a set built from its domains
+    assert domain_set[1:4].digest == index.CompactDomainSet(['acme.com', 'getacme.com', 'zeta.com']).digest
+
+
+def test_to_dict_round_trips_through_json(domain_set):
+    restored = index.CompactDomainSet.from_dict(json.loads(json.dumps(domain_set.to_dict())))
+    assert restored.to_list() == domain_set.to_list()
+    assert restored.digest == domain_set.digest
+    
+    page = index.CompactDomainSet.from_dict(json.loads(json.dumps(domain_set[3:6].to_dict())))
+    assert page.to_list() == ['zeta.com', 'acme.io', 'acmeapp.io']
+    assert page.digest == domain_set[3:6].digest
+
+
+def test_empty_set():
+    empty = index.CompactDomainSet(['', None])
+    assert len(empty) == 0
+    assert empty.to_list() == []
+    assert 'acme.com' not in empty
+    assert index.CompactDomainSet.from_dict(empty.to_dict()).to_list() == []
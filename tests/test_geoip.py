@@ -0,0 +1,113 @@
+import random
+
+import pytest
+
+from api import index
+
+
+ROWS = [
+    ('1.0.0.0', '1.0.0.255', 'AU', 'Queensland', 'Brisbane', '4000', '-27.47', '153.02', 'APNIC', '13335'),
+    ('1.0.4.0', '1.0.7.255', 'AU', 'Victoria', 'Melbourne', '', '-37.81', '144.96', '', ''),
+    ('8.8.8.0', '8.8.8.255', 'US', 'California', 'Mountain View', '94043', '37.42', '-122.08', 'Google LLC', '15169'),
+    ('100.0.0.0', '100.0.0.0', 'US', '', '', '', 'not-a-number', '', '', ''),
+    ('2001:db8::', '2001:db8::ffff', 'NL', 'North Holland', 'Amsterdam', '1012', '52.37', '4.90', 'Example, Inc.', '64496'),
+    ('2606:4700::', '2606:4700:ffff:ffff:ffff:ffff:ffff:ffff', 'US', '', 'San Francisco', '', '37.77', '-122.42', 'Cloudflare', '13335'),
+]
+
+
+def write_csv(path, rows, trailing_newline=True):
+    lines = ['start_ip,end_ip,' + ','.join(index.GEO_FIELDS)]
+    for row in rows:
+        lines.append(','.join('"%s"' % value if ',' in value else value for value in row))
+    path.write_text('\n'.join(lines) + ('\n' if trailing_newline else ''))
+    return str(path)
+
+
+@pytest.fixture(params=[True, False], ids=['trailing-newline', 'no-trailing-newline'])
+def database(tmp_path, request):
+    return index.GeoIPCsvDatabase(write_csv(tmp_path / 'geoip.csv', ROWS, request.param))
+
+
+def test_ip_sort_key_puts_ipv4_first():
+    addresses = ['2001:db8::1', '8.8.8.8', '::1', '1.0.0.1', '255.255.255.255']
+    assert sorted(addresses, key=index.ip_sort_key) == [
+        '1.0.0.1', '8.8.8.8', '255.255.255.255', '::1', '2001:db8::1',
+    ]
+
+
+@pytest.mark.parametrize('ip, city', [
+    ('1.0.0.0', 'Brisbane'),
+    ('1.0.0.255', 'Brisbane'),
+    ('1.0.5.17', 'Melbourne'),
+    ('8.8.8.8', 'Mountain View'),
+    ('2001:db8::1', 'Amsterdam'),
+    ('2606:4700:4700::1111', 'San Francisco'),
+])
+def test_lookup_finds_the_containing_range(database, ip, city):
+    assert database.lookup(ip)['city'] == city
+
+
+@pytest.mark.parametrize('ip', [
+    '0.255.255.255',
+    '1.0.1.0',
+    '8.8.9.0',
+    '100.0.0.1',
+    '255.255.255.255',
+    '::1',
+    '2001:db8::1:0',
+    'ffff::1',
+])
+def test_lookup_misses_gaps_and_out_of_range(database, ip):
+    assert database.lookup(ip) is None
+
+
+def test_lookup_parses_fields(database):
+    assert database.lookup('8.8.4.4') is None
+    location = database.lookup('8.8.8.8')
+    assert location == {
+        'country': 'US',
+        'region': 'California',
+        'city': 'Mountain View',
+        'postal': '94043',
+        'latitude': 37.42,
+        'longitude': -122.08,
+        'org': 'Google LLC',
+        'asn': '15169',
+    }
+
+
+def test_lookup_blanks_and_bad_coordinates(database):
+    melbourne = database.lookup('1.0.4.1')
+    assert melbourne['postal'] is None and melbourne['org'] is None
+    single = database.lookup('100.0.0.0')
+    assert single['country'] == 'US'
+    assert single['latitude'] is None and single['longitude'] is None
+
+
+def test_lookup_handles_quoted_commas(database):
+    assert database.lookup('2001:db8::ff')['org'] == 'Example, Inc.'
+
+
+def test_lookup_matches_a_linear_scan(tmp_path):
+    rng = random.Random(7)
+    starts = sorted(rng.sample(range(1000, 2 ** 32 - 1000, 1000), 300))
+    rows = []
+    for number, start in enumerate(starts):
+        end = start + rng.randint(0, 500)
+        rows.append((str(index.ipaddress.ip_address(start)), str(index.ipaddress.ip_address(end)),
+                     'C%d' % number, '', '', '', '', '', '', ''))
+    database = index.GeoIPCsvDatabase(write_csv(tmp_path / 'geoip.csv', rows))
+    
+    probes = [start + offset for start in starts[::7] for offset in (-1, 0, 250, 501)]
+    for probe in probes:
+        expected = None
+        for row in rows:
+            if index.ip_sort_key(row[0]) <= (4, probe) <= index.ip_sort_key(row[1]):
+                expected = row[2]
+        location = database.lookup(str(index.ipaddress.ip_address(probe)))
+        assert (location and location['country']) == expected
+
+
+def test_header_only_file(tmp_path):
+    database = index.GeoIPCsvDatabase(write_csv(tmp_path / 'geoip.csv', []))
+    assert database.lookup('8.8.8.8') is None
@@ -0,0 +1,110 @@
+import os
+import re
+import shutil
+import subprocess
+
+import pytest
+
+from api import index
+
+STATIC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'static')
+
+# Each case prints the same thing before and after minifying
+JS_CASES = [
+    "if (a) /b c/.test(x) ? r.push(1) : r.push(0);",
+    "r.push((a) / b / g);",
+    "r.push([a][0] / b);",
+    "var y = a; y++ / 2; r.push(y++ / 2);",
+    "function f() { return /a b/.source; } r.push(f());",
+    "{ }\n/x\\/y/.test('x/y') && r.push('block');",
+    "r.push({a: 1}.a / 2);",
+    "r.push(`t${a / b}u${ {k: 6}.k / 3 }`);",
+    "r.push(/[/]/.test('/'));",
+    "var o = {v: 8}; r.push(o.v / 2 / 2);",
+    "var h = (z) => { return z }\n/re g/.test('re g') && r.push('arrow');",
+    "r.push(typeof /q/);",
+    "r.push(x.length/2);",
+    "while (r.length > 20) /never/.test(x);",
+    "r.push(a\n- b);",
+    "r.push('// not a comment', \"/* nor this */\");",
+    "var s = a\n+b; r.push(s);",
+]
+JS_PRELUDE = "var a = 4, b = 2, g = 1, x = 'ab', r = [];\n"
+JS_EPILOGUE = "\nconsole.log(JSON.stringify(r));\n"
+
+
+def read_static(filename):
+    with open(os.path.join(STATIC_DIR, filename), encoding='utf-8') as f:
+        return f.read()
+
+
+def run_node(source, tmp_path):
+    path = tmp_path / 'case.js'
+    path.write_text(source, encoding='utf-8')
+    return subprocess.run(['node', str(path)], capture_output=True, text=True, check=True).stdout
+
+
+@pytest.mark.parametrize('source, expected', [
+    ("if (a) /b c/.test(x);", "if(a)/b c/.test(x);\n"),
+    ("r = (a) / b / g;", "r=(a)/b/g;\n"),
+    ("r = [a][0] / b;", "r=[a][0]/b;\n"),
+    ("y++ / 2;", "y++/2;\n"),
+    ("{ }\n/x y/.test(s);", "{}\n/x y/.test(s);\n"),
+    ("r = {a: 1}.a / 2;", "r={a:1}.a/2;\n"),
+    ("return /a b/;", "return/a b/;\n"),
+    ("r = x.return / 2 / g;", "r=x.return/2/g;\n"),
+    ("r = /[/]/;", "r=/[/]/;\n"),
+])
+def test_minify_js_tells_regex_from_division(source, expected):
+    assert index.minify_js(source) == expected
+    assert index.minify_js(expected) == expected
+
+
+@pytest.mark.skipif(shutil.which('node') is None, reason='node is not installed')
+@pytest.mark.parametrize('case', JS_CASES)
+def test_minify_js_cases_behave_the_same(case, tmp_path):
+    source = JS_PRELUDE + case + JS_EPILOGUE
+    assert run_node(index.minify_js(source), tmp_path) == run_node(source, tmp_path)
+
+
+def test_minify_js_drops_comments_and_indentation():
+    source = "function f(a, b) {\n    // add\n    return a + b; /* done */\n}\n"
+    assert index.minify_js(source) == "function f(a,b){return a+b;}\n"
+
+
+def test_minify_js_keeps_line_breaks_asi_depends_on():
+    assert index.minify_js("let a = 1\nlet b = 2\n") == "let a=1\nlet b=2\n"
+    assert index.minify_js("a\n++b\n") == "a\n++b\n"
+
+
+def test_minify_js_keeps_template_literals():
+    source = "const s = `a  ${ b ? `x  ${c}` : 'y' }  z`;\n"
+    assert index.minify_js(source) == "const s=`a  ${b?`x  ${c}`:'y'}  z`;\n"
+
+
+def test_minify_js_shrinks_script_and_keeps_its_literals():
+    source = read_static('js/script.js')
+    minified = index.minify_js(source)
+    assert len(minified) < len(source) * 0.8
+    assert index.minify_js(minified) == minified
+    for literal in re.findall(r"'(?:[^'\\\n]|\\.)*'", source):
+        assert literal in minified
+
+
+@pytest.mark.skipif(shutil.which('node') is None, reason='node is not installed')
+def test_minified_script_parses(tmp_path):
+    path = tmp_path / 'script.min.js'
+    path.write_text(index.minify_js(read_static('js/script.js')), encoding='utf-8')
+    subprocess.run(['node', '--check', str(path)], check=True)
+
+
+def test_minify_css():
+    source = "/* theme */\n.a  .b > .c ,\n.d {\n    color : red;\n    content: ' x ';\n}\n.e :hover { margin: 0 auto; }\n"
+    assert index.minify_css(source) == ".a .b>.c,.d{color :red;content:' x '}.e :hover{margin:0 auto}\n"
+
+
+def test_minify_css_shrinks_stylesheet():
+    source = read_static('css/style.css')
+    minified = index.minify_css(source)
+    assert len(minified) < len(source)
+    assert index.minify_css(minified) == minified
@@ -0,0 +1,110 @@
+import threading
+import uuid
+
+import pytest
+
+from api import index
+
+
+class Clock:
+    def __init__(self, now):
+        self.now = now
+    
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def monotonic(monkeypatch):
+    clock = Clock(500.0)
+    monkeypatch.setattr(index.time, 'monotonic', clock)
+    return clock
+
+
+@pytest.fixture
+def wall_clock(monkeypatch):
+    clock = Clock(1_700_000_000.0)
+    monkeypatch.setattr(index.time, 'time', clock)
+    return clock
+
+
+@pytest.fixture
+def name():
+    return 'test-%s' % uuid.uuid4().hex
+
+
+def test_token_bucket_allows_a_burst_then_waits(monotonic):
+    bucket = index.TokenBucket(rate=2, capacity=3)
+    assert [bucket.acquire() for _ in range(3)] == [0, 0, 0]
+    assert bucket.acquire() == pytest.approx(0.5)
+    
+    monotonic.now += 0.25
+    assert bucket.acquire() == pytest.approx(0.25)
+    monotonic.now += 0.25
+    assert bucket.acquire() == 0
+    assert bucket.acquire() == pytest.approx(0.5)
+
+
+def test_token_bucket_refills_up_to_capacity(monotonic):
+    bucket = index.TokenBucket(rate=1, capacity=2)
+    bucket.acquire()
+    bucket.acquire()
+    monotonic.now += 100
+    assert [bucket.acquire() for _ in range(3)] == [0, 0, pytest.approx(1)]
+
+
+def test_token_bucket_hands_out_each_token_once(monotonic):
+    bucket = index.TokenBucket(rate=1, capacity=50)
+    results = []
+    
+    def worker():
+        for _ in range(20):
+            results.append(bucket.acquire())
+    
+    threads = [threading.Thread(target=worker) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results.count(0) == 50
+
+
+def test_shared_bucket_allows_a_burst_then_waits(name, wall_clock):
+    bucket = index.SharedTokenBucket(name, rate=2, capacity=3)
+    assert [bucket.acquire() for _ in range(3)] == [0, 0, 0]
+    assert bucket.acquire() == pytest.approx(0.5)
+    
+    wall_clock.now += 0.5
+    assert bucket.acquire() == 0
+    wall_clock.now += 100
+    assert [bucket.acquire() for _ in range(4)] == [0, 0, 0, pytest.approx(0.5)]
+
+
+def test_shared_bucket_state_is_shared_by_name(name, wall_clock):
+    index.SharedTokenBucket(name, rate=1, capacity=1).acquire()
+    assert index.SharedTokenBucket(name, rate=1, capacity=1).acquire() == pytest.approx(1)
+    assert index.SharedTokenBucket(name + '-other', rate=1, capacity=1).acquire() == 0
+
+
+def test_shared_bucket_ignores_clock_going_backwards(name, wall_clock):
+    bucket = index.SharedTokenBucket(name, rate=1, capacity=1)
+    bucket.acquire()
+    wall_clock.now -= 60
+    assert bucket.acquire() == pytest.approx(1)
+
+
+def test_shared_bucket_hands_out_each_token_once_across_connections(name, wall_clock):
+    # Each thread gets its own SQLite connection, like separate worker processes
+    bucket = index.SharedTokenBucket(name, rate=1, capacity=20)
+    results = []
+    
+    def worker():
+        for _ in range(10):
+            results.append(bucket.acquire())
+    
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results.count(0) == 20
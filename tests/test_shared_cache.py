@@ -0,0 +1,166 @@
+import json
+import uuid
+
+import pytest
+
+from api import index
+
+
+@pytest.fixture
+def namespace():
+    return 'test-%s' % uuid.uuid4().hex
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1_000_000.0]
+    monkeypatch.setattr(index.time, 'time', lambda: now[0])
+    return now
+
+
+@pytest.mark.parametrize('value', [
+    None,
+    42,
+    'text',
+    [1, 2, 3],
+    {'count': 3, 'domains': ['a.com']},
+    (True, 12),
+    (True, {'domains': ['a.com'], 'pair': (1, 'x')}),
+    [(1, 2), [(3,)]],
+    {'__tuple__': 'not really'},
+    {'__dict__': {'__domain_set__': [1]}},
+])
+def test_pack_round_trips_through_json(value):
+    packed = json.loads(json.dumps(index.pack_cache_value(value)))
+    assert index.unpack_cache_value(packed) == value
+
+
+def test_pack_tags_tuples():
+    assert index.pack_cache_value((1, [2, (3,)])) == {'__tuple__': [1, [2, {'__tuple__': [3]}]]}
+
+
+def test_pack_round_trips_domain_sets():
+    domains = index.CompactDomainSet(['b.com', 'a.com', 'c.io', 'x.org'])
+    value = (True, {'domains': domains, 'page': domains[1:3]})
+    unpacked = index.unpack_cache_value(json.loads(json.dumps(index.pack_cache_value(value))))
+    
+    assert unpacked[0] is True
+    restored = unpacked[1]['domains']
+    assert isinstance(restored, index.CompactDomainSet)
+    assert restored.to_list() == domains.to_list()
+    assert restored.digest == domains.digest
+    assert unpacked[1]['page'].to_list() == domains[1:3].to_list()
+    assert unpacked[1]['page'].digest == domains[1:3].digest
+
+
+def test_shared_cache_set_get_and_delete(namespace):
+    cache = index.SharedTTLCache(namespace, ttl=60)
+    assert cache.get('missing', 'default') == 'default'
+    
+    cache.set(('keyword', 'current'), (True, ['a.com']))
+    assert cache.get(('keyword', 'current')) == (True, ['a.com'])
+    assert cache.lookup(('keyword', 'current')) == ((True, ['a.com']), False)
+    assert len(cache) == 1
+    
+    cache.delete(('keyword', 'current'))
+    assert cache.get(('keyword', 'current')) is None
+    assert len(cache) == 0
+
+
+def test_shared_cache_is_shared_between_instances(namespace):
+    index.SharedTTLCache(namespace, ttl=60).set('key', {'value': 1})
+    assert index.SharedTTLCache(namespace, ttl=60).get('key') == {'value': 1}
+    assert index.SharedTTLCache(namespace + '-other', ttl=60).get('key') is None
+
+
+def test_shared_cache_soft_and_hard_expiry(namespace, clock):
+    cache = index.SharedTTLCache(namespace, ttl=100, soft_ttl=10)
+    cache.set('key', 'value')
+    
+    clock[0] += 5
+    assert cache.lookup('key') == ('value', False)
+    clock[0] += 10
+    assert cache.lookup('key') == ('value', True)
+    clock[0] += 100
+    assert cache.lookup('key') is None
+    assert cache.get_stale('key') == 'value'
+
+
+def test_shared_cache_ttl_override_caps_soft_ttl(namespace, clock):
+    cache = index.SharedTTLCache(namespace, ttl=100, soft_ttl=50)
+    cache.set('key', 'value', ttl=20)
+    clock[0] += 19
+    assert cache.lookup('key') == ('value', False)
+    clock[0] += 2
+    assert cache.lookup('key') is None
+
+
+def test_shared_cache_trims_to_max_entries(namespace, monkeypatch):
+    monkeypatch.setattr(index.SharedTTLCache, 'TRIM_EVERY', 4)
+    cache = index.SharedTTLCache(namespace, ttl=60, max_entries=3)
+    for number in range(8):
+        cache.set(number, number, ttl=60 + number)
+    assert len(cache) == 3
+    assert [cache.get(number) for number in range(8)] == [None] * 5 + [5, 6, 7]
+
+
+def test_shared_cache_treats_non_text_rows_as_misses(namespace):
+    cache = index.SharedTTLCache(namespace, ttl=60)
+    cache.set('key', 'value')
+    db = index.get_db()
+    with db:
+        db.execute("UPDATE cache_entries SET value = ? WHERE namespace = ?", (b'\x80\x04pickled', namespace))
+    
+    assert cache.get('key') is None
+    assert cache.get_stale('key') is None
+    cache.set('key', 'fresh')
+    assert cache.get('key') == 'fresh'
+
+
+def test_negative_cache_expiry_and_discard(clock):
+    cache = index.NegativeCache(ttl=30, max_entries=100)
+    cache.add(('dead', 'current'))
+    assert ('dead', 'current') in cache
+    assert ('alive', 'current') not in cache
+    
+    cache.discard(('dead', 'current'))
+    assert ('dead', 'current') not in cache
+    
+    cache.add('expiring')
+    clock[0] += 31
+    assert 'expiring' not in cache
+    assert len(cache) == 0
+
+
+def test_negative_cache_eviction_rebuilds_the_filter():
+    cache = index.NegativeCache(ttl=60, max_entries=20)
+    for number in range(25):
+        cache.add('key%d' % number)
+    assert len(cache) <= 20
+    assert 'key24' in cache
+    assert 'key0' not in cache
+    assert all(key in cache for key in list(cache._expires))
+
+
+def test_bloom_filter_has_no_false_negatives():
+    bloom = index.BloomFilter(500, 0.01)
+    items = ['item%d' % number for number in range(500)]
+    for item in items:
+        bloom.add(item)
+    assert all(item in bloom for item in items)
+    false_positives = sum(('other%d' % number) in bloom for number in range(5000))
+    assert false_positives < 5000 * 0.03
+
+
+def test_shared_negative_cache(namespace, clock):
+    cache = index.SharedNegativeCache(namespace, ttl=30, max_entries=100)
+    cache.add(('dead', 'current'))
+    assert ('dead', 'current') in index.SharedNegativeCache(namespace, ttl=30, max_entries=100)
+    assert ('alive', 'current') not in cache
+    
+    clock[0] += 31
+    assert ('dead', 'current') not in cache
+    
+    cache.add('gone')
+    cache.discard('gone')
+    assert 'gone' not in cache
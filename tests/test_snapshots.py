@@ -0,0 +1,94 @@
+import random
+import uuid
+
+import pytest
+
+from api import index
+
+
+@pytest.fixture
+def keyword():
+    return 'snapshot-%s' % uuid.uuid4().hex
+
+
+@pytest.mark.parametrize('old, new, added, removed', [
+    ([], [], [], []),
+    ([], ['a.com', 'b.com'], ['a.com', 'b.com'], []),
+    (['a.com', 'b.com'], [], [], ['a.com', 'b.com']),
+    (['a.com', 'b.com'], ['a.com', 'b.com'], [], []),
+    (['a.com', 'c.com', 'e.com'], ['b.com', 'c.com', 'd.com'], ['b.com', 'd.com'], ['a.com', 'e.com']),
+    (['a.com'], ['a.com', 'z.com'], ['z.com'], []),
+    (['a.com', 'z.com'], ['z.com'], [], ['a.com']),
+])
+def test_diff_sorted_domains(old, new, added, removed):
+    assert index.diff_sorted_domains(old, new) == (added, removed)
+
+
+def test_diff_matches_set_difference():
+    rng = random.Random(3)
+    pool = ['d%03d.com' % number for number in range(200)]
+    for _ in range(50):
+        old = sorted(rng.sample(pool, rng.randint(0, 120)))
+        new = sorted(rng.sample(pool, rng.randint(0, 120)))
+        added, removed = index.diff_sorted_domains(old, new)
+        assert added == sorted(set(new) - set(old))
+        assert removed == sorted(set(old) - set(new))
+
+
+def test_encode_normalizes_and_round_trips():
+    sorted_domains, blob = index.encode_domain_snapshot(['B.com', 'a.com', 'b.com', '', None, 'c.io'])
+    assert sorted_domains == ['a.com', 'b.com', 'c.io']
+    assert index.decode_domain_snapshot(blob) == sorted_domains
+
+
+def test_empty_snapshot():
+    sorted_domains, blob = index.encode_domain_snapshot([])
+    assert sorted_domains == []
+    assert index.decode_domain_snapshot(blob) == []
+    assert list(index.iter_snapshot_domains(blob)) == []
+
+
+@pytest.mark.parametrize('chunk_size', [1, 7, 64 * 1024])
+def test_iter_snapshot_domains_matches_decode(chunk_size):
+    domains = ['domain%05d.example.com' % number for number in range(3000)]
+    sorted_domains, blob = index.encode_domain_snapshot(domains)
+    assert list(index.iter_snapshot_domains(blob, chunk_size=chunk_size)) == sorted_domains
+
+
+def test_record_snapshot_baseline_then_diff(keyword):
+    first = index.record_snapshot(keyword, ['b.com', 'A.com'])
+    assert first['baseline'] is True
+    assert first['added'] == ['a.com', 'b.com']
+    assert first['removed'] == []
+    assert first['previous_count'] == 0
+    assert first['previous_snapshot_at'] is None
+    
+    second = index.record_snapshot(keyword, ['a.com', 'c.com', 'c.com'])
+    assert second['baseline'] is False
+    assert second['added'] == ['c.com']
+    assert second['removed'] == ['b.com']
+    assert second['previous_count'] == 2
+    assert second['previous_snapshot_at'] == first['snapshot_at']
+    
+    latest = index.get_latest_snapshot(keyword)
+    assert latest['domains'] == ['a.com', 'c.com']
+    assert latest['count'] == 2
+
+
+def test_search_types_are_tracked_separately(keyword):
+    index.record_snapshot(keyword, ['a.com'], 'current')
+    historic = index.record_snapshot(keyword, ['b.com'], 'historic')
+    assert historic['baseline'] is True
+    assert index.get_latest_snapshot(keyword, 'current')['domains'] == ['a.com']
+
+
+def test_history_is_trimmed(keyword, monkeypatch):
+    monkeypatch.setattr(index, 'SNAPSHOT_HISTORY', 3)
+    for number in range(6):
+        index.record_snapshot(keyword, ['d%d.com' % number])
+    
+    rows = index.get_db().execute(
+        "SELECT domains FROM snapshots WHERE plan_key = ? ORDER BY id",
+        (index.get_query_plan_key(keyword),)
+    ).fetchall()
+    assert [index.decode_domain_snapshot(row['domains']) for row in rows] == [['d3.com'], ['d4.com'], ['d5.com']]